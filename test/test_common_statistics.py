@@ -0,0 +1,105 @@
+import sys, os
+sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../toulligqc")
+import unittest
+import numpy as np
+import pandas as pd
+from toulligqc import common_statistics as cs
+
+####################################################################################
+# Tests of the common statistics functions                                         #
+####################################################################################
+
+class TestAvgQual (unittest.TestCase):
+
+    """ Test the batch Phred score decoding against the per read implementation """
+
+    quals = ["$&(&(*/3+)')'&'('&'''))('*''$'(513.+<:2,,<=?/3.).8=9;@.D/?-655377",
+             "II",
+             "",
+             "+",
+             "!!!!!!!!!!",
+             "~~~~~~~~~~~~~~~~~~~~"]
+
+    def test_avg_qual_batch_str(self):
+        result = cs.avg_qual_batch(self.quals)
+        self.assertEqual(len(result), len(self.quals))
+        for q, v in zip(self.quals, result):
+            if q:
+                self.assertEqual(cs.avg_qual(q), v)
+            else:
+                self.assertTrue(np.isnan(v))
+
+    def test_avg_qual_batch_bytes(self):
+        result = cs.avg_qual_batch([q.encode('ascii') for q in self.quals])
+        np.testing.assert_array_equal(result, cs.avg_qual_batch(self.quals))
+
+    def test_avg_qual_batch_raw_phred(self):
+        raw = [bytes(ord(c) - 33 for c in q) for q in self.quals]
+        np.testing.assert_array_equal(cs.avg_qual_batch(raw, phred_offset=0), cs.avg_qual_batch(self.quals))
+
+    def test_avg_qual_batch_empty(self):
+        self.assertEqual(len(cs.avg_qual_batch([])), 0)
+        self.assertTrue(np.isnan(cs.avg_qual_batch(["", ""])).all())
+
+
+class TestAssemblyMetrics (unittest.TestCase):
+
+    """ Test the NXX and LXX values against a walk over the lengths sorted in descending order """
+
+    lengths = np.random.default_rng(3).integers(0, 20000, 1000).astype(np.uint32)
+
+    def _walk(self, lengths, x):
+        data = np.sort(lengths)[::-1]
+        cum_sum = 0
+        for count, v in enumerate(data, 1):
+            cum_sum += int(v)
+            if cum_sum >= data.sum() * x / 100:
+                return int(v), count
+
+    def test_levels(self):
+        metrics = cs.assembly_metrics(self.lengths)
+        self.assertEqual(list(cs.NXX_LEVELS), list(metrics))
+        for x in cs.NXX_LEVELS:
+            self.assertEqual(self._walk(self.lengths, x), metrics[x])
+
+    def test_counts_and_floats(self):
+        values, counts = np.unique(self.lengths, return_counts=True)
+        expected = cs.assembly_metrics(self.lengths)
+        self.assertEqual(expected, cs.assembly_metrics(values, counts=counts))
+        self.assertEqual(expected, cs.assembly_metrics(np.append(self.lengths.astype(float), np.nan)))
+        self.assertEqual({50: (0, 0)}, cs.assembly_metrics(np.array([], dtype=np.uint32), (50,)))
+
+
+class TestSortedStatistics (unittest.TestCase):
+
+    """ Test the statistics read from the sorted values against numpy and pandas """
+
+    rng = np.random.default_rng(5)
+    distributions = [rng.integers(0, 20000, 1001).astype(np.uint32),
+                     rng.uniform(2, 30, 998).astype(np.float32),
+                     np.append(rng.uniform(2, 30, 10), np.nan)]
+
+    def test_describe(self):
+        for values in self.distributions:
+            expected = pd.Series(values).describe()
+            result = cs.SortedStatistics(values).describe()
+            self.assertEqual(list(expected.index), list(result.index))
+            np.testing.assert_array_equal(expected.values, result.values)
+
+    def test_percentiles(self):
+        for values in self.distributions:
+            statistics = cs.SortedStatistics(values)
+            for p in (0, 25, 50, 99, 99.8, 100):
+                self.assertEqual(np.nanpercentile(values, p), statistics.percentile(p))
+            np.testing.assert_array_equal(np.nanpercentile(values, [10, 90]), statistics.percentile(np.array([10, 90])))
+
+    def test_cache(self):
+        dataframe_dict = {'all.reads.sequence.length': pd.Series(self.distributions[0])}
+        statistics = cs.get_statistics(dataframe_dict, 'all.reads.sequence.length')
+        self.assertIs(statistics, cs.get_statistics(dataframe_dict, 'all.reads.sequence.length'))
+        dataframe_dict['all.reads.sequence.length'] = pd.Series(self.distributions[0][:10])
+        self.assertEqual(10, cs.get_statistics(dataframe_dict, 'all.reads.sequence.length').count)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,149 @@
+import sys, os
+sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../toulligqc")
+import time
+import unittest
+from functools import partial
+import numpy as np
+import pandas as pd
+from toulligqc import extractor_common as ec
+
+####################################################################################
+# Tests of the common extractor functions                                          #
+####################################################################################
+
+class TestTimeISOToFloat (unittest.TestCase):
+
+    """ Test the batch ISO 8601 date conversion against the per date implementation """
+
+    iso_format = '%Y-%m-%dT%H:%M:%S.%f%z'
+
+    def check_batch(self, iso_datetimes):
+        result = ec.timeISO_to_float_batch(iso_datetimes, self.iso_format)
+        self.assertEqual(len(result), len(iso_datetimes))
+        for d, v in zip(iso_datetimes, result):
+            self.assertEqual(ec.timeISO_to_float(d, self.iso_format), v)
+
+    def test_same_timezone(self):
+        self.check_batch(['2023-08-01T12:33:08.645+00:00',
+                          '2023-08-01T12:33:09.1+00:00',
+                          '2023-12-31T23:59:59.999999+00:00'])
+
+    def test_other_timezones(self):
+        self.check_batch(['2023-08-01T12:33:08.645-05:30', '2023-08-01T12:33:08.645-05:30'])
+        self.check_batch(['2023-08-01T12:33:08.645+0200', '2023-08-01T12:33:08.645Z'])
+
+    def test_mixed_timezones(self):
+        self.check_batch(['2023-08-01T12:33:08.645+00:00', '2023-08-01T12:33:08.645+01:00'])
+
+    def test_without_fraction(self):
+        self.check_batch(['2023-08-01T12:33:08Z', '2023-08-01T12:33:09Z'])
+
+    def test_empty(self):
+        self.assertEqual(len(ec.timeISO_to_float_batch([])), 0)
+
+
+
+class TestReadSampling (unittest.TestCase):
+
+    """ Test the sampling of the reads by chunks """
+
+    def test_sample_size(self):
+        self.assertEqual(ec.parse_sample_size('0.05'), (0.05, None))
+        self.assertEqual(ec.parse_sample_size('1000'), (None, 1000))
+        for value in ('0', '-1', '1.5', 'all'):
+            self.assertRaises(ValueError, ec.parse_sample_size, value)
+
+    def test_reproducible_keys(self):
+        sampling = ec.ReadSampling(fraction=0.5, seed=1)
+        self.assertTrue(np.array_equal(sampling.keys(b'chunk', 10), sampling.keys(b'chunk', 10)))
+        self.assertFalse(np.array_equal(sampling.keys(b'chunk', 10), sampling.keys(b'other chunk', 10)))
+        self.assertFalse(np.array_equal(sampling.keys(b'chunk', 10),
+                                        ec.ReadSampling(fraction=0.5, seed=2).keys(b'chunk', 10)))
+
+    def test_read_keys(self):
+        # The key of a read does not depend on the other reads of its chunk
+        sampling = ec.ReadSampling(count=10, seed=0)
+        names = [b'read_%d' % i for i in range(100)]
+        keys = sampling.read_keys(names)
+        self.assertTrue(np.array_equal(keys, np.concatenate([sampling.read_keys(names[:30]),
+                                                             sampling.read_keys(names[30:])])))
+        self.assertTrue(((keys >= 0) & (keys < 1)).all())
+        self.assertEqual(len(np.unique(keys)), len(names))
+        self.assertFalse(np.array_equal(keys, ec.ReadSampling(count=10, seed=1).read_keys(names)))
+        self.assertEqual(len(sampling.read_keys([])), 0)
+
+    def test_fixed_size_sample(self):
+        # The sample of the chunks is the same as the sample of all the reads
+        sampling = ec.ReadSampling(count=50)
+        chunks = [sampling.keys(('file', i), 1000) for i in range(5)]
+        selected = [keys[sampling.mask(keys)] for keys in chunks]
+        self.assertTrue(all(len(keys) == 50 for keys in selected))
+        dataframe = pd.DataFrame({'sample_key': np.concatenate(selected)})
+        sample = sampling.select(dataframe.assign(read=np.arange(len(dataframe))))
+        self.assertEqual(list(sample.columns), ['read'])
+        self.assertEqual(len(sample), 50)
+        self.assertTrue(np.array_equal(np.sort(dataframe['sample_key'].to_numpy()[sample['read']]),
+                                       np.sort(np.concatenate(chunks))[:50]))
+
+    def test_sampling_result_values(self):
+        # All the read and base counts of the sample are scaled to the total number of reads
+        extractor = type('Extractor', (), {'get_report_data_file_id': staticmethod(lambda: 'test')})
+        result_dict = {'test.' + key: value for key, value in {
+            'read.count': 100, 'yield': 5000, 'read.pass.count': 80, 'read.fail.count': 20,
+            'read.pass.barcoded.count': 60, 'base.pass.barcoded.count': 3000,
+            'read.pass.non.used.barcodes.count': 5, 'all.read.length.count': 100, 'all.read.length.mean': 50.0,
+            'all.read.length.l50': 30, 'channel.occupancy.statistics.count': 12}.items()}
+        ec.set_sampling_result_values(extractor, result_dict, ec.ReadSampling(fraction=0.1), (1000, 52000))
+        self.assertEqual(result_dict, {'test.' + key: value for key, value in {
+            'read.count': 1000, 'yield': 52000, 'read.pass.count': 800, 'read.fail.count': 200,
+            'read.pass.barcoded.count': 600, 'base.pass.barcoded.count': 30000,
+            'read.pass.non.used.barcodes.count': 50, 'all.read.length.count': 1000, 'all.read.length.mean': 50.0,
+            'all.read.length.l50': 300, 'channel.occupancy.statistics.count': 12,
+            'sampling': '10% of the reads (seed 42)', 'sampled.read.count': 100}.items()})
+
+
+class TestBarcodeGroups (unittest.TestCase):
+
+    """ Test the reads grouped by barcode against the filtered dataframe """
+
+    rng = np.random.default_rng(7)
+    dataframe = pd.DataFrame({'barcode_arrangement': pd.Categorical(rng.choice(['barcode02', 'barcode01',
+                                                                                 'unclassified'], 500)),
+                              'passes_filtering': rng.random(500) < 0.7,
+                              'sequence_length': rng.integers(0, 5000, 500)})
+
+    def test_values(self):
+        groups = ec.BarcodeGroups(self.dataframe['barcode_arrangement'],
+                                  {column: self.dataframe[column] for column in ('passes_filtering',
+                                                                                 'sequence_length')})
+        self.assertEqual(['barcode01', 'barcode02', 'unclassified'], groups.barcodes)
+        for barcode in groups.barcodes:
+            df = self.dataframe[self.dataframe['barcode_arrangement'] == barcode]
+            np.testing.assert_array_equal(df['sequence_length'], groups.values('sequence_length', barcode))
+            np.testing.assert_array_equal(df.loc[df['passes_filtering'], 'sequence_length'],
+                                          groups.values('sequence_length', barcode, True))
+            np.testing.assert_array_equal(df.loc[~df['passes_filtering'], 'sequence_length'],
+                                          groups.values('sequence_length', barcode, False))
+        self.assertEqual(0, len(groups.values('sequence_length', 'barcode03')))
+
+
+class TestGenerateImages (unittest.TestCase):
+
+    """ Test the images created by the pool of threads """
+
+    def test_order(self):
+        def image(i):
+            time.sleep(0.01 * (5 - i))
+            return ('graph {}'.format(i), None, 'div', None)
+        images = ec.generate_images(True, [partial(image, i) for i in range(5)], 3)
+        self.assertEqual(['graph {}'.format(i) for i in range(5)], [i[0] for i in images])
+        self.assertEqual([], ec.generate_images(True, [], 3))
+
+    def test_error(self):
+        def error():
+            raise ValueError('graph')
+        self.assertRaises(ValueError, ec.generate_images, True, [error], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
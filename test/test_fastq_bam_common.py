@@ -0,0 +1,62 @@
+import sys, os
+sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../toulligqc")
+import tempfile
+import unittest
+from toulligqc.fastq_bam_common import expand_input_files
+from toulligqc.fastq_extractor import fastqExtractor, FASTQ_EXTENSIONS
+from toulligqc.bam_extractor import uBAM_Extractor
+
+####################################################################################
+# Tests of the input files of the FASTQ and BAM extractors                         #
+####################################################################################
+
+class TestExpandInputFiles (unittest.TestCase):
+
+    """ Test the expansion of the directories and glob patterns of the input files """
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.root = self.directory.name
+        os.makedirs(os.path.join(self.root, 'pass', 'barcode01'))
+        os.makedirs(os.path.join(self.root, 'empty'))
+        for name in ('pass/b.fastq.gz', 'pass/a.fq', 'pass/barcode01/c.fastq', 'pass/summary.txt', 'reads.bam'):
+            open(os.path.join(self.root, name), 'w').close()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def path(self, name):
+        return os.path.join(self.root, name)
+
+    def config(self, key, paths):
+        return {
+            key: '\t'.join(paths),
+            'images_directory': self.root,
+            'threshold': '10',
+            'batch_size': '500',
+            'thread': '1',
+            'barcoding': 'False',
+            'quiet': 'True'
+        }
+
+    def test_directory(self):
+        self.assertEqual(expand_input_files([self.path('pass')], FASTQ_EXTENSIONS),
+                         [self.path('pass/a.fq'), self.path('pass/b.fastq.gz'), self.path('pass/barcode01/c.fastq')])
+
+    def test_glob(self):
+        self.assertEqual(expand_input_files([self.path('pass/*.f*q*')], FASTQ_EXTENSIONS),
+                         [self.path('pass/a.fq'), self.path('pass/b.fastq.gz')])
+        # The patterns matching no file are kept to be reported as missing
+        self.assertEqual(expand_input_files([self.path('*.fastq')], FASTQ_EXTENSIONS), [self.path('*.fastq')])
+
+    def test_files(self):
+        self.assertEqual(expand_input_files([self.path('reads.bam'), self.path('missing.bam')], ('.bam',)),
+                         [self.path('reads.bam'), self.path('missing.bam')])
+
+    def test_no_file_found(self):
+        self.assertEqual(expand_input_files([self.path('empty')], FASTQ_EXTENSIONS), [])
+        result = fastqExtractor(self.config('fastq', [self.path('empty')])).check_conf()
+        self.assertEqual(result, (False, "No FASTQ file found in: " + self.path('empty')))
+        result = uBAM_Extractor(self.config('bam', [self.path('empty'), self.path('pass')])).check_conf()
+        self.assertEqual(result, (False, "No BAM file found in: " + self.path('empty') + ", " + self.path('pass')))
+        self.assertEqual(fastqExtractor(self.config('fastq', [self.path('pass')])).check_conf(), (True, ""))
@@ -0,0 +1,71 @@
+import sys, os
+sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../toulligqc")
+import tempfile
+import unittest
+import numpy as np
+import pysam
+from toulligqc.fastq_extractor import fastqExtractor
+from toulligqc.bam_extractor import uBAM_Extractor
+
+####################################################################################
+# Tests of the FASTQ extractor                                                     #
+####################################################################################
+
+class TestFastqSampling (unittest.TestCase):
+
+    """ Test that the sample of the reads does not depend on the number of threads and on the file format """
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        rng = np.random.default_rng(0)
+        # BGZF compressed FASTQ file split in more ranges of blocks with more threads
+        self.fastq = os.path.join(self.directory.name, 'reads.fastq.gz')
+        # Unaligned BAM file of the same reads
+        self.bam = os.path.join(self.directory.name, 'reads.bam')
+        with pysam.BGZFile(self.fastq, 'wb') as f, \
+                pysam.AlignmentFile(self.bam, 'wb', header={'HD': {'VN': '1.6'}}) as bam:
+            for i in range(2000):
+                length = int(rng.integers(50, 500))
+                sequence = ''.join(rng.choice(list('ACGT'), length))
+                qualities = rng.integers(2, 30, length)
+                quality = ''.join(chr(33 + q) for q in qualities)
+                f.write('@read_{} ch={}\n{}\n+\n{}\n'.format(i, i % 512 + 1, sequence, quality).encode())
+                record = pysam.AlignedSegment(bam.header)
+                record.query_name = 'read_{}'.format(i)
+                record.flag = 4
+                record.query_sequence = sequence
+                record.query_qualities = pysam.qualitystring_to_array(quality)
+                bam.write(record)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def load(self, thread, sample, bam=False):
+        config = {
+            'bam' if bam else 'fastq': self.bam if bam else self.fastq,
+            'images_directory': self.directory.name,
+            'threshold': '10',
+            'batch_size': '50',
+            'thread': str(thread),
+            'barcoding': 'False',
+            'quiet': 'True',
+            'sample': sample,
+            'sample_seed': '7'
+        }
+        if bam:
+            dataframe = uBAM_Extractor(config)._load_uBAM_file()[['sequence_length', 'mean_qscore']]
+        else:
+            dataframe = fastqExtractor(config)._load_fastq_data()
+        return dataframe.sort_values(['sequence_length', 'mean_qscore']).reset_index(drop=True)
+
+    def test_same_sample_with_threads(self):
+        for sample in ('100', '0.2'):
+            sample_1 = self.load(1, sample)
+            sample_3 = self.load(3, sample)
+            self.assertGreater(len(sample_1), 0)
+            self.assertTrue(sample_1.equals(sample_3))
+
+    def test_same_sample_as_bam(self):
+        # The sample only depends on the read names, not on the description of the FASTQ headers
+        for sample in ('100', '0.2'):
+            self.assertTrue(self.load(1, sample).equals(self.load(3, sample, bam=True)))
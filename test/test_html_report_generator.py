@@ -0,0 +1,40 @@
+import sys, os
+sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../toulligqc")
+import base64
+import json
+import re
+import unittest
+import zlib
+import plotly.graph_objs as go
+import plotly.offline as py
+from toulligqc import html_report_generator as hrg
+
+####################################################################################
+# Tests of the HTML report functions                                               #
+####################################################################################
+
+class TestLazyGraphDiv (unittest.TestCase):
+
+    """ Test the compressed figures of the lazy graphs against the figures of the Plotly divs """
+
+    def test_figure(self):
+        fig = go.Figure(go.Scatter(x=[1, 2, 3], y=[4.5, float('nan'), 6], name='</script>'))
+        fig.update_layout(title='Graph', width=1000, height=562)
+        div = py.plot(fig, include_plotlyjs=False, output_type='div', auto_open=False, show_link=False)
+
+        lazy_div = hrg._lazy_graph_div(div)
+        self.assertNotIn('Plotly.newPlot', lazy_div)
+        self.assertIn('style="height:562px; width:1000px;"', lazy_div)
+        payload = re.search(r'data-figure="([^"]+)"', lazy_div).group(1)
+        figure = json.loads(zlib.decompress(base64.b64decode(payload)))
+        expected = json.loads(fig.to_json())
+        self.assertEqual(expected['data'], figure['data'])
+        self.assertEqual(expected['layout'], figure['layout'])
+
+    def test_unknown_div(self):
+        div = '<div><p>No graph</p></div>'
+        self.assertEqual(div, hrg._lazy_graph_div(div))
+
+
+if __name__ == '__main__':
+    unittest.main()
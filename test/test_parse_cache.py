@@ -0,0 +1,52 @@
+import sys, os
+sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../toulligqc")
+import tempfile
+import unittest
+import numpy as np
+import pandas as pd
+from toulligqc.parse_cache import ParseCache
+
+####################################################################################
+# Tests of the parse cache                                                         #
+####################################################################################
+
+class TestParseCache (unittest.TestCase):
+
+    """ Test the storage of parsed columns and the eviction of the least recently used entries """
+
+    dataframe = pd.DataFrame({'sequence_length': np.array([10, 20, 30], dtype=np.uint32),
+                              'mean_qscore': np.array([7.5, 12.0, 9.25], dtype=np.float32),
+                              'passes_filtering': np.array([False, True, True]),
+                              'barcode_arrangement': pd.Categorical(['barcode01', 'unclassified', 'barcode01'])})
+
+    def test_store_and_load(self):
+        with tempfile.TemporaryDirectory() as directory:
+            input_file = os.path.join(directory, 'reads.fastq')
+            with open(input_file, 'w') as f:
+                f.write('@read\nACGT\n+\nIIII\n')
+            cache = ParseCache(os.path.join(directory, 'cache'))
+            key = ParseCache.key([input_file], {'threshold': 9})
+            self.assertIsNone(cache.load(key))
+            self.assertNotEqual(key, ParseCache.key([input_file], {'threshold': 10}))
+
+            cache.store(key, self.dataframe, {'rich': True})
+            dataframe, metadata = cache.load(key)
+            pd.testing.assert_frame_equal(self.dataframe, dataframe)
+            self.assertEqual({'rich': True}, metadata)
+
+            # A modified input file is parsed again
+            with open(input_file, 'a') as f:
+                f.write('@read2\nACGT\n+\nIIII\n')
+            self.assertIsNone(cache.load(ParseCache.key([input_file], {'threshold': 9})))
+
+    def test_eviction(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cache = ParseCache(directory, max_size=1)
+            cache.store('first', self.dataframe, {})
+            cache.store('second', self.dataframe, {})
+            self.assertIsNone(cache.load('first'))
+            self.assertIsNotNone(cache.load('second'))
+
+
+if __name__ == '__main__':
+    unittest.main()
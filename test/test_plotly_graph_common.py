@@ -0,0 +1,86 @@
+import sys, os
+sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../toulligqc")
+import tempfile
+import unittest
+import numpy as np
+import pandas as pd
+from toulligqc import plotly_graph_common as pgc
+
+####################################################################################
+# Tests of the common graph functions                                              #
+####################################################################################
+
+class TestBinnedPercentiles (unittest.TestCase):
+
+    """ Test the percentiles of the time bins against np.percentile() on the values of each bin """
+
+    rng = np.random.default_rng(11)
+    time_series = pd.Series(rng.uniform(0, 36000, 2000))
+    values = pd.Series(rng.integers(0, 20000, 2000).astype(np.uint32))
+
+    def test_percentiles(self):
+        percentiles = (0, 25, 50, 75, 100)
+        x, bins = pgc._time_bins(self.time_series, 50)
+        self.assertEqual(50, len(x))
+        result = pgc._binned_percentiles(bins, len(x), self.values, percentiles)
+        for b in range(len(x)):
+            bin_values = self.values[bins == b].tolist()
+            for i, p in enumerate(percentiles):
+                if bin_values:
+                    self.assertEqual(np.percentile(bin_values, p), result[i][b])
+                else:
+                    self.assertTrue(np.isnan(result[i][b]))
+
+    def test_nan_values(self):
+        bins = np.array([0, 0, 1, 1, 1])
+        result = pgc._binned_percentiles(bins, 3, [1.0, np.nan, 2.0, 4.0, 3.0], (50,))
+        self.assertTrue(np.isnan(result[0][0]))
+        self.assertEqual(3.0, result[0][1])
+        self.assertTrue(np.isnan(result[0][2]))
+
+
+class TestDensityGrid (unittest.TestCase):
+
+    """ Test the read counts of the density grid against np.histogram2d() """
+
+    rng = np.random.default_rng(17)
+    lengths = pd.Series(rng.integers(0, 50000, 5000))
+    qscores = pd.Series(np.append(rng.uniform(2, 30, 4999), np.nan))
+
+    def test_grid(self):
+        length_edges = pgc._grid_edges(0, np.log10(self.lengths.max()), 40)
+        qscore_edges = pgc._grid_edges(self.qscores.min(), self.qscores.max(), 30)
+        grid = pgc._density_grid(self.lengths, self.qscores, length_edges, qscore_edges)
+        self.assertEqual((30, 40), grid.shape)
+        expected, _, _ = np.histogram2d(np.log10(np.maximum(self.lengths[:-1], 1)), self.qscores[:-1],
+                                        bins=(length_edges, qscore_edges))
+        np.testing.assert_array_equal(expected.T, grid)
+
+    def test_single_value(self):
+        edges = pgc._grid_edges(5, 5, 10)
+        self.assertEqual(11, len(edges))
+        self.assertEqual(5, edges[0])
+
+
+class TestPlotlyJavaScript (unittest.TestCase):
+
+    """ Test the copy of the bundled Plotly JavaScript code in the images directory """
+
+    def test_copy(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, pgc.plotly_js_file)
+            pgc._copy_latest_minjs(directory)
+            with open(path) as f:
+                self.assertEqual(pgc.plotly_min_js(), f.read())
+
+            # A stale file is replaced
+            pgc._plotly_js_paths.discard(path)
+            with open(path, 'w') as f:
+                f.write('stale')
+            pgc._copy_latest_minjs(directory)
+            with open(path) as f:
+                self.assertEqual(pgc.plotly_min_js(), f.read())
+
+
+if __name__ == '__main__':
+    unittest.main()
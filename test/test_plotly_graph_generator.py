@@ -0,0 +1,38 @@
+import sys, os
+sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../toulligqc")
+import unittest
+import numpy as np
+import pandas as pd
+from toulligqc import plotly_graph_generator as pgg
+
+####################################################################################
+# Tests of the graph functions                                                     #
+####################################################################################
+
+class TestChannelCount (unittest.TestCase):
+
+    """ Test the read counts of the flowcell grid against the reads of each channel """
+
+    rng = np.random.default_rng(13)
+
+    def test_geometries(self):
+        for max_channel, channel_count in ((126, 126), (512, 512), (3000, 3000)):
+            channel_map = pgg._compute_channel_map(pd.DataFrame({'channel': [1, max_channel]}))
+            self.assertEqual(list(range(1, channel_count + 1)), sorted(channel_map[channel_map > 0].tolist()))
+
+    def test_counts(self):
+        channels = self.rng.integers(1, 127, 1000)
+        weights = self.rng.integers(1, 5, 1000)
+        channel_map = pgg._compute_channel_map(pd.DataFrame({'channel': channels}))
+        counts = pgg._compute_channel_count(channels, channel_map)
+        weighted_counts = pgg._compute_channel_count(channels, channel_map, weights)
+        for (row, column), channel in np.ndenumerate(channel_map):
+            if channel == 0:
+                self.assertTrue(np.isnan(counts[row, column]))
+            else:
+                self.assertEqual((channels == channel).sum(), counts[row, column])
+                self.assertEqual(weights[channels == channel].sum(), weighted_counts[row, column])
+
+
+if __name__ == '__main__':
+    unittest.main()
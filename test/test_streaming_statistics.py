@@ -0,0 +1,76 @@
+import sys, os
+sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../toulligqc")
+import unittest
+import numpy as np
+import pandas as pd
+from toulligqc import common_statistics as cs
+from toulligqc import streaming_statistics as ss
+
+####################################################################################
+# Tests of the streaming statistics                                                #
+####################################################################################
+
+class TestStreamingStatistics (unittest.TestCase):
+
+    """ Test the statistics updated batch by batch against the statistics of all the values """
+
+    rng = np.random.default_rng(1)
+    lengths = rng.integers(0, 5000, 10000)
+    qscores = rng.uniform(2, 30, 10000).astype(np.float32)
+
+    def test_exact_length_statistics(self):
+        statistics = ss.ColumnStatistics(exact_integers=True)
+        for batch in np.array_split(self.lengths, 7):
+            statistics.add(batch)
+        expected = pd.Series(self.lengths).describe()
+        for index, value in statistics.describe().items():
+            self.assertAlmostEqual(expected[index], value, places=6)
+
+    def test_length_nxx_lxx(self):
+        statistics = ss.ColumnStatistics(exact_integers=True)
+        for batch in np.array_split(self.lengths, 3):
+            statistics.add(batch)
+        self.assertEqual(cs.assembly_metrics(self.lengths), ss._nxx_lxx(statistics))
+
+    def test_quantile_sketch(self):
+        statistics = ss.ColumnStatistics()
+        for batch in np.array_split(self.qscores, 5):
+            statistics.add(batch)
+        expected = pd.Series(self.qscores.astype(np.float64)).describe()
+        result = statistics.describe()
+        self.assertEqual(expected['count'], result['count'])
+        self.assertAlmostEqual(expected['mean'], result['mean'], places=6)
+        self.assertAlmostEqual(expected['std'], result['std'], places=6)
+        for index in ('25%', '50%', '75%'):
+            self.assertAlmostEqual(expected[index], result[index], delta=expected[index] * 0.002)
+
+    def test_bounded_sample(self):
+        statistics = ss.StreamingStatistics(9, sample_size=1000)
+        for batch in np.array_split(np.arange(len(self.lengths)), 10):
+            statistics.add({'sequence_length': self.lengths[batch],
+                            'mean_qscore': self.qscores[batch]})
+        sample = statistics.sample_dataframe()
+        self.assertEqual(len(sample), 1000)
+        self.assertEqual(statistics.read_count, len(self.lengths))
+        self.assertTrue(statistics.is_sampled())
+
+    def test_sparse_time_bins(self):
+        # Records without start time have their index as start time, far from the epoch start times
+        statistics = ss.StreamingStatistics(9)
+        start_times = np.concatenate([np.arange(1, 101, dtype=np.float64), 1.7e9 + np.arange(100) * 7.0])
+        for batch in np.array_split(np.arange(200), 4):
+            statistics.add({'sequence_length': self.lengths[batch] + 1,
+                            'mean_qscore': self.qscores[batch],
+                            'start_time': start_times[batch]})
+        for read_type in (True, False):
+            self.assertLess(len(statistics.time_read_counts[read_type].counts), 200)
+        time_dataframe = statistics.time_dataframe()
+        self.assertEqual(time_dataframe['read_count'].sum(), 200)
+        self.assertEqual(time_dataframe['sequence_length'].sum(), (self.lengths[:200] + 1).sum())
+        expected = pd.Series(np.floor(start_times / ss.TIME_BIN_SIZE)).value_counts()
+        self.assertEqual(time_dataframe.groupby('start_time')['read_count'].sum().to_numpy().tolist(),
+                         expected.sort_index().to_numpy().tolist())
+
+
+if __name__ == '__main__':
+    unittest.main()
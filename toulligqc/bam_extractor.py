@@ -3,34 +3,54 @@ import os
 import numpy as np
 import pandas as pd
 import time
+from functools import partial
 import pysam
+from itertools import islice
 from collections import defaultdict
 from toulligqc.extractor_common import log_task
-from toulligqc.extractor_common import describe_dict
+from toulligqc.extractor_common import describe_dict, set_nxx_result_values
 from toulligqc.extractor_common import set_result_value
-from toulligqc.extractor_common import add_image_to_result
+from toulligqc.extractor_common import generate_images
 from toulligqc.extractor_common import check_result_values
 from toulligqc.extractor_common import count_boolean_elements
 from toulligqc.extractor_common import get_result_value
 from toulligqc.extractor_common import set_result_dict_telemetry_value
 from toulligqc.extractor_common import fill_series_dict
-from toulligqc.extractor_common import timeISO_to_float
+from toulligqc.extractor_common import timeISO_to_float_batch
 from toulligqc.extractor_common import extract_barcode_info
-from toulligqc.common_statistics import compute_NXX, compute_LXX, occupancy_channel, avg_qual
+from toulligqc.extractor_common import ReadSampling, set_sampling_result_values
+from toulligqc.streaming_statistics import StreamingStatistics
+from toulligqc.parse_cache import ParseCache
+from toulligqc.common_statistics import occupancy_channel, avg_qual_batch, get_statistics
 from toulligqc.fastq_bam_common import multiprocessing_submit, extract_headerTag
-from toulligqc.fastq_bam_common import batch_iterator
-from toulligqc.common import is_numpy_1_24
+from toulligqc.fastq_bam_common import batch_iterator, read_batch, get_tag
+from toulligqc.fastq_bam_common import batches_to_dataframe, concatenate_batches, encode_categories
+from toulligqc.fastq_bam_common import expand_input_files, schedule_files, pass_filter
+from toulligqc.fastq_bam_common import SharedColumnBuffers, COLUMN_DTYPES, batch_length, batch_totals
+from toulligqc.fastq_bam_common import bgzf_block_offsets, bgzf_ranges, find_bam_record, read_range
 from toulligqc import plotly_graph_generator as pgg
+from toulligqc.plotly_graph_common import DEFAULT_DENSITY_GRID_SIZE
+
+BAM_EXTENSIONS = ('.bam',)
 
 
 class uBAM_Extractor:
     def __init__(self, config_dictionary):
         self.config_dictionary = config_dictionary
-        self.ubam = config_dictionary['bam'].split('\t')
+        self.ubam = expand_input_files(config_dictionary['bam'].split('\t'), BAM_EXTENSIONS)
         self.images_directory = config_dictionary['images_directory']
         self.threshold_Qscore = int(config_dictionary['threshold'])
         self.batch_size = int(config_dictionary['batch_size'])
         self.thread = int(config_dictionary['thread'])
+        self.density_grid_size = int(config_dictionary.get('density_grid_size', DEFAULT_DENSITY_GRID_SIZE))
+        self.basecaller_qscore = config_dictionary.get('basecaller_qscore', 'False').lower() == 'true'
+        self.shared_memory = config_dictionary.get('shared_memory', 'False').lower() == 'true'
+        self.sampling = ReadSampling.from_config(config_dictionary)
+        self.sampled_totals = None
+        self.streaming = config_dictionary.get('streaming', 'False').lower() == 'true'
+        self.streaming_statistics = None
+        self.parse_cache = ParseCache.from_config(config_dictionary) \
+            if self.sampling is None and not self.streaming else None
         self.header = dict()
         self.is_barcode = False
         if config_dictionary['barcoding'] == 'True':
@@ -45,10 +65,12 @@ class uBAM_Extractor:
         Configuration checking
         :return: nothing
         """
+        if not self.ubam:
+            return False, "No BAM file found in: " + ", ".join(self.config_dictionary['bam'].split('\t'))
         for uBAM in self.ubam:
             if not os.path.isfile(uBAM):
                 return False, "BAM file does not exists: " + uBAM
-            return True, ""
+        return True, ""
 
 
     def init(self):
@@ -57,9 +79,11 @@ class uBAM_Extractor:
         :return: Panda's Dataframe object
         """
         start_time = time.time()
-        self.dataframe = self._load_uBAM_file()
+        self.dataframe = self._load_cached_uBAM_file()
         if self.dataframe.empty:
             raise pd.errors.EmptyDataError("Dataframe is empty")
+        self.dataframe.insert(2, 'passes_filtering',
+                              pass_filter(self.dataframe['mean_qscore'].to_numpy(), self.threshold_Qscore))
         self.dataframe_dict = {}
         
         # Add missing categories
@@ -112,43 +136,50 @@ class uBAM_Extractor:
         Generation of the different graphs containing in the plotly_graph_generator module
         :return: images array containing the title and the path toward the images
         """
-        images = list()
-
-        add_image_to_result(self.quiet, images, time.time(), pgg.read_count_histogram(result_dict, self.images_directory))
-        add_image_to_result(self.quiet, images, time.time(), pgg.read_length_scatterplot(self.dataframe_dict, self.images_directory))
-        add_image_to_result(self.quiet, images, time.time(), pgg.yield_plot(self.dataframe, self.images_directory))
-        add_image_to_result(self.quiet, images, time.time(), pgg.read_quality_multiboxplot(self.dataframe_dict, self.images_directory))
-        add_image_to_result(self.quiet, images, time.time(), pgg.allphred_score_frequency(self.dataframe_dict, self.images_directory))
-        add_image_to_result(self.quiet, images, time.time(), pgg.plot_performance(self.dataframe, self.images_directory))
-        add_image_to_result(self.quiet, images, time.time(), pgg.twod_density(self.dataframe_dict, self.images_directory))
-        add_image_to_result(self.quiet, images, time.time(), pgg.sequence_length_over_time(self.dataframe_dict, self.images_directory))
-        add_image_to_result(self.quiet, images, time.time(), pgg.phred_score_over_time(self.dataframe_dict, result_dict, self.images_directory))
-        add_image_to_result(self.quiet, images, time.time(), pgg.speed_over_time(self.dataframe_dict, self.images_directory))
+        graph_tasks = []
+
+        # In streaming mode, the reads and bases over time and the channel counts of all the reads are used
+        time_dataframe = channel_dataframe = self.dataframe
+        if self.streaming_statistics is not None:
+            time_dataframe = self.streaming_statistics.time_dataframe()
+            channel_dataframe = self.streaming_statistics.channel_dataframe()
+
+        graph_tasks.append(partial(pgg.read_count_histogram, result_dict, self.images_directory))
+        graph_tasks.append(partial(pgg.read_length_scatterplot, self.dataframe_dict, self.images_directory))
+        graph_tasks.append(partial(pgg.yield_plot, time_dataframe, self.images_directory))
+        graph_tasks.append(partial(pgg.read_quality_multiboxplot, self.dataframe_dict, self.images_directory))
+        graph_tasks.append(partial(pgg.allphred_score_frequency, self.dataframe_dict, self.images_directory))
+        graph_tasks.append(partial(pgg.plot_performance, channel_dataframe, self.images_directory))
+        graph_tasks.append(partial(pgg.twod_density, self.dataframe_dict, self.images_directory,
+                                   grid_size=self.density_grid_size))
+        graph_tasks.append(partial(pgg.sequence_length_over_time, self.dataframe_dict, self.images_directory))
+        graph_tasks.append(partial(pgg.phred_score_over_time, self.dataframe_dict, result_dict, self.images_directory))
+        graph_tasks.append(partial(pgg.speed_over_time, self.dataframe_dict, self.images_directory))
         if self.is_barcode:
             if "barcode_alias" in self.config_dictionary:
                 barcode_alias = self.config_dictionary['barcode_alias']
             else:
                 barcode_alias = None 
-            add_image_to_result(self.quiet, images, time.time(), pgg.barcode_percentage_pie_chart_pass(self.dataframe_dict,
-                                                                                                       self.barcode_selection,
-                                                                                                       self.images_directory,
-                                                                                                       barcode_alias))
+            graph_tasks.append(partial(pgg.barcode_percentage_pie_chart_pass, self.dataframe_dict,
+                                       self.barcode_selection,
+                                       self.images_directory,
+                                       barcode_alias))
 
             read_fail = self.dataframe_dict["read.fail.barcoded"]
             if not (len(read_fail) == 1 and read_fail["other barcodes"] == 0):
-                add_image_to_result(self.quiet, images, time.time(), pgg.barcode_percentage_pie_chart_fail(self.dataframe_dict,
-                                                                                                      self.barcode_selection,
-                                                                                                      self.images_directory,
-                                                                                                      barcode_alias))
+                graph_tasks.append(partial(pgg.barcode_percentage_pie_chart_fail, self.dataframe_dict,
+                                           self.barcode_selection,
+                                           self.images_directory,
+                                           barcode_alias))
 
-            add_image_to_result(self.quiet, images, time.time(), pgg.barcode_length_boxplot(self.dataframe_dict,
-                                                                                            self.images_directory,
-                                                                                            barcode_alias))
+            graph_tasks.append(partial(pgg.barcode_length_boxplot, self.dataframe_dict,
+                                       self.images_directory,
+                                       barcode_alias))
 
-            add_image_to_result(self.quiet, images, time.time(), pgg.barcoded_phred_score_frequency(self.dataframe_dict,
-                                                                                                    self.images_directory,
-                                                                                                    barcode_alias))
-        return images
+            graph_tasks.append(partial(pgg.barcoded_phred_score_frequency, self.dataframe_dict,
+                                       self.images_directory,
+                                       barcode_alias))
+        return generate_images(self.quiet, graph_tasks, self.thread)
 
 
     def extract(self, result_dict):
@@ -197,30 +228,30 @@ class uBAM_Extractor:
         # Yield, n50, run time
         set_result_value(self, result_dict, "yield", sum(self.dataframe_dict["all.reads.sequence.length"]))
 
-        set_result_value(self, result_dict, "n50", compute_NXX(self.dataframe_dict, 50))
-        set_result_value(self, result_dict, "l50", compute_LXX(self.dataframe_dict, 50))
+        set_nxx_result_values(self, result_dict, self.dataframe_dict)
 
-        set_result_value(self, result_dict, "run.time", max(self.dataframe['start_time']))
-        # Get channel occupancy statistics and store each value into result_dict
-        for index, value in occupancy_channel(self.dataframe).items():
-            set_result_value(self,
-                            result_dict, "channel.occupancy.statistics." + index, value)
+        if self.streaming_statistics is None:
+            set_result_value(self, result_dict, "run.time", max(self.dataframe['start_time']))
+            # Get channel occupancy statistics and store each value into result_dict
+            for index, value in occupancy_channel(self.dataframe).items():
+                set_result_value(self,
+                                result_dict, "channel.occupancy.statistics." + index, value)
         
         # Get statistics about all reads length and store each value into result_dict
-        sequence_length_statistics = self.dataframe_dict["all.reads.sequence.length"].describe()
+        sequence_length_statistics = get_statistics(self.dataframe_dict, "all.reads.sequence.length").describe()
 
         for index, value in sequence_length_statistics.items():
             set_result_value(self,
                              result_dict, "all.read.length." + index, value)
 
         # Add statistics (without count) about read pass/fail length in the result_dict
-        describe_dict(self, result_dict, self.dataframe_dict["pass.reads.sequence.length"],
+        describe_dict(self, result_dict, get_statistics(self.dataframe_dict, "pass.reads.sequence.length"),
                       "pass.reads.sequence.length")
-        describe_dict(self, result_dict, self.dataframe_dict["fail.reads.sequence.length"],
+        describe_dict(self, result_dict, get_statistics(self.dataframe_dict, "fail.reads.sequence.length"),
                       "fail.reads.sequence.length")
 
         # Get Qscore statistics without count value and store them into result_dict
-        qscore_statistics = self.dataframe['mean_qscore'].describe().drop(
+        qscore_statistics = get_statistics(self.dataframe_dict, "all.reads.mean.qscore").describe().drop(
             "count")
 
         for index, value in qscore_statistics.items():
@@ -228,76 +259,142 @@ class uBAM_Extractor:
                              result_dict, "all.read.qscore." + index, value)
 
         # Add statistics (without count) about read pass/fail qscore in the result_dict
-        describe_dict(self, result_dict, self.dataframe_dict["pass.reads.mean.qscore"], "pass.reads.mean.qscore")
-        describe_dict(self, result_dict, self.dataframe_dict["fail.reads.mean.qscore"], "fail.reads.mean.qscore")
+        describe_dict(self, result_dict, get_statistics(self.dataframe_dict, "pass.reads.mean.qscore"), "pass.reads.mean.qscore")
+        describe_dict(self, result_dict, get_statistics(self.dataframe_dict, "fail.reads.mean.qscore"), "fail.reads.mean.qscore")
         if self.is_barcode:
             extract_barcode_info(self, result_dict,
                                  self.barcode_selection,
                                  self.dataframe_dict,
                                  self.dataframe)
-                                 
+
+        # In streaming mode, the statistics above are computed on the reads kept for the graphs
+        if self.streaming_statistics is not None:
+            self.streaming_statistics.set_result_values(self, result_dict)
+            if self.is_barcode:
+                self.streaming_statistics.set_barcode_result_values(self, result_dict, self.barcode_selection,
+                                                                    self.dataframe_dict)
+
+        # Scale the counts estimated from the sampled reads
+        if self.sampling is not None:
+            set_sampling_result_values(self, result_dict, self.sampling, self.sampled_totals)
+
         log_task(self.quiet, 'Extract info from uBAM file', start_time, time.time())       
 
 
+    def _load_cached_uBAM_file(self):
+        """
+        Load uBAM dataframe from the parse cache, or parse the uBAM files and add their columns to the cache
+        :return: a Pandas Dataframe object
+        """
+        if self.parse_cache is None:
+            return self._load_uBAM_file()
+
+        cache_key = ParseCache.key(self.ubam, {'extractor': self.get_name(),
+                                               'barcoding': self.is_barcode,
+                                               'basecaller_qscore': self.basecaller_qscore})
+        cached = self.parse_cache.load(cache_key)
+        if cached is not None:
+            uBAM_df, self.header = cached
+            return uBAM_df
+
+        uBAM_df = self._load_uBAM_file()
+        self.parse_cache.store(cache_key, uBAM_df, self.header)
+        return uBAM_df
+
+
     def _load_uBAM_file(self):
         """
         Load uBAM dataframe
         :return: a Pandas Dataframe object
         """  
         self._get_header()
-        uBAM_chunks = self._uBAM_batch_generator()
-        rst_futures = multiprocessing_submit(self._uBAM_batch_reader,
-                                                        uBAM_chunks, 
-                                                        n_process=self.thread, 
-                                                        pbar_update=self.batch_size)
-        uBAM_df = []
-        
-        for _, f in enumerate(rst_futures):
-            uBAM_df.extend(f.result())
+        worker_config = {
+            'is_barcode': self.is_barcode,
+            'basecaller_qscore': self.basecaller_qscore,
+            'batch_size': self.batch_size,
+            'sampling': self.sampling
+        }
 
-        columns = ['sequence_length', 'mean_qscore', 'passes_filtering', 'start_time', 'channel', 'duration']
+        columns = ['sequence_length', 'mean_qscore', 'start_time', 'channel', 'duration']
         if self.is_barcode:
             columns.append('barcode_arrangement')
+        if self.sampling is not None and self.sampling.count is not None:
+            columns.append('sample_key')
+
+        shared_buffers = None
+        if self.shared_memory and not self.streaming:
+            shared_buffers = SharedColumnBuffers({column: COLUMN_DTYPES[column] for column in columns})
+
+        try:
+            uBAM_chunks = self._uBAM_batch_generator()
+            rst_futures = multiprocessing_submit(_uBAM_batch_reader,
+                                                 uBAM_chunks,
+                                                 n_process=self.thread,
+                                                 pbar_update=lambda result: batch_length(result[3]),
+                                                 worker_config=worker_config,
+                                                 shared_buffers=shared_buffers,
+                                                 slot_size=_uBAM_chunk_size)
+            # The statistics are updated with each batch as soon as it is read, the batches are not kept
+            if self.streaming:
+                self.streaming_statistics = StreamingStatistics(self.threshold_Qscore,
+                                                                seed=int(self.config_dictionary.get('sample_seed', 42)))
+                for rec_data in _verified_batches((f.result() for f in rst_futures), worker_config):
+                    self.streaming_statistics.add(rec_data)
+                return self.streaming_statistics.sample_dataframe()
+
+            results = {}
+            for _, f in enumerate(rst_futures):
+                result = f.result()
+                if shared_buffers is not None:
+                    result = result[:3] + (shared_buffers.load(result[3]),)
+                results[result[0]] = result
+
+            batches = list(_verified_batches((results[key] for key in sorted(results)), worker_config))
+
+            if self.sampling is not None:
+                self.sampled_totals = batch_totals(batches)
+            uBAM_df = batches_to_dataframe(batches, columns)
+            del results, batches
+        finally:
+            if shared_buffers is not None:
+                shared_buffers.close()
+
+        if self.sampling is not None:
+            uBAM_df = self.sampling.select(uBAM_df)
 
-        uBAM_df = pd.DataFrame(uBAM_df, columns=columns)
-
-        uBAM_df['sequence_length'] = uBAM_df['sequence_length'].astype(np.uint32)
-        uBAM_df['mean_qscore'] = uBAM_df['mean_qscore'].astype(np.float32)
-        uBAM_df['passes_filtering'] = uBAM_df['passes_filtering'].astype(np.bool_ if is_numpy_1_24 else np.bool)
         uBAM_df["start_time"] = uBAM_df["start_time"] - uBAM_df["start_time"].min()
-        uBAM_df['channel'] = uBAM_df['channel'].astype(np.int16)
-        uBAM_df['start_time'] = uBAM_df['start_time'].astype(np.float64)
-        uBAM_df['duration'] = uBAM_df['duration'].astype(np.float32)
-        if self.is_barcode:
-            uBAM_df['barcode_arrangement'] = uBAM_df['barcode_arrangement'].astype("category")
         return uBAM_df 
 
 
-    def _uBAM_batch_reader(self, uBAM_chunk):
-        """
-        parse each line of uBAM quality line:
-        return: [read length, mean Qscore, type of read (pass or fail)]
-        """
-        #def process_bam_chunk(bam_chunk):
-        rec_data = []
-        record_count = 0
-        for rec in uBAM_chunk:
-            record_count += 1
-            rec_dict = self._process_record(rec, record_count)
-            rec_data.append(rec_dict)
-        return rec_data
-
-
     def _uBAM_batch_generator(self):
         """
-        read uBAM file in small chunk
-        yield : list of lines (quality line): batch of n size
+        split uBAM files in ranges of BGZF blocks, or in small batches of records for SAM files.
+        When there are enough files to keep all the workers busy, each worker reads whole files.
+        yield : uBAM chunks to read with _uBAM_batch_reader()
         """
+        files = schedule_files(self.ubam, self.thread)
+        if files is not None:
+            for ubam in files:
+                yield ubam,
+            return
+
         for ubam in self.ubam:
-            samfile = pysam.AlignmentFile(ubam, "rb", check_sq=False)
-            bam_batch = batch_iterator(samfile, batch_size=self.batch_size)
-            for batch in bam_batch:
-                yield batch
+            with pysam.AlignmentFile(ubam, "rb", check_sq=False) as samfile:
+                try:
+                    block_offsets = bgzf_block_offsets(ubam)
+                except ValueError:
+                    block_offsets = None
+
+                if not samfile.is_bam or not block_offsets:
+                    for offset, count in batch_iterator(samfile, batch_size=self.batch_size):
+                        yield ubam, offset, count
+                    continue
+
+                # The first record of the file follows the header, the others are searched by the workers
+                first_record = samfile.tell()
+                ranges = bgzf_ranges(block_offsets, os.path.getsize(ubam), self.thread)
+                for i, (range_start, range_end) in enumerate(ranges):
+                    yield ubam, range_start, range_end, first_record if i == 0 else None, samfile.nreferences
 
 
     def _get_header(self):
@@ -316,30 +413,159 @@ class uBAM_Extractor:
         }
 
 
-    def _process_record(self, rec, record_count):
-        """
-        extract QC info from BAM record
-        return : dict of QC info
-        """
-        fields = rec.split("\t")
-
-        # Parse optional fields
-        attributes = {}
-        for t in fields[11:]:
-            k, t, v = t.split(':', 2)
-            attributes[k] = v
-
-        iso_start_time = attributes.get('st', None)
-        qual = avg_qual(fields[10])
-        passes_filtering = True if qual > self.threshold_Qscore else False
-        data = [
-            len(fields[9]), # read length
-            qual, # AVG Qscore
-            passes_filtering, # Passing filter
-            float(record_count) if iso_start_time is None else timeISO_to_float(iso_start_time, '%Y-%m-%dT%H:%M:%S.%f%z'), # start time
-            attributes.get('ch', '1'),  # Channel
-            attributes.get('du', '1')  # Duration
-        ]
-        if self.is_barcode:
-            data.append(attributes.get('BC', 'unclassified'))
-        return data
+def _uBAM_batch_reader(worker_config, uBAM_chunk):
+    """
+    read the uBAM records of a chunk and extract QC info from the pysam objects
+    :param worker_config: dictionary with the is_barcode, basecaller_qscore and batch_size settings
+    :param uBAM_chunk: (uBAM path, virtual offset of the first record, number of records) for SAM files,
+    (uBAM path, offset of the first BGZF block, offset of the block following the range,
+    virtual offset of the first record or None to search it, number of references) for BAM files or
+    (uBAM path,) to read a whole file
+    return: (chunk key, virtual offset of the first record, virtual offset of the record following the chunk,
+    dictionary with the read length, mean Qscore, type of read (pass or fail), start time, channel, duration and
+    barcode arrays)
+    """
+    if len(uBAM_chunk) == 1:
+        return tuple(uBAM_chunk), None, None, _uBAM_file_reader(worker_config, uBAM_chunk[0])
+
+    if len(uBAM_chunk) == 3:
+        start = end = None
+        records = read_batch(*uBAM_chunk)
+    else:
+        ubam, range_start, range_end, start, n_references = uBAM_chunk
+        if start is not None:
+            records, end = read_range(ubam, start, range_end)
+        else:
+            start = find_bam_record(ubam, range_start, n_references)
+            try:
+                records, end = read_range(ubam, start, range_end)
+            except (OSError, ValueError):
+                # Wrong guess of the first record, the range will be read again from the end of the previous one
+                records = []
+                start, end = -1, None
+
+    return tuple(uBAM_chunk[:3]), start, end, _records_to_columns(worker_config, records)
+
+
+def _verified_batches(results, worker_config):
+    """
+    The first record of a BGZF range is guessed by the workers, check that it is the record following
+    the previous range and read again the ranges where this is not the case
+    :param results: iterable of results of _uBAM_batch_reader()
+    :param worker_config: dictionary with the is_barcode, basecaller_qscore and batch_size settings
+    :return: a generator of the dictionaries of the results, the ranges of a file are yielded in order
+    """
+    pending = {}
+    next_range = defaultdict(int)
+    previous_end = {}
+    for key, start, end, rec_data in results:
+        if start is None:
+            yield rec_data
+            continue
+
+        ubam = key[0]
+        pending[ubam, key[1]] = key, start, end, rec_data
+        while (ubam, next_range[ubam]) in pending:
+            (_, range_start, range_end), start, end, rec_data = pending.pop((ubam, next_range[ubam]))
+            if ubam in previous_end and start != previous_end[ubam]:
+                _, start, end, rec_data = _uBAM_batch_reader(worker_config, (ubam, range_start, range_end,
+                                                                             previous_end[ubam], 0))
+            previous_end[ubam] = end
+            next_range[ubam] = range_end
+            yield rec_data
+
+
+def _uBAM_file_reader(worker_config, ubam):
+    """
+    read all the records of a uBAM file by batches
+    :param worker_config: dictionary with the is_barcode, basecaller_qscore and batch_size settings
+    :param ubam: path of the uBAM file
+    :return: the concatenated results of _records_to_columns() for the batches of the file
+    """
+    batches = []
+    with pysam.AlignmentFile(ubam, "rb", check_sq=False) as samfile:
+        while True:
+            records = list(islice(samfile, worker_config['batch_size']))
+            if not records:
+                break
+            batches.append(_records_to_columns(worker_config, records))
+    if not batches:
+        return _records_to_columns(worker_config, [])
+    return concatenate_batches(batches, list(batches[0]))
+
+
+def _records_to_columns(worker_config, records):
+    """
+    extract QC info from pysam objects
+    :param worker_config: dictionary with the is_barcode, basecaller_qscore and sampling settings
+    :param records: list of pysam.AlignedSegment objects
+    return: dictionary with the read length, mean Qscore, type of read (pass or fail), start time, channel, duration
+    and barcode arrays. When the reads are sampled, the dictionary also contains the random keys of the reads for
+    a fixed size sample and the read count and yield of the records before sampling.
+    """
+    sampling = worker_config.get('sampling')
+    if sampling is not None:
+        # Count all the reads and bases but only extract QC info from the sampled reads
+        totals = np.array([len(records), sum(rec.query_length for rec in records)], dtype=np.int64)
+        keys = sampling.read_keys([rec.query_name.encode() for rec in records])
+        selected = sampling.mask(keys)
+        keys = keys[selected]
+        records = [rec for rec, keep in zip(records, selected) if keep]
+
+    if worker_config['basecaller_qscore']:
+        # Use the mean qscore of the qs tag and only decode qualities of the records without it
+        qscores = [get_tag(rec, 'qs', None) for rec in records]
+        missing = [i for i, qscore in enumerate(qscores) if qscore is None]
+        if missing:
+            computed_qscores = avg_qual_batch([records[i].query_qualities or b'' for i in missing], phred_offset=0)
+            for i, qscore in zip(missing, computed_qscores.tolist()):
+                qscores[i] = qscore
+    else:
+        qscores = avg_qual_batch([rec.query_qualities or b'' for rec in records], phred_offset=0).tolist()
+    qscores = np.array(qscores, dtype=np.float64)
+    rec_data = {
+        'sequence_length': np.array([rec.query_length for rec in records], dtype=np.uint32),
+        'mean_qscore': qscores.astype(np.float32),
+        'start_time': _start_times(records),
+        'channel': np.array([get_tag(rec, 'ch', 1) for rec in records], dtype=np.int16),
+        'duration': np.array([get_tag(rec, 'du', 1.0) for rec in records], dtype=np.float32)
+    }
+    if worker_config['is_barcode']:
+        rec_data['barcode_arrangement'] = encode_categories([get_tag(rec, 'BC', 'unclassified') for rec in records])
+    if sampling is not None:
+        if sampling.count is not None:
+            rec_data['sample_key'] = keys
+        rec_data['totals'] = totals
+    return rec_data
+
+
+def _uBAM_chunk_size(uBAM_chunk):
+    """
+    Estimate the maximal number of records of a uBAM chunk
+    :param uBAM_chunk: uBAM chunk to read with _uBAM_batch_reader()
+    :return: the number of records
+    """
+    if len(uBAM_chunk) == 1:
+        return os.path.getsize(uBAM_chunk[0]) // 256 + 1
+    if len(uBAM_chunk) == 3:
+        return uBAM_chunk[2]
+    # A compressed BAM record of a nanopore read uses much more than 256 bytes
+    return (uBAM_chunk[2] - uBAM_chunk[1]) // 256 + 1
+
+
+def _start_times(records):
+    """
+    Get the start time of BAM records
+    :param records: list of pysam.AlignedSegment objects
+    :return: a numpy array with the start times, the index of the record in its chunk (starting at 1) is used
+    when a record has no start time
+    """
+    iso_start_times = [get_tag(rec, 'st', None) for rec in records]
+    missing = [i for i, iso_start_time in enumerate(iso_start_times) if iso_start_time is None]
+    if not missing:
+        return timeISO_to_float_batch(iso_start_times)
+
+    start_times = np.arange(1, len(records) + 1, dtype=np.float64)
+    present = np.array([iso_start_time is not None for iso_start_time in iso_start_times])
+    start_times[present] = timeISO_to_float_batch([t for t in iso_start_times if t is not None])
+    return start_times
@@ -1,3 +1,5 @@
+import threading
+import numpy as np
 import pandas as pd
 from math import log
 
@@ -10,30 +12,175 @@ def occupancy_channel(dataframe):
     return pd.DataFrame.describe(total_reads_per_channel)
 
 
+# Percentiles of the statistics, as computed by pandas.Series.describe()
+DESCRIBE_PERCENTILES = (0.25, 0.5, 0.75)
+
+# Levels of the NXX and LXX values written in the report.data file
+NXX_LEVELS = (10, 20, 30, 40, 50, 60, 70, 80, 90)
+
+# Maximal read length for sorting the read lengths by counting them
+_COUNTING_SORT_MAX_LENGTH = 1 << 22
+
+
+def assembly_metrics(lengths, levels=NXX_LEVELS, counts=None):
+    """
+    Compute the NXX and LXX values of read lengths for several levels at once. The lengths are sorted once in
+    descending order: NXX is the length of the read where the cumulative sum of the lengths reaches XX% of the
+    total sequence length and LXX is the number of reads needed to reach it
+    :param lengths: array of read lengths, or of distinct read lengths when counts is set
+    :param levels: percentages of the total sequence length
+    :param counts: array with the number of reads of each length or None
+    :return: dictionary with a (NXX, LXX) tuple for each level
+    """
+    values = np.asarray(lengths)
+    if counts is not None:
+        order = np.argsort(values, kind='stable')[::-1]
+        values, counts = values[order], np.asarray(counts, dtype=np.int64)[order]
+    elif values.dtype.kind == 'f':
+        values = np.sort(values[~np.isnan(values)])[::-1]
+        counts = np.ones(len(values), dtype=np.int64)
+    elif len(values) and values.min() >= 0 and values.max() < _COUNTING_SORT_MAX_LENGTH:
+        # Counting sort of the lengths
+        counts = np.bincount(values)[::-1]
+        values = np.arange(len(counts) - 1, -1, -1)
+    else:
+        values = np.sort(values)[::-1]
+        counts = np.ones(len(values), dtype=np.int64)
+
+    values = values.astype(np.float64 if values.dtype.kind == 'f' else np.int64)
+    bases = np.cumsum(values * counts)
+    if len(bases) == 0 or bases[-1] <= 0:
+        return {x: (0, 0) for x in levels}
+    reads = np.cumsum(counts)
+
+    thresholds = bases[-1] * np.asarray(levels, dtype=np.float64) / 100
+    index = np.searchsorted(bases, thresholds, side='left')
+    previous_bases = np.where(index > 0, bases[index - 1], 0)
+    previous_reads = np.where(index > 0, reads[index - 1], 0)
+    lxx = previous_reads + np.maximum(1, np.ceil((thresholds - previous_bases) / values[index]))
+    return {x: (int(values[i]), int(l)) for x, i, l in zip(levels, index, lxx)}
+
+
+class SortedStatistics:
+    """
+    Statistics of a distribution computed from its values sorted once: the extreme values and any quantile are
+    read from the sorted array with the linear interpolation of numpy.percentile() and pandas.Series.quantile()
+    """
+
+    def __init__(self, values):
+        """
+        :param values: values of the distribution (pd.Series or array), NaN values are ignored
+        """
+        self.values = values if isinstance(values, pd.Series) else pd.Series(values)
+        data = self.values.to_numpy()
+        if data.dtype.kind == 'f':
+            data = data[~np.isnan(data)]
+        self.sorted = np.sort(data)
+        self.count = len(self.sorted)
+
+    def mean(self):
+        return self.values.mean()
+
+    def std(self):
+        return self.values.std()
+
+    def min(self):
+        return self.sorted[0] if self.count else np.nan
+
+    def max(self):
+        return self.sorted[-1] if self.count else np.nan
+
+    def quantile(self, q):
+        """
+        Quantiles of the distribution
+        :param q: quantile or array of quantiles between 0 and 1
+        :return: a float or a numpy array of float
+        """
+        # Same dtype of the quantiles as numpy for identical results
+        if isinstance(q, (int, float)) and self.sorted.dtype.kind == 'f':
+            q = np.asarray(q, dtype=self.sorted.dtype)
+        else:
+            q = np.asarray(q)
+        if self.count == 0:
+            return np.full(q.shape, np.nan)[()]
+
+        # Same virtual indexes and interpolation as numpy
+        virtual_indexes = (self.count - 1) * q
+        previous_indexes = np.floor(virtual_indexes)
+        gamma = virtual_indexes - previous_indexes
+        previous_indexes = np.clip(previous_indexes.astype(np.intp), 0, self.count - 1)
+        next_indexes = np.minimum(previous_indexes + 1, self.count - 1)
+        previous_values, next_values = self.sorted[previous_indexes], self.sorted[next_indexes]
+        if previous_values.dtype.kind != 'f':
+            previous_values, next_values = previous_values.astype(np.float64), next_values.astype(np.float64)
+        diff = next_values - previous_values
+        return np.where(gamma >= 0.5, next_values - diff * (1 - gamma), previous_values + diff * gamma)[()]
+
+    def percentile(self, p):
+        """
+        Percentiles of the distribution
+        :param p: percentile or array of percentiles between 0 and 100
+        :return: a float or a numpy array of float
+        """
+        return self.quantile(np.true_divide(p, self.sorted.dtype.type(100) if self.sorted.dtype.kind == 'f' else 100))
+
+    def describe(self):
+        """
+        Statistics of the distribution
+        :return: a pd.Series object with the same index and values as pandas.Series.describe()
+        """
+        index = ['count', 'mean', 'std', 'min'] + ['{:g}%'.format(p * 100) for p in DESCRIBE_PERCENTILES] + ['max']
+        percentiles = self.percentile(np.array(DESCRIBE_PERCENTILES) * 100)
+        return pd.Series([float(self.count), self.mean(), self.std(), self.min()] + list(percentiles) + [self.max()],
+                         index=index, dtype=np.float64)
+
+
+class StatisticsCache:
+    """
+    SortedStatistics of the series of a dataframe_dict, computed at the first request of each series
+    """
+
+    def __init__(self, dataframe_dict):
+        """
+        :param dataframe_dict: dictionary of the series
+        """
+        self.dataframe_dict = dataframe_dict
+        self.statistics = {}
+        # The graphs are created by several threads that share the cache
+        self.lock = threading.Lock()
+
+    def __getitem__(self, key):
+        with self.lock:
+            series = self.dataframe_dict[key]
+            statistics = self.statistics.get(key)
+            # The series of a key can be replaced, e.g. by the reads kept in streaming mode
+            if statistics is None or statistics.values is not series:
+                statistics = SortedStatistics(series)
+                self.statistics[key] = statistics
+            return statistics
+
+
+def get_statistics(dataframe_dict, key):
+    """
+    Get the SortedStatistics of a series from the statistics cache attached to its dataframe_dict
+    :param dataframe_dict: dictionary of the series
+    :param key: key of the series in the dataframe_dict
+    :return: a SortedStatistics object
+    """
+    statistics_cache = dataframe_dict.get('statistics')
+    if statistics_cache is None:
+        statistics_cache = dataframe_dict.setdefault('statistics', StatisticsCache(dataframe_dict))
+    return statistics_cache[key]
+
+
 def compute_LXX(dataframe_dict, x):
     """Compute LXX value of total sequence length"""
-    data = dataframe_dict["all.reads.sequence.length"].dropna().values
-    data.sort()
-    half_sum = data.sum() * x / 100
-    cum_sum = 0
-    count = 0
-    for v in data:
-        cum_sum += int(v)
-        count += 1
-        if cum_sum >= half_sum:
-            return count
+    return assembly_metrics(dataframe_dict["all.reads.sequence.length"].values, (x,))[x][1]
 
 
 def compute_NXX(dataframe_dict, x):
     """Compute NXX value of total sequence length"""
-    data = dataframe_dict["all.reads.sequence.length"].dropna().values
-    data.sort()
-    half_sum = data.sum() * x / 100
-    cum_sum = 0
-    for v in data:
-        cum_sum += int(v)
-        if cum_sum >= half_sum:
-            return int(v)
+    return assembly_metrics(dataframe_dict["all.reads.sequence.length"].values, (x,))[x][0]
 
 
 def avg_qual(quals):
@@ -47,3 +194,55 @@ def avg_qual(quals):
         else:
             return None
 
+
+# Error probability of each possible quality byte for each supported Phred offset
+_phred_error_tables = {}
+
+
+def _phred_error_table(phred_offset):
+    """
+    Get the 256 entries lookup table of error probabilities for a quality encoding
+    :param phred_offset: offset of the quality encoding (33 for FASTQ/SAM text, 0 for raw BAM qualities)
+    :return: a numpy array of error probabilities indexed by quality byte
+    """
+    table = _phred_error_tables.get(phred_offset)
+    if table is None:
+        # Use the same expression as avg_qual() to get the same probabilities
+        table = np.array([10**((q - phred_offset) / -10) for q in range(256)], dtype=np.float64)
+        _phred_error_tables[phred_offset] = table
+    return table
+
+
+def avg_qual_batch(quals, phred_offset=33):
+    """
+    Estimates mean quality Phred score of a batch of reads.
+    All the quality strings are decoded at once as a single byte buffer.
+    :param quals: list of quality strings (str or bytes)
+    :param phred_offset: offset of the quality encoding
+    return: numpy array of float (NaN for empty quality strings)
+    """
+    n = len(quals)
+    if n == 0:
+        return np.empty(0, dtype=np.float64)
+
+    if isinstance(quals[0], str):
+        buffer = ''.join(quals).encode('ascii')
+    else:
+        buffer = b''.join(quals)
+
+    lengths = np.fromiter(map(len, quals), dtype=np.int64, count=n)
+    starts = np.zeros(n, dtype=np.int64)
+    np.cumsum(lengths[:-1], out=starts[1:])
+
+    result = np.full(n, np.nan, dtype=np.float64)
+    non_empty = lengths > 0
+    if not non_empty.any():
+        return result
+
+    error_probabilities = _phred_error_table(phred_offset)[np.frombuffer(buffer, dtype=np.uint8)]
+
+    # Reads are contiguous in the buffer, so summing from each non empty read start gives per read sums
+    sums = np.add.reduceat(error_probabilities, starts[non_empty])
+    result[non_empty] = [round(-10 * log(s / l, 10), 2) for s, l in zip(sums.tolist(),
+                                                                      lengths[non_empty].tolist())]
+    return result
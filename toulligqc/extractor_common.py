@@ -23,9 +23,15 @@
 import sys
 import gzip
 import bz2
+import re
 import time
+import zlib
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 import pandas as pd
 from toulligqc import common
+from toulligqc.common_statistics import SortedStatistics, assembly_metrics
 from datetime import datetime
 
 def set_result_value(extractor, result_dict, key: str, value):
@@ -66,18 +72,44 @@ def _check_result_key_value(key, value):
         raise TypeError("Invalid type for the value of the key {}: {} ".format(key, type(value)))
 
 
-def describe_dict(extractor, result_dict: dict, function, entry: str):
+def describe_dict(extractor, result_dict: dict, statistics, entry: str):
     """
     Set statistics for a key like mean, min, max, median and percentiles (without the count value) filled in the _set_result_value dictionary
     :param result_dict:
-    :param function: function returning the values to describe
+    :param statistics: SortedStatistics of the values to describe
     :param entry: entry to put in result_dict completed with the statistics
     """
-    stats = pd.Series.describe(function).drop("count")
+    stats = statistics.describe().drop("count")
     for key, value in stats.items():
         set_result_value(extractor, result_dict, entry + '.' + key, value)
 
 
+def nxx_dict(extractor, result_dict: dict, lengths, entry: str):
+    """
+    Set the NXX and LXX values of read lengths (N10..N90 and L10..L90) in the result_dict
+    :param result_dict:
+    :param lengths: read lengths
+    :param entry: entry to put in result_dict completed with the nXX and lXX keys
+    """
+    for x, (nxx, lxx) in assembly_metrics(lengths).items():
+        set_result_value(extractor, result_dict, entry + '.n' + str(x), nxx)
+        set_result_value(extractor, result_dict, entry + '.l' + str(x), lxx)
+
+
+def set_nxx_result_values(extractor, result_dict: dict, dataframe_dict: dict):
+    """
+    Set the N50 and L50 of all the reads and the NXX and LXX values of all, pass and fail reads in the result_dict
+    :param result_dict:
+    :param dataframe_dict: dictionary with the all, pass and fail read length series
+    """
+    all_reads_metrics = assembly_metrics(dataframe_dict["all.reads.sequence.length"].values)
+    set_result_value(extractor, result_dict, "n50", all_reads_metrics[50][0])
+    set_result_value(extractor, result_dict, "l50", all_reads_metrics[50][1])
+    nxx_dict(extractor, result_dict, dataframe_dict["all.reads.sequence.length"].values, "all.read.length")
+    nxx_dict(extractor, result_dict, dataframe_dict["pass.reads.sequence.length"].values, "pass.reads.sequence.length")
+    nxx_dict(extractor, result_dict, dataframe_dict["fail.reads.sequence.length"].values, "fail.reads.sequence.length")
+
+
 def count_boolean_elements(dataframe, column_name, boolean: bool) -> int:
     """
     Returns the number of values of a column filtered by a boolean
@@ -233,88 +265,83 @@ def extract_barcode_info(extractor, result_dict, barcode_selection, dataframe_di
     if 'other barcodes' not in barcode_selection:
         barcode_selection.append('other barcodes')
 
-    # Create dataframes filtered by barcodes and read quality
-    for index_barcode, barcode in enumerate(barcode_selection):
-        barcode_all_reads_df = df[df['barcode_arrangement'] == barcode]
-        barcode_pass_reads_df = barcode_all_reads_df.loc[df['passes_filtering'] == bool(True)]
-        barcode_fail_reads_df = barcode_all_reads_df.loc[df['passes_filtering'] == bool(False)]
+    # Group the reads by barcode, all the reads of a barcode are contiguous
+    barcode_groups = BarcodeGroups(df['barcode_arrangement'],
+                                   {column: df[column] for column in ('passes_filtering', 'sequence_length',
+                                                                      'mean_qscore')})
 
-        # Add all barcode statistics to result_dict based on values of selected dataframes
-        _barcode_stats(extractor,
-                       result_dict,
-                       barcode_all_reads_df,
-                       barcode_pass_reads_df,
-                       barcode_fail_reads_df,
-                       barcode)
+    # Add all barcode statistics to result_dict based on the reads of each barcode
+    for barcode in barcode_selection:
+        _barcode_stats(extractor, result_dict, barcode_groups, barcode)
 
-    # Add filtered dataframes (all info by barcode and by length or qscore) to dataframe_dict
-    _barcode_selection_dataframe(dataframe_dict, df, "sequence_length",
-                                 "barcode_selection_sequence_length_dataframe",
-                                 "length")
-    _barcode_selection_dataframe(dataframe_dict, df, "mean_qscore",
-                                 "barcode_selection_sequence_phred_dataframe",
-                                 "qscore")
+    # Add the grouped reads (read length and qscore by barcode and read type) to dataframe_dict
+    dataframe_dict["barcode.selection.groups"] = barcode_groups
 
 
-def _barcode_selection_dataframe(dataframe_dict, df, df_column_name: str, df_key_name: str,
-                                 melted_column_name: str):
+class BarcodeGroups:
     """
-    Create custom dataframes by grouping all reads per barcodes and per read type (pass/fail) for read length or phred score info
-    Reshape the dataframes from wide to long format to display barcode, read type and read length or phred score per read
-    These dataframes are used for sequence length and qscore boxplots
-    :param key: string name to put in dataframe_dict
-    :param df_column_name: name of the dataframe_1d column used for the new barcode_selection_dataframes
-    :param melted_column_name: value (qscore or length) to use for renaming column of melted dataframe
+    Values of the reads grouped by barcode without a column per barcode: the reads are sorted by barcode and the
+    reads of each barcode are a contiguous slice of the columns, delimited by offsets (CSR layout).
+    These groups are used for the barcode statistics and the sequence length and qscore boxplots
     """
-    # Count total number of rows
-    nrows = df.shape[0]
-    # Create a new dataframe with 3 columns : 'passes_filtering', 'barcode_arrangement' and the column name parameter
-    filtered_df = df.filter(
-        items=['passes_filtering', df_column_name, 'barcode_arrangement'])
-
-    # Reshape dataframe with new MultiIndex : numbered index of df length + passes filtering index and then shape data by barcode
-    barcode_selection_dataframe = filtered_df.set_index([pd.RangeIndex(start=0, stop=nrows), 'passes_filtering'],
-                                                        drop=True).pivot(columns="barcode_arrangement")
-
-    # Remove the column parameter index
-    barcode_selection_dataframe.columns.droplevel(level=0)
 
-    # Remove sequence_length Multindex to only have barcode_arrangement column labels
-    barcode_selection_dataframe.columns = barcode_selection_dataframe.columns.droplevel(
-        level=0)
+    def __init__(self, barcodes, columns: dict):
+        """
+        :param barcodes: barcode of each read (series)
+        :param columns: dictionary of the columns to group (series or arrays of the same length as barcodes)
+        """
+        codes, names = pd.factorize(barcodes, sort=True)
+        found = codes >= 0
+        counts = np.bincount(codes[found], minlength=len(names))
 
-    # Reset index to have all labels in the same level
-    barcode_selection_dataframe.reset_index(
-        level='passes_filtering', inplace=True)
+        # Stable sort on the codes to keep the reads of each barcode in the order of the input
+        order = np.argsort(codes[found], kind='stable')
+        self.barcodes = [str(name) for name, count in zip(names, counts) if count > 0]
+        self.offsets = dict(zip(map(str, names), zip(np.cumsum(counts) - counts, np.cumsum(counts))))
+        self.columns = {column: np.asarray(values)[found][order] for column, values in columns.items()}
 
-    # Add final dataframe to dataframe_dict
-    dataframe_dict[df_key_name] = barcode_selection_dataframe
+    def values(self, column: str, barcode: str, passes_filtering=None):
+        """
+        Values of the reads of a barcode
+        :param column: name of the column
+        :param barcode: name of the barcode
+        :param passes_filtering: True or False to only get the pass or fail reads, None for all the reads
+        :return: a numpy array, a view on the grouped column for all the reads
+        """
+        start, end = self.offsets.get(barcode, (0, 0))
+        values = self.columns[column][start:end]
+        if passes_filtering is not None:
+            values = values[self.columns['passes_filtering'][start:end] == bool(passes_filtering)]
+        return values
 
 
-def _barcode_stats(extractor, result_dict, barcode_selected_dataframe, barcode_selected_read_pass_dataframe,
-                   barcode_selected_read_fail_dataframe, barcode_name):
+def _barcode_stats(extractor, result_dict, barcode_groups, barcode_name):
     """
     :param result_dict:
-    :param prefix: report.data id of the extractor (string)
-    :param barcode_selected: barcode filtered dataframes
-    Put statistics (with describe method) about barcode length and qscore in result_dict for each selected dataframe : all.read/read.pass and read.fail
+    :param barcode_groups: BarcodeGroups of the reads
+    :param barcode_name: name of the barcode
+    Put statistics (with describe method) about barcode length and qscore in result_dict for each read type : all.read/read.pass and read.fail
     N.b. does not include count statistic for qscore
     """
-    df_dict = {'all.read.': barcode_selected_dataframe,
-               'read.pass.': barcode_selected_read_pass_dataframe,
-               'read.fail.': barcode_selected_read_fail_dataframe}
-
-    for df_name, df in df_dict.items():  # df_dict.items = all.read/read.pass/read.fail
-        for stats_index, stats_value in df['sequence_length'].describe().items():
+    read_types = {'all.read.': None,
+                  'read.pass.': True,
+                  'read.fail.': False}
+
+    for df_name, passes_filtering in read_types.items():  # all.read/read.pass/read.fail
+        lengths = barcode_groups.values('sequence_length', barcode_name, passes_filtering)
+        qscores = barcode_groups.values('mean_qscore', barcode_name, passes_filtering)
+        for stats_index, stats_value in SortedStatistics(lengths).describe().items():
             key_to_result_dict = df_name + barcode_name.replace(' ', '.') + '.length.' + stats_index
             set_result_value(extractor,
                              result_dict, key_to_result_dict, stats_value)
 
-        for stats_index, stats_value in df['mean_qscore'].describe().drop('count').items():
+        for stats_index, stats_value in SortedStatistics(qscores).describe().drop('count').items():
             key_to_result_dict = df_name + barcode_name + '.qscore.' + stats_index
             set_result_value(extractor,
                              result_dict, key_to_result_dict, stats_value)
 
+        nxx_dict(extractor, result_dict, lengths, df_name + barcode_name.replace(' ', '.') + '.length')
+
 
 def _barcode_frequency(extractor, barcode_selection, result_dict, entry: str, df_filtered) -> pd.Series:
     """
@@ -328,43 +355,8 @@ def _barcode_frequency(extractor, barcode_selection, result_dict, entry: str, df
     """
     # Regroup all barcoded read in Series
     all_barcode_count = df_filtered.value_counts()
-
-    # Retain only existing barcodes from barcode_selection list
-    barcodes_found = set(df_filtered.unique())
-    barcode_selection_existing = [x for x in barcode_selection if x in barcodes_found]
-
-    # Sort by list of barcode_selection
-    count_sorted = all_barcode_count.sort_index()[barcode_selection_existing]
-    # Replace all NaN values to zero
-    count_sorted.fillna(0, downcast='int16', inplace=True)
-
-    # Compute sum of all used barcodes without barcode 'unclassified'
-    #set_result_value(extractor, result_dict, entry + '.count', sum(count_sorted.drop("unclassified")))
-    if 'unclassified' in count_sorted.index:
-        set_result_value(extractor, result_dict, entry + '.count', sum(count_sorted.drop("unclassified")))
-    else:
-        set_result_value(extractor, result_dict, entry + '.count', sum(count_sorted))
-
-    # Replace entry name ie read.pass/fail.barcode with read.pass/fail.non.used.barcodes.count
-    non_used_barcodes_count_key = entry.replace(".barcoded", ".non.used.barcodes.count")
-
-    # Compute all reads of barcodes that are not in the barcode_selection list
-    other_barcode_count = sum(all_barcode_count) - sum(count_sorted)
-    set_result_value(extractor, result_dict, non_used_barcodes_count_key, other_barcode_count)
-
-    # Create Series for all non-used barcode counts and rename index array with "other"
-    other_all_barcode_count = pd.Series(other_barcode_count, index=['other barcodes'])
-
-    # Append Series of non-used barcode counts to the Series of barcode_selection counts
-    count_sorted = pd.concat([count_sorted, other_all_barcode_count]).sort_index()
-
-    # Compute frequency for all barcode counts and save into dataframe_dict
-    for barcode in count_sorted.to_dict():
-        frequency_value = count_sorted[barcode] * 100 / sum(count_sorted)
-        set_result_value(extractor, result_dict, entry.replace(".barcoded", ".") + barcode + ".frequency",
-                         frequency_value)
-
-    return count_sorted
+    return barcode_counts(extractor, barcode_selection, result_dict, entry, all_barcode_count,
+                          set(df_filtered.unique()))
 
 
 def _barcode_bases(extractor, barcode_selection, result_dict, entry: str, df_filtered) -> pd.Series:
@@ -379,9 +371,23 @@ def _barcode_bases(extractor, barcode_selection, result_dict, entry: str, df_fil
     """
     # Regroup all barcoded and sum all read lengths in df
     all_barcode_count = df_filtered.groupby('barcode_arrangement')['sequence_length'].sum()
+    return barcode_counts(extractor, barcode_selection, result_dict, entry, all_barcode_count,
+                          set(df_filtered['barcode_arrangement'].unique()))
+
 
+def barcode_counts(extractor, barcode_selection, result_dict, entry: str, all_barcode_count,
+                   barcodes_found) -> pd.Series:
+    """
+    Computes sum of counts by barcode_selection, and sum of unclassified counts from the read or base counts
+    of each barcode. Regroup all non used barcodes in index "other"
+    Compute all frequency values for each barcode count
+    :param result_dict: result dictionary with statistics
+    :param entry: entry about barcoded counts
+    :param all_barcode_count: Series with the count of reads or bases of each barcode
+    :param barcodes_found: set of the barcodes of the reads
+    :return: Series with all barcodes (used, non used, and unclassified) frequencies
+    """
     # Retain only existing barcodes from barcode_selection list
-    barcodes_found = set(df_filtered['barcode_arrangement'].unique())
     barcode_selection_existing = [x for x in barcode_selection if x in barcodes_found]
 
     # Sort by list of barcode_selection
@@ -395,6 +401,7 @@ def _barcode_bases(extractor, barcode_selection, result_dict, entry: str, df_fil
         set_result_value(extractor, result_dict, entry + '.count', sum(count_sorted.drop("unclassified")))
     else:
         set_result_value(extractor, result_dict, entry + '.count', sum(count_sorted))
+
     # Replace entry name ie read.pass/fail.barcode with read.pass/fail.non.used.barcodes.count
     non_used_barcodes_count_key = entry.replace(".barcoded", ".non.used.barcodes.count")
 
@@ -410,9 +417,9 @@ def _barcode_bases(extractor, barcode_selection, result_dict, entry: str, df_fil
 
     # Compute frequency for all barcode counts and save into dataframe_dict
     for barcode in count_sorted.to_dict():
-         frequency_value = count_sorted[barcode] * 100 / sum(count_sorted)
-         set_result_value(extractor, result_dict, entry.replace(".barcoded", ".") + barcode + ".frequency",
-                          frequency_value)
+        frequency_value = count_sorted[barcode] * 100 / sum(count_sorted)
+        set_result_value(extractor, result_dict, entry.replace(".barcoded", ".") + barcode + ".frequency",
+                         frequency_value)
 
     return count_sorted
 
@@ -423,10 +430,31 @@ def log_task(quiet, msg, start_time, end_time):
         print('  - {:} in {:}'.format(msg, common.format_duration(delta)))
 
 
-def add_image_to_result(quiet, image_list, start_time, image):
-    end_time = time.time()
-    log_task(quiet, 'Creation of image "{0}"'.format(image[0]), start_time, end_time)
-    image_list.append(image)
+def _run_graph_task(graph_task):
+    start_time = time.time()
+    image = graph_task()
+    return image, start_time, time.time()
+
+
+def generate_images(quiet, graph_tasks, n_threads):
+    """
+    Create the images of the graphs with a pool of threads. The graph tasks share the series of the extractor
+    without copying them, and numpy releases the GIL during most of the computations of the graphs
+    :param quiet: if True, the creation of the images is not logged
+    :param graph_tasks: list of functions without arguments creating an image (e.g. functools.partial objects)
+    :param n_threads: number of threads
+    :return: images array containing the title and the path toward the images, in the order of the graph tasks
+    """
+    images = []
+    if not graph_tasks:
+        return images
+    with ThreadPoolExecutor(max(1, min(n_threads, len(graph_tasks)))) as executor:
+        futures = [executor.submit(_run_graph_task, graph_task) for graph_task in graph_tasks]
+        for future in futures:
+            image, start_time, end_time = future.result()
+            log_task(quiet, 'Creation of image "{0}"'.format(image[0]), start_time, end_time)
+            images.append(image)
+    return images
 
 
 def timeISO_to_float(iso_datetime, format):
@@ -441,6 +469,38 @@ def timeISO_to_float(iso_datetime, format):
         return unix_timestamp
 
 
+# ISO 8601 date with fractional seconds and a timezone, the format written by MinKNOW
+_iso_datetime_pattern = re.compile(r'\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}\.\d{1,6}(Z|[+-]\d{2}:?\d{2})')
+
+
+def timeISO_to_float_batch(iso_datetimes, format='%Y-%m-%dT%H:%M:%S.%f%z'):
+    """
+    Convert a list of ISO 8601 dates to timestamps, with the same result as timeISO_to_float().
+    The dates are converted at once when they all share the timezone of the first date.
+    :param iso_datetimes: list of dates as strings
+    :param format: format of the dates used when they cannot be converted at once
+    :return: a numpy array with the timestamps
+    """
+    if len(iso_datetimes) == 0:
+        return np.empty(0, dtype=np.float64)
+
+    match = _iso_datetime_pattern.fullmatch(iso_datetimes[0])
+    if match:
+        timezone = match.group(1)
+        if all(d.endswith(timezone) for d in iso_datetimes):
+            try:
+                dates = np.array([d[:-len(timezone)] for d in iso_datetimes], dtype='datetime64[us]')
+            except ValueError:
+                dates = None
+            if dates is not None:
+                offset = 0
+                if timezone != 'Z':
+                    offset = (int(timezone[1:3]) * 3600 + int(timezone[-2:]) * 60) * (-1 if timezone[0] == '-' else 1)
+                return (dates.astype(np.int64) - offset * 1000000) / 1000000
+
+    return np.array([timeISO_to_float(d, format) for d in iso_datetimes], dtype=np.float64)
+
+
 def read_first_line_file(filename):
     """
     Load the first line of a file.
@@ -478,12 +538,189 @@ def set_result_dict_telemetry_value(result_dict, key, new_value):
     result_dict[final_key] = new_value
 
 
-def pd_read_sequencing_summary(file, cols, data_type):
+def pd_read_sequencing_summary(file, cols, data_type, sampling=None):
+        """
+        Read the columns of a sequencing summary file
+        :param file: path of the sequencing summary file
+        :param cols: columns to read
+        :param data_type: dictionary with the type of the columns
+        :param sampling: ReadSampling object or None to read all the rows
+        :return: a Pandas Dataframe object or (sampled dataframe, exact read count and yield of the file)
+        if sampling is not None
+        """
         try:
-            return pd.read_csv(file, sep="\t", usecols=cols,
-                            dtype=data_type)
+            return _read_sequencing_summary(file, cols, data_type, sampling)
         except:
             del data_type['passes_filtering']
             cols.remove('passes_filtering')
-            return pd.read_csv(file, sep="\t", usecols=cols,
-                            dtype=data_type)
\ No newline at end of file
+            return _read_sequencing_summary(file, cols, data_type, sampling)
+
+
+def _read_sequencing_summary(file, cols, data_type, sampling):
+    if sampling is None:
+        return pd.read_csv(file, sep="\t", usecols=cols, dtype=data_type)
+
+    # Read the file by chunks and only keep the sampled rows of each chunk
+    chunks = []
+    totals = np.zeros(2, dtype=np.int64)
+    with pd.read_csv(file, sep="\t", usecols=cols, dtype=data_type,
+                     chunksize=SAMPLING_CHUNK_SIZE) as reader:
+        for i, chunk in enumerate(reader):
+            totals += len(chunk), int(chunk['sequence_length_template'].sum())
+            keys = sampling.keys((file, i), len(chunk))
+            selected = sampling.mask(keys)
+            chunk = chunk[selected]
+            if sampling.count is not None:
+                chunk = chunk.assign(sample_key=keys[selected])
+            chunks.append(chunk)
+
+    dataframe = pd.concat(chunks, ignore_index=True)
+    for column in dataframe.columns:
+        if data_type.get(column) == 'category':
+            dataframe[column] = dataframe[column].astype('category')
+    return dataframe, totals
+
+
+# Number of rows of the chunks of sequencing summary files sampled
+SAMPLING_CHUNK_SIZE = 100000
+
+
+class ReadSampling:
+    """
+    Seeded and reproducible sampling of the reads. A fraction of the reads is sampled with Bernoulli trials and a
+    fixed number of reads with the bottom-k method: a random key is drawn for each read and the reads with the k
+    smallest keys are kept. Like a reservoir sampling, this gives a uniform sample of k reads, but the
+    samples of chunks of reads processed in parallel can be merged.
+    """
+
+    def __init__(self, fraction=None, count=None, seed=42):
+        """
+        :param fraction: fraction of the reads to sample
+        :param count: number of reads to sample
+        :param seed: seed of the random keys
+        """
+        self.fraction = fraction
+        self.count = count
+        self.seed = seed
+
+    def __eq__(self, other):
+        return isinstance(other, ReadSampling) and \
+            (self.fraction, self.count, self.seed) == (other.fraction, other.count, other.seed)
+
+    def __hash__(self):
+        return hash((self.fraction, self.count, self.seed))
+
+    @staticmethod
+    def from_config(config_dictionary):
+        """
+        Create the sampling of the reads from the configuration
+        :param config_dictionary: configuration dictionary with the optional sample and sample_seed settings
+        :return: a ReadSampling object or None if the reads are not sampled
+        """
+        value = config_dictionary.get('sample', 'None')
+        if value is None or str(value).lower() in ('', 'none'):
+            return None
+        seed = int(config_dictionary.get('sample_seed', 42))
+        fraction, count = parse_sample_size(value)
+        return ReadSampling(fraction, count, seed)
+
+    def keys(self, chunk, size):
+        """
+        Draw the random keys of the reads of a chunk, the keys only depend on the seed and on the chunk.
+        The chunks must not depend on the number of threads, use read_keys() when the names of the reads are known
+        :param chunk: content of the chunk (bytes) or any object identifying the chunk
+        :param size: number of reads of the chunk
+        :return: a numpy array with a key in [0, 1) for each read
+        """
+        chunk_id = zlib.crc32(chunk if isinstance(chunk, bytes) else repr(chunk).encode())
+        return np.random.default_rng([self.seed, chunk_id]).random(size)
+
+    def read_keys(self, read_names):
+        """
+        Draw the random keys of reads from their names, the key of a read only depends on the seed and on its name
+        so the sample does not depend on how the reads are split in chunks
+        :param read_names: list of the names of the reads (bytes)
+        :return: a numpy array with a key in [0, 1) for each read
+        """
+        seed = str(self.seed).encode()
+        digests = b''.join(hashlib.blake2b(name, digest_size=8, key=seed).digest() for name in read_names)
+        return (np.frombuffer(digests, dtype='<u8') >> np.uint64(11)) * 2.0 ** -53
+
+    def mask(self, keys):
+        """
+        Select the reads of a chunk to keep
+        :param keys: random keys of the reads of the chunk
+        :return: a boolean numpy array, for a fixed number of reads all the reads that can be in the final sample
+        are kept and the sample is completed by select()
+        """
+        if self.fraction is not None:
+            return keys < self.fraction
+        if self.count >= len(keys):
+            return np.ones(len(keys), dtype=bool)
+        return keys <= np.partition(keys, self.count - 1)[self.count - 1]
+
+    def select(self, dataframe):
+        """
+        Keep the reads of the final sample
+        :param dataframe: dataframe of the reads selected by mask() with their key in the sample_key column
+        for a fixed number of reads
+        :return: the dataframe of the sampled reads
+        """
+        if 'sample_key' not in dataframe.columns:
+            return dataframe
+        if self.count < len(dataframe):
+            dataframe = dataframe.iloc[np.sort(np.argsort(dataframe['sample_key'].to_numpy(),
+                                                         kind='stable')[:self.count])]
+            dataframe = dataframe.reset_index(drop=True)
+        return dataframe.drop(columns='sample_key')
+
+    def description(self):
+        """
+        Describe the sampling in the report
+        :return: a string
+        """
+        if self.fraction is not None:
+            return '{:g}% of the reads (seed {})'.format(self.fraction * 100, self.seed)
+        return '{:,d} reads (seed {})'.format(self.count, self.seed)
+
+
+def parse_sample_size(value):
+    """
+    Parse the size of the sample of reads
+    :param value: fraction of the reads (lower than 1) or number of reads
+    :return: (fraction, None) or (None, number of reads)
+    """
+    size = float(value)
+    if 0 < size < 1:
+        return size, None
+    if size >= 1 and size.is_integer():
+        return None, int(size)
+    raise ValueError("Invalid sample size: " + str(value))
+
+
+def set_sampling_result_values(extractor, result_dict, sampling, totals):
+    """
+    Replace the read count and the yield computed on the sampled reads by their exact values and
+    scale the read and base counts of the sample to the total number of reads
+    :param result_dict: result dictionary
+    :param sampling: ReadSampling object
+    :param totals: exact read count and yield
+    """
+    read_count, run_yield = (int(total) for total in totals)
+    sampled_read_count = get_result_value(extractor, result_dict, "read.count")
+    set_result_value(extractor, result_dict, "sampling", sampling.description())
+    set_result_value(extractor, result_dict, "sampled.read.count", sampled_read_count)
+    set_result_value(extractor, result_dict, "read.count", read_count)
+    set_result_value(extractor, result_dict, "yield", run_yield)
+
+    # Estimations from the sampled reads of all the read and base counts, the count of the channel occupancy
+    # statistics is a number of channels
+    prefix = extractor.get_report_data_file_id() + '.'
+    exact_keys = {"read.count", "sampled.read.count", "channel.occupancy.statistics.count"}
+    count_keys = [key[len(prefix):] for key in result_dict
+                  if key.startswith(prefix) and key[len(prefix):] not in exact_keys
+                  and re.search(r'(^|\.)(l\d+|count)$', key[len(prefix):])]
+    for key in count_keys:
+        value = get_result_value(extractor, result_dict, key)
+        set_result_value(extractor, result_dict, key,
+                         int(round(value * read_count / sampled_read_count)) if sampled_read_count else 0)
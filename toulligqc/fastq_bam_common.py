@@ -1,7 +1,30 @@
+import atexit
+import glob
+import gzip
 import multiprocessing as mp
+import os
+import queue
+import re
+import struct
+import threading
+import zlib
+import numpy as np
+import pandas as pd
+import pysam
+from itertools import islice
+from multiprocessing import resource_tracker, shared_memory
 from tqdm import tqdm
 from concurrent.futures import ProcessPoolExecutor, as_completed
 
+# Use a faster implementation of zlib if available
+try:
+    from isal import igzip as gzip_backend, isal_zlib as zlib_backend
+except ImportError:
+    try:
+        from zlib_ng import gzip_ng as gzip_backend, zlib_ng as zlib_backend
+    except ImportError:
+        gzip_backend, zlib_backend = gzip, zlib
+
 def extract_headerTag(header, tagGroup, tag, defaultValue = None):
 
     if tagGroup not in header:
@@ -21,23 +44,664 @@ def extract_headerTag(header, tagGroup, tag, defaultValue = None):
     return first_entry[tag]
 
 
-def batch_iterator(iterator, batch_size):
-    batch = []
-    i=0
-    for entry in iterator:
-        i += 1
-        batch.append(entry.to_string())
-        if i == batch_size:
-            yield batch
-            batch = []
-            i = 0
-    if len(batch):
-        yield batch
+def batch_iterator(samfile, batch_size):
+    """
+    Split an alignment file in batches of records without converting the records
+    :param samfile: pysam.AlignmentFile object
+    :param batch_size: number of records in a batch
+    yield : (virtual offset of the first record of the batch, number of records of the batch)
+    """
+    offset = samfile.tell()
+    count = 0
+    for _ in samfile:
+        count += 1
+        if count == batch_size:
+            yield offset, count
+            offset = samfile.tell()
+            count = 0
+    if count:
+        yield offset, count
+
+
+def read_batch(filename, offset, count):
+    """
+    Read a batch of records of an alignment file
+    :param filename: path of the alignment file
+    :param offset: virtual offset of the first record of the batch
+    :param count: number of records to read
+    :return: a list of pysam.AlignedSegment objects
+    """
+    with pysam.AlignmentFile(filename, "rb", check_sq=False) as samfile:
+        samfile.seek(offset)
+        return list(islice(samfile, count))
+
+
+def expand_input_files(paths, extensions):
+    """
+    Expand the directories and glob patterns of a list of input files
+    :param paths: list of file paths, directories or glob patterns
+    :param extensions: extensions of the files to keep in the directories
+    :return: the list of the input files, the paths that match nothing are kept to be reported as missing
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            found = []
+            for root, _, filenames in os.walk(path):
+                found.extend(os.path.join(root, filename) for filename in filenames
+                             if filename.endswith(tuple(extensions)))
+            files.extend(sorted(found))
+        elif not os.path.exists(path) and glob.has_magic(path):
+            files.extend(sorted(glob.glob(path)) or [path])
+        else:
+            files.append(path)
+    return files
+
+
+def schedule_files(files, n_process):
+    """
+    Check if whole files should be processed by the workers instead of chunks of files and sort them
+    by decreasing size, so the largest files are read first and the smaller ones balance the load at the end
+    :param files: list of input files
+    :param n_process: number of worker processes
+    :return: the files sorted by decreasing size or None if the files must be split in chunks
+    """
+    if len(files) < 2 or len(files) < n_process:
+        return None
+    return sorted(files, key=os.path.getsize, reverse=True)
+
+
+# Size of the byte ranges of BGZF blocks processed by a worker
+BGZF_RANGE_SIZE = 4 * 1024 * 1024
+
+# Fixed part of a BAM record: block_size, refID, pos, l_read_name, mapq, bin, n_cigar_op, flag, l_seq,
+# next_refID, next_pos, tlen
+_bam_record_struct = struct.Struct('<iiiBBHHHiiii')
+_bam_read_name_pattern = re.compile(rb'[!-?A-~]+\x00')
+
+
+def _read_bgzf_header(f, filename):
+    """
+    Read the header of a BGZF block
+    :param f: BGZF file opened in binary mode and positioned at the start of a block
+    :param filename: path of the file
+    :return: the size of the block and the size of its header or None at the end of the file
+    :raise ValueError: if the file is not a BGZF file
+    """
+    header = f.read(12)
+    if not header:
+        return None
+    if len(header) < 12 or header[:4] != b'\x1f\x8b\x08\x04':
+        raise ValueError('Not a BGZF file: ' + filename)
+    extra_length = struct.unpack_from('<H', header, 10)[0]
+    extra = f.read(extra_length)
+    block_size = _bgzf_block_size(extra)
+    if block_size is None:
+        raise ValueError('Not a BGZF file: ' + filename)
+    return block_size, 12 + extra_length
+
+
+def _bgzf_block_size(extra):
+    """
+    Get the size of a BGZF block from the extra field of its gzip header
+    :param extra: extra field of the gzip header
+    :return: the size of the block or None if the extra field does not contain the BGZF block size
+    """
+    i = 0
+    while i + 4 <= len(extra):
+        subfield_length = struct.unpack_from('<H', extra, i + 2)[0]
+        if extra[i:i + 2] == b'BC' and subfield_length == 2:
+            return struct.unpack_from('<H', extra, i + 4)[0] + 1
+        i += 4 + subfield_length
+    return None
+
+
+def bgzf_decompress_range(filename, start, end):
+    """
+    Decompress a range of consecutive BGZF blocks
+    :param filename: path of the BGZF file
+    :param start: file offset of the first block
+    :param end: file offset of the block following the range
+    :return: the uncompressed data of the blocks
+    """
+    with open(filename, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+    blocks = []
+    pos = 0
+    while pos + 12 <= len(data):
+        extra_length = struct.unpack_from('<H', data, pos + 10)[0]
+        block_size = _bgzf_block_size(data[pos + 12:pos + 12 + extra_length])
+        blocks.append(zlib_backend.decompress(data[pos + 12 + extra_length:pos + block_size - 8], wbits=-15))
+        pos += block_size
+    return b''.join(blocks)
+
+
+def gzip_open(filename):
+    """
+    Open a gzip file in binary mode with the fastest available implementation of zlib
+    :param filename: path of the gzip file
+    :return: a file object
+    """
+    return gzip_backend.open(filename, 'rb')
+
+
+def prefetch(iterator, max_size=4):
+    """
+    Iterate over an iterator in a background thread, like the decompression of a gzip file that releases the GIL,
+    while the caller processes the previous items
+    :param iterator: iterator to prefetch
+    :param max_size: maximal number of prefetched items
+    yield : the items of the iterator
+    """
+    items = queue.Queue(max_size)
+    stop = threading.Event()
+    end = object()
+
+    def put(item, error=None):
+        # Give up when the caller stops iterating
+        while not stop.is_set():
+            try:
+                items.put((item, error), timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def producer():
+        try:
+            for item in iterator:
+                if not put(item):
+                    return
+            put(end)
+        except BaseException as e:
+            put(end, e)
+
+    thread = threading.Thread(target=producer, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item, error = items.get()
+            if error is not None:
+                raise error
+            if item is end:
+                break
+            yield item
+    finally:
+        stop.set()
+        thread.join()
+
+
+def bgzf_block_offsets(filename):
+    """
+    Scan the headers of the BGZF blocks of a file without decompressing them
+    :param filename: path of the BGZF file
+    :return: a list with the file offsets of the blocks
+    :raise ValueError: if the file is not a BGZF file
+    """
+    offsets = []
+    with open(filename, 'rb') as f:
+        offset = 0
+        while True:
+            header = _read_bgzf_header(f, filename)
+            if header is None:
+                break
+            offsets.append(offset)
+            offset += header[0]
+            f.seek(offset)
+    return offsets
+
+
+def bgzf_ranges(block_offsets, file_size, n_ranges, range_size=BGZF_RANGE_SIZE):
+    """
+    Split the BGZF blocks of a file in ranges of consecutive blocks
+    :param block_offsets: file offsets of the blocks
+    :param file_size: size of the file
+    :param n_ranges: minimal number of ranges
+    :param range_size: maximal size in bytes of a range
+    :return: a list of (offset of the first block, offset of the block following the range)
+    """
+    range_size = max(1, min(range_size, file_size // max(1, n_ranges)))
+    ranges = []
+    start = block_offsets[0] if block_offsets else file_size
+    for offset in block_offsets[1:]:
+        if offset - start >= range_size:
+            ranges.append((start, offset))
+            start = offset
+    ranges.append((start, file_size))
+    return ranges
+
+
+def _is_bam_record(data, pos, n_references, depth=3):
+    """
+    Check if a BAM record may start at a position of uncompressed BAM data
+    :param data: uncompressed BAM data
+    :param pos: position to check
+    :param n_references: number of reference sequences of the BAM header
+    :param depth: number of consecutive records to check
+    :return: True if the position looks like the start of a record
+    """
+    if pos + _bam_record_struct.size > len(data):
+        return False
+    block_size, ref_id, ref_pos, l_read_name, _, _, n_cigar_op, _, l_seq, next_ref_id, next_pos, _ = \
+        _bam_record_struct.unpack_from(data, pos)
+    if l_read_name < 2 or l_seq < 0 or ref_pos < -1 or next_pos < -1 \
+            or not -1 <= ref_id < n_references or not -1 <= next_ref_id < n_references \
+            or 32 + l_read_name + 4 * n_cigar_op + (l_seq + 1) // 2 + l_seq > block_size:
+        return False
+    name_start = pos + _bam_record_struct.size
+    if not _bam_read_name_pattern.fullmatch(data, name_start, name_start + l_read_name):
+        return False
+    next_record = pos + 4 + block_size
+    if depth == 1 or next_record + _bam_record_struct.size > len(data):
+        return True
+    return _is_bam_record(data, next_record, n_references, depth - 1)
+
+
+def find_bam_record(filename, block_offset, n_references, window_size=256 * 1024):
+    """
+    Find the first BAM record starting in a BGZF block or in the following blocks.
+    The record boundaries are guessed from the content of the blocks, the result must be checked by the caller.
+    :param filename: path of the BAM file
+    :param block_offset: file offset of the first block to search
+    :param n_references: number of reference sequences of the BAM header
+    :param window_size: minimal size of the uncompressed data used to check the chaining of the records
+    :return: the virtual offset of the record or the virtual offset of the last block if no record has been found
+    """
+    blocks = []
+    next_offset = block_offset
+    with open(filename, 'rb') as f:
+        while True:
+            # Decompress the following blocks to be able to check the chaining of the records
+            while next_offset is not None and (not blocks or sum(len(data) for _, data in blocks) < window_size):
+                f.seek(next_offset)
+                header = _read_bgzf_header(f, filename)
+                if header is None:
+                    next_offset = None
+                    break
+                block_size, header_size = header
+                blocks.append((next_offset, zlib_backend.decompress(f.read(block_size - header_size - 8), wbits=-15)))
+                next_offset += block_size
+
+            if not blocks:
+                return block_offset << 16
+            block_offset, first_block = blocks[0]
+            data = b''.join(data for _, data in blocks)
+            for pos in range(len(first_block)):
+                if _is_bam_record(data, pos, n_references):
+                    return block_offset << 16 | pos
+            if len(blocks) == 1 and next_offset is None:
+                return block_offset << 16
+            blocks.pop(0)
+
+
+def read_range(filename, start, end_block):
+    """
+    Read the records of an alignment file starting in a range of BGZF blocks
+    :param filename: path of the alignment file
+    :param start: virtual offset of the first record of the range
+    :param end_block: file offset of the first block after the range
+    :return: a list of pysam.AlignedSegment objects and the virtual offset of the first record after the range
+    """
+    records = []
+    with pysam.AlignmentFile(filename, "rb", check_sq=False) as samfile:
+        samfile.seek(start)
+        while samfile.tell() >> 16 < end_block:
+            record = next(samfile, None)
+            if record is None:
+                break
+            records.append(record)
+        return records, samfile.tell()
+
+
+def get_tag(record, tag, default_value):
+    """
+    Get the value of a tag of an alignment record
+    :param record: pysam.AlignedSegment object
+    :param tag: name of the tag
+    :param default_value: value to return if the tag is missing
+    :return: the value of the tag
+    """
+    try:
+        return record.get_tag(tag)
+    except KeyError:
+        return default_value
+
+
+def pass_filter(mean_qscores, threshold):
+    """
+    Get the type of the reads (pass or fail) from their mean Qscore. The workers only extract the mean Qscores, so
+    the parsed columns do not depend on the threshold
+    :param mean_qscores: numpy array of the mean Qscores
+    :param threshold: Qscore threshold
+    :return: numpy boolean array, True for the pass reads
+    """
+    return mean_qscores > threshold
+
+
+def encode_categories(values):
+    """
+    Encode a list of values as integer codes
+    :param values: list of values
+    :return: (numpy array with the codes of the values, list of the categories)
+    """
+    categories, codes = np.unique(np.asarray(values, dtype=object), return_inverse=True)
+    return codes.astype(np.int32), categories.tolist()
+
+
+def concatenate_batches(batches, columns):
+    """
+    Concatenate the columns of batches processed by the workers
+    :param batches: non empty list of dictionaries with a numpy array for each column or
+    a (codes, categories) tuple for categorical columns
+    :param columns: names of the columns
+    :return: a dictionary with the concatenated columns, categorical columns are still (codes, categories) tuples
+    """
+    data = {}
+    for column in columns:
+        parts = [batch[column] for batch in batches]
+        if isinstance(parts[0], tuple):
+            # Convert the codes of each batch to the codes of the union of the categories
+            categories = sorted(set().union(*(batch_categories for _, batch_categories in parts)))
+            category_index = {category: i for i, category in enumerate(categories)}
+            codes = [np.array([category_index[c] for c in batch_categories], dtype=np.int32)[batch_codes]
+                     for batch_codes, batch_categories in parts if len(batch_codes)]
+            codes = np.concatenate(codes) if codes else np.empty(0, dtype=np.int32)
+            data[column] = (codes, categories)
+        else:
+            data[column] = np.concatenate(parts)
+    if 'totals' in batches[0]:
+        data['totals'] = batch_totals(batches)
+    return data
+
+
+def batch_totals(batches):
+    """
+    Sum the exact read count and yield of sampled batches
+    :param batches: list of dictionaries of columns with the read count and the yield of the batch before sampling
+    in a totals entry
+    :return: a numpy array with the read count and the yield
+    """
+    return np.sum([batch['totals'] for batch in batches], axis=0, dtype=np.int64) if batches \
+        else np.zeros(2, dtype=np.int64)
+
+
+def batches_to_dataframe(batches, columns):
+    """
+    Concatenate the columns of the batches processed by the workers in a dataframe
+    :param batches: list of dictionaries with a numpy array for each column or
+    a (codes, categories) tuple for categorical columns
+    :param columns: names of the columns
+    :return: a Pandas Dataframe object
+    """
+    if not batches:
+        return pd.DataFrame(columns=columns)
+
+    data = concatenate_batches(batches, columns)
+    data.pop('totals', None)
+    for column, values in data.items():
+        if isinstance(values, tuple):
+            data[column] = pd.Categorical.from_codes(*values)
+    return pd.DataFrame(data, columns=columns)
+
+
+# Type of the columns returned by the workers, the codes of the categorical columns are stored as int32
+COLUMN_DTYPES = {
+    'sequence_length': np.uint32,
+    'mean_qscore': np.float32,
+    'passes_filtering': np.bool_,
+    'start_time': np.float64,
+    'channel': np.int16,
+    'duration': np.float32,
+    'barcode_arrangement': np.int32,
+    'sample_key': np.float64
+}
+
+
+def batch_length(columns):
+    """
+    Get the number of rows of a batch processed by a worker
+    :param columns: dictionary of columns or SharedColumns object
+    :return: the number of rows
+    """
+    if isinstance(columns, SharedColumns):
+        return columns.count
+    first_column = next(iter(columns.values()))
+    if isinstance(first_column, tuple):
+        first_column = first_column[0]
+    return len(first_column)
+
+
+class SharedColumns:
+    """
+    Descriptor of the rows of a batch written by a worker in shared column buffers
+    """
+
+    def __init__(self, segments, offset, count, categories, values=None):
+        """
+        :param segments: dictionary with the name of the shared memory segment and the dtype of each column
+        :param offset: index of the first row of the batch in the segments
+        :param count: number of rows of the batch
+        :param categories: dictionary with the categories of the categorical columns
+        :param values: dictionary with the values of the batch that are not columns
+        """
+        self.segments = segments
+        self.offset = offset
+        self.count = count
+        self.categories = categories
+        self.values = values if values is not None else {}
+
+
+class SharedColumnBuffers:
+    """
+    Growable column buffers in shared memory where the workers write the rows of their batches.
+    The buffers are made of fixed size arenas, a new arena is added when the last one is full so
+    the rows already written are never moved.
+    """
+
+    def __init__(self, columns, arena_size=1024 * 1024):
+        """
+        :param columns: dictionary with the numpy dtype of each column, the codes of the categorical columns are
+        stored as int32
+        :param arena_size: minimal number of rows of an arena
+        """
+        self.columns = {column: np.dtype(dtype) for column, dtype in columns.items()}
+        self.arena_size = arena_size
+        self.segments = {}
+        self.arena = {}
+        self.arena_rows = 0
+        self.position = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def allocate(self, count):
+        """
+        Reserve rows in the buffers
+        :param count: number of rows to reserve
+        :return: (dictionary with the name of the segment and the dtype of each column, index of the first row,
+        number of rows)
+        """
+        if self.position + count > self.arena_rows:
+            self._add_arena(max(self.arena_size, count))
+        offset = self.position
+        self.position += count
+        return {column: (segment.name, self.columns[column].str) for column, segment in self.arena.items()}, \
+            offset, count
+
+    def _add_arena(self, rows):
+        """
+        Add a new arena to the buffers
+        :param rows: number of rows of the arena
+        """
+        self.arena = {column: shared_memory.SharedMemory(create=True, size=max(1, rows * dtype.itemsize))
+                      for column, dtype in self.columns.items()}
+        for segment in self.arena.values():
+            self.segments[segment.name] = segment
+        self.arena_rows = rows
+        self.position = 0
+
+    def load(self, result):
+        """
+        Get the columns of a batch processed by a worker
+        :param result: SharedColumns object or dictionary of columns if the batch has not been written in the buffers
+        :return: a dictionary with a numpy array for each column or a (codes, categories) tuple for categorical columns
+        """
+        if not isinstance(result, SharedColumns):
+            return result
+        columns = {}
+        for column, (name, _) in result.segments.items():
+            values = np.ndarray((result.offset + result.count,), dtype=self.columns[column],
+                                buffer=self.segments[name].buf)[result.offset:]
+            columns[column] = (values, result.categories[column]) if column in result.categories else values
+        columns.update(result.values)
+        return columns
+
+    def close(self):
+        """
+        Release the shared memory segments
+        """
+        for segment in self.segments.values():
+            try:
+                segment.close()
+            except BufferError:
+                # Some arrays still use the segment, the memory will be released with them
+                pass
+            segment.unlink()
+        self.segments.clear()
+        self.arena_rows = 0
+        self.position = 0
+
+
+# Shared memory segments attached by a worker process
+_attached_segments = {}
+
+
+def _store_columns(columns, slot):
+    """
+    Write the columns of a batch in the rows reserved in the shared column buffers
+    :param columns: dictionary with a numpy array for each column or a (codes, categories) tuple for categorical columns
+    :param slot: (dictionary with the name of the segment and the dtype of each column, index of the first row,
+    number of rows)
+    :return: a SharedColumns object or the columns if they do not fit in the reserved rows
+    """
+    segments, offset, capacity = slot
+    count = batch_length(columns)
+    if count > capacity:
+        return columns
+
+    # The arenas are filled in order, forget the segments of the previous arenas
+    for name in set(_attached_segments) - set(name for name, _ in segments.values()):
+        _attached_segments.pop(name).close()
+
+    categories = {}
+    other_values = {}
+    for column, values in columns.items():
+        if column not in segments:
+            other_values[column] = values
+            continue
+        if isinstance(values, tuple):
+            values, categories[column] = values
+        name, dtype = segments[column]
+        if name not in _attached_segments:
+            _attached_segments[name] = shared_memory.SharedMemory(name=name)
+        np.ndarray((offset + count,), dtype=dtype, buffer=_attached_segments[name].buf)[offset:] = values
+    return SharedColumns(segments, offset, count, categories, other_values)
+
+
+def _store_result(result, slot):
+    """
+    Write the columns of the result of a task in the shared column buffers
+    :param result: dictionary of columns or tuple ending with a dictionary of columns
+    :param slot: rows reserved for the result in the shared column buffers
+    :return: the result with the columns replaced by a SharedColumns object
+    """
+    if isinstance(result, tuple):
+        return result[:-1] + (_store_columns(result[-1], slot),)
+    return _store_columns(result, slot)
+
+
+# Pool of worker processes shared by the extractors and the configuration of the worker processes
+_worker_pool = None
+_worker_pool_settings = None
+_worker_config = None
+
+
+def _init_worker(worker_config):
+    """
+    Initialize a worker process with the static configuration of the tasks
+    :param worker_config: dictionary with the configuration of the tasks
+    """
+    global _worker_config
+    _worker_config = worker_config
+
+
+def _run_worker_task(func, payload, slot=None):
+    """
+    Execute a task in a worker process
+    :param func: module level function called with the configuration of the worker and the payload
+    :param payload: data to process
+    :param slot: rows reserved for the result in the shared column buffers or None
+    :return: the result of the function
+    """
+    result = func(_worker_config, payload)
+    if slot is not None:
+        result = _store_result(result, slot)
+    return result
+
+
+def get_worker_pool(n_process, worker_config=None):
+    """
+    Get the pool of worker processes. The pool is created at the first call and reused by the next calls
+    with the same number of processes and the same configuration.
+    :param n_process: number of worker processes
+    :param worker_config: dictionary with the configuration sent once to each worker process
+    :return: a ProcessPoolExecutor object
+    """
+    global _worker_pool, _worker_pool_settings
+    settings = (n_process, worker_config)
+    if _worker_pool is not None and _worker_pool_settings != settings:
+        shutdown_worker_pool()
+    if _worker_pool is None:
+        # The workers must share the resource tracker of the parent process that owns the shared memory segments
+        resource_tracker.ensure_running()
+        _worker_pool = ProcessPoolExecutor(n_process, initializer=_init_worker, initargs=(worker_config,))
+        _worker_pool_settings = settings
+    return _worker_pool
+
+
+def shutdown_worker_pool():
+    """
+    Shutdown the pool of worker processes if it exists
+    """
+    global _worker_pool, _worker_pool_settings
+    if _worker_pool is not None:
+        _worker_pool.shutdown()
+        _worker_pool = None
+        _worker_pool_settings = None
+
+
+atexit.register(shutdown_worker_pool)
 
 
-def multiprocessing_submit(func, iterator, n_process=mp.cpu_count()-1 ,pbar = True, pbar_update = 500,  *arg, **kwargs):
-    
-    executor = ProcessPoolExecutor(n_process)
+def multiprocessing_submit(func, iterator, n_process=mp.cpu_count()-1 ,pbar = True, pbar_update = 500,
+                           worker_config=None, shared_buffers=None, slot_size=None):
+    """
+    Process the items of an iterator with the pool of worker processes
+    :param func: module level function called as func(worker_config, item) in the worker processes
+    :param iterator: iterator on the items to process
+    :param n_process: number of worker processes
+    :param pbar: if True, show a progress bar
+    :param pbar_update: increment of the progress bar for each processed item or function computing it from the result
+    :param worker_config: dictionary with the static configuration of the tasks
+    :param shared_buffers: SharedColumnBuffers object where the workers write the columns of their results or None
+    :param slot_size: function giving the number of rows to reserve in the shared buffers for an item
+    yield : the completed futures
+    """
+    executor = get_worker_pool(n_process, worker_config)
 
     max_queue = n_process * 2
     if pbar:
@@ -50,7 +714,8 @@ def multiprocessing_submit(func, iterator, n_process=mp.cpu_count()-1 ,pbar = Tr
             i = next(iterator, None)
             if not i:
                 break
-            futures[executor.submit(func, i, *arg, **kwargs)] = None
+            slot = shared_buffers.allocate(slot_size(i)) if shared_buffers is not None else None
+            futures[executor.submit(_run_worker_task, func, i, slot)] = None
             n_job_in_queue += 1
 
         job = next(as_completed(futures), None)
@@ -60,6 +725,6 @@ def multiprocessing_submit(func, iterator, n_process=mp.cpu_count()-1 ,pbar = Tr
             break
         else:
             n_job_in_queue -= 1
-            pbar.update(pbar_update)
+            pbar.update(pbar_update(job.result()) if callable(pbar_update) else pbar_update)
             yield job
             del futures[job]
\ No newline at end of file
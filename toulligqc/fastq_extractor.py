@@ -1,35 +1,54 @@
 
 import os
+import re
 import numpy as np
 import pandas as pd
 import gzip
 import time
+from functools import partial
 from toulligqc.extractor_common import log_task
-from toulligqc.extractor_common import describe_dict
+from toulligqc.extractor_common import describe_dict, set_nxx_result_values
 from toulligqc.extractor_common import set_result_value
 from toulligqc.extractor_common import check_result_values
-from toulligqc.extractor_common import add_image_to_result
+from toulligqc.extractor_common import generate_images
 from toulligqc.extractor_common import count_boolean_elements
 from toulligqc.extractor_common import get_result_value
 from toulligqc.extractor_common import fill_series_dict
 from toulligqc.extractor_common import set_result_dict_telemetry_value
-from toulligqc.extractor_common import timeISO_to_float
+from toulligqc.extractor_common import timeISO_to_float_batch
 from toulligqc.extractor_common import extract_barcode_info
-from toulligqc.common_statistics import compute_NXX, compute_LXX, occupancy_channel, avg_qual
-from toulligqc.fastq_bam_common import multiprocessing_submit
-from toulligqc.common import is_numpy_1_24
+from toulligqc.extractor_common import ReadSampling, set_sampling_result_values
+from toulligqc.streaming_statistics import StreamingStatistics
+from toulligqc.parse_cache import ParseCache
+from toulligqc.common_statistics import occupancy_channel, avg_qual_batch, get_statistics
+from toulligqc.fastq_bam_common import multiprocessing_submit, batches_to_dataframe, concatenate_batches, encode_categories
+from toulligqc.fastq_bam_common import expand_input_files, schedule_files, pass_filter
+from toulligqc.fastq_bam_common import SharedColumnBuffers, COLUMN_DTYPES, batch_length, batch_totals
+from toulligqc.fastq_bam_common import bgzf_block_offsets, bgzf_ranges, bgzf_decompress_range, gzip_open, prefetch
 from toulligqc import plotly_graph_generator as pgg
+from toulligqc.plotly_graph_common import DEFAULT_DENSITY_GRID_SIZE
+
+FASTQ_EXTENSIONS = ('.fastq', '.fq', '.fastq.gz', '.fq.gz')
 
 
 class fastqExtractor:
 
     def __init__(self, config_dictionary):
         self.config_dictionary = config_dictionary
-        self.fastq = config_dictionary['fastq'].split('\t')
+        self.fastq = expand_input_files(config_dictionary['fastq'].split('\t'), FASTQ_EXTENSIONS)
         self.images_directory = config_dictionary['images_directory']
         self.threshold_Qscore = int(config_dictionary['threshold'])
         self.batch_size = int(config_dictionary['batch_size'])
         self.thread = int(config_dictionary['thread'])
+        self.density_grid_size = int(config_dictionary.get('density_grid_size', DEFAULT_DENSITY_GRID_SIZE))
+        self.basecaller_qscore = config_dictionary.get('basecaller_qscore', 'False').lower() == 'true'
+        self.shared_memory = config_dictionary.get('shared_memory', 'False').lower() == 'true'
+        self.sampling = ReadSampling.from_config(config_dictionary)
+        self.sampled_totals = None
+        self.streaming = config_dictionary.get('streaming', 'False').lower() == 'true'
+        self.streaming_statistics = None
+        self.parse_cache = ParseCache.from_config(config_dictionary) \
+            if self.sampling is None and not self.streaming else None
         self.rich = False
         self.runid, self.sampleid, self.model_version_id = ['Unknow']*3
         self.is_barcode = False
@@ -45,10 +64,12 @@ class fastqExtractor:
         Configuration checking
         :return: nothing
         """
+        if not self.fastq:
+            return False, "No FASTQ file found in: " + ", ".join(self.config_dictionary['fastq'].split('\t'))
         for fastq in self.fastq:
             if not os.path.isfile(fastq):
                 return False, "FASTQ file does not exists: " + fastq
-            return True, ""
+        return True, ""
 
 
     def init(self):
@@ -57,9 +78,11 @@ class fastqExtractor:
         :return: Panda's Dataframe object
         """
         start_time = time.time()
-        self.dataframe_1d = self._load_fastq_data()
+        self.dataframe_1d = self._load_cached_fastq_data()
         if self.dataframe_1d.empty:
             raise pd.errors.EmptyDataError("Dataframe is empty")
+        self.dataframe_1d.insert(2, 'passes_filtering',
+                                 pass_filter(self.dataframe_1d['mean_qscore'].to_numpy(), self.threshold_Qscore))
         self.dataframe_dict = {}
 
         # Add missing categories
@@ -115,23 +138,30 @@ class fastqExtractor:
         Generation of the different graphs containing in the plotly_graph_generator module
         :return: images array containing the title and the path toward the images
         """
-        images = list()
+        graph_tasks = []
+
+        # In streaming mode, the reads and bases over time and the channel counts of all the reads are used
+        time_dataframe = channel_dataframe = self.dataframe_1d
+        if self.streaming_statistics is not None:
+            time_dataframe = self.streaming_statistics.time_dataframe()
+            channel_dataframe = self.streaming_statistics.channel_dataframe()
 
-        add_image_to_result(self.quiet, images, time.time(), pgg.read_count_histogram(result_dict, self.images_directory))
-        add_image_to_result(self.quiet, images, time.time(), pgg.read_length_scatterplot(self.dataframe_dict, self.images_directory))
+        graph_tasks.append(partial(pgg.read_count_histogram, result_dict, self.images_directory))
+        graph_tasks.append(partial(pgg.read_length_scatterplot, self.dataframe_dict, self.images_directory))
 
         if self.rich:
-            add_image_to_result(self.quiet, images, time.time(), pgg.yield_plot(self.dataframe_1d, self.images_directory))
-        add_image_to_result(self.quiet, images, time.time(), pgg.read_quality_multiboxplot(self.dataframe_dict, self.images_directory))
-        add_image_to_result(self.quiet, images, time.time(), pgg.allphred_score_frequency(self.dataframe_dict, self.images_directory))
+            graph_tasks.append(partial(pgg.yield_plot, time_dataframe, self.images_directory))
+        graph_tasks.append(partial(pgg.read_quality_multiboxplot, self.dataframe_dict, self.images_directory))
+        graph_tasks.append(partial(pgg.allphred_score_frequency, self.dataframe_dict, self.images_directory))
 
         if self.rich:
-            add_image_to_result(self.quiet, images, time.time(), pgg.plot_performance(self.dataframe_1d, self.images_directory))
-        add_image_to_result(self.quiet, images, time.time(), pgg.twod_density(self.dataframe_dict, self.images_directory))
+            graph_tasks.append(partial(pgg.plot_performance, channel_dataframe, self.images_directory))
+        graph_tasks.append(partial(pgg.twod_density, self.dataframe_dict, self.images_directory,
+                                   grid_size=self.density_grid_size))
 
         if self.rich:
-            add_image_to_result(self.quiet, images, time.time(), pgg.sequence_length_over_time(self.dataframe_dict, self.images_directory))
-            add_image_to_result(self.quiet, images, time.time(), pgg.phred_score_over_time(self.dataframe_dict, result_dict, self.images_directory))
+            graph_tasks.append(partial(pgg.sequence_length_over_time, self.dataframe_dict, self.images_directory))
+            graph_tasks.append(partial(pgg.phred_score_over_time, self.dataframe_dict, result_dict, self.images_directory))
 
             if self.is_barcode:
                 if "barcode_alias" in self.config_dictionary:
@@ -139,26 +169,26 @@ class fastqExtractor:
                 else:
                     barcode_alias = None
 
-                add_image_to_result(self.quiet, images, time.time(), pgg.barcode_percentage_pie_chart_pass(self.dataframe_dict,
-                                                                                                        self.barcode_selection,
-                                                                                                        self.images_directory,
-                                                                                                        barcode_alias))
+                graph_tasks.append(partial(pgg.barcode_percentage_pie_chart_pass, self.dataframe_dict,
+                                           self.barcode_selection,
+                                           self.images_directory,
+                                           barcode_alias))
 
                 read_fail = self.dataframe_dict["read.fail.barcoded"]
                 if not (len(read_fail) == 1 and read_fail["other barcodes"] == 0):
-                    add_image_to_result(self.quiet, images, time.time(), pgg.barcode_percentage_pie_chart_fail(self.dataframe_dict,
-                                                                                                        self.barcode_selection,
-                                                                                                        self.images_directory,
-                                                                                                        barcode_alias))
+                    graph_tasks.append(partial(pgg.barcode_percentage_pie_chart_fail, self.dataframe_dict,
+                                               self.barcode_selection,
+                                               self.images_directory,
+                                               barcode_alias))
 
-                add_image_to_result(self.quiet, images, time.time(), pgg.barcode_length_boxplot(self.dataframe_dict,
-                                                                                                self.images_directory,
-                                                                                                barcode_alias))
+                graph_tasks.append(partial(pgg.barcode_length_boxplot, self.dataframe_dict,
+                                           self.images_directory,
+                                           barcode_alias))
 
-                add_image_to_result(self.quiet, images, time.time(), pgg.barcoded_phred_score_frequency(self.dataframe_dict,
-                                                                                                        self.images_directory,
-                                                                                                        barcode_alias))
-        return images
+                graph_tasks.append(partial(pgg.barcoded_phred_score_frequency, self.dataframe_dict,
+                                           self.images_directory,
+                                           barcode_alias))
+        return generate_images(self.quiet, graph_tasks, self.thread)
 
 
     def extract(self, result_dict):
@@ -202,10 +232,9 @@ class fastqExtractor:
         # Yield, n50, run time
         set_result_value(self, result_dict, "yield", sum(self.dataframe_dict["all.reads.sequence.length"]))
 
-        set_result_value(self, result_dict, "n50", compute_NXX(self.dataframe_dict, 50))
-        set_result_value(self, result_dict, "l50", compute_LXX(self.dataframe_dict, 50))
+        set_nxx_result_values(self, result_dict, self.dataframe_dict)
 
-        if self.rich:
+        if self.rich and self.streaming_statistics is None:
             set_result_value(self, result_dict, "run.time", max(self.dataframe_1d['start_time']))
             # Get channel occupancy statistics and store each value into result_dict
             for index, value in occupancy_channel(self.dataframe_1d).items():
@@ -213,16 +242,16 @@ class fastqExtractor:
                                 result_dict, "channel.occupancy.statistics." + index, value)
         
         # Get statistics about all reads length and store each value into result_dict
-        sequence_length_statistics = self.dataframe_dict["all.reads.sequence.length"].describe()
+        sequence_length_statistics = get_statistics(self.dataframe_dict, "all.reads.sequence.length").describe()
 
         for index, value in sequence_length_statistics.items():
             set_result_value(self,
                              result_dict, "all.read.length." + index, value)
 
         # Add statistics (without count) about read pass/fail length in the result_dict
-        describe_dict(self, result_dict, self.dataframe_dict["pass.reads.sequence.length"],
+        describe_dict(self, result_dict, get_statistics(self.dataframe_dict, "pass.reads.sequence.length"),
                       "pass.reads.sequence.length")
-        describe_dict(self, result_dict, self.dataframe_dict["fail.reads.sequence.length"],
+        describe_dict(self, result_dict, get_statistics(self.dataframe_dict, "fail.reads.sequence.length"),
                       "fail.reads.sequence.length")
         if self.rich and self.is_barcode:
             extract_barcode_info(self, result_dict,
@@ -231,7 +260,7 @@ class fastqExtractor:
                                  self.dataframe_1d)
 
         # Get Qscore statistics without count value and store them into result_dict
-        qscore_statistics = self.dataframe_1d['mean_qscore'].describe().drop(
+        qscore_statistics = get_statistics(self.dataframe_dict, "all.reads.mean.qscore").describe().drop(
             "count")
 
         for index, value in qscore_statistics.items():
@@ -239,12 +268,49 @@ class fastqExtractor:
                              result_dict, "all.read.qscore." + index, value)
 
         # Add statistics (without count) about read pass/fail qscore in the result_dict
-        describe_dict(self, result_dict, self.dataframe_dict["pass.reads.mean.qscore"], "pass.reads.mean.qscore")
-        describe_dict(self, result_dict, self.dataframe_dict["fail.reads.mean.qscore"], "fail.reads.mean.qscore")
+        describe_dict(self, result_dict, get_statistics(self.dataframe_dict, "pass.reads.mean.qscore"), "pass.reads.mean.qscore")
+        describe_dict(self, result_dict, get_statistics(self.dataframe_dict, "fail.reads.mean.qscore"), "fail.reads.mean.qscore")
+
+        # In streaming mode, the statistics above are computed on the reads kept for the graphs
+        if self.streaming_statistics is not None:
+            self.streaming_statistics.set_result_values(self, result_dict)
+            if self.rich and self.is_barcode:
+                self.streaming_statistics.set_barcode_result_values(self, result_dict, self.barcode_selection,
+                                                                    self.dataframe_dict)
+
+        # Scale the counts estimated from the sampled reads
+        if self.sampling is not None:
+            set_sampling_result_values(self, result_dict, self.sampling, self.sampled_totals)
 
         log_task(self.quiet, 'Extract info from FASTQ file', start_time, time.time())       
 
 
+    def _load_cached_fastq_data(self):
+        """
+        Load FASTQ dataframe from the parse cache, or parse the FASTQ files and add their columns to the cache
+        :return: a Pandas Dataframe object
+        """
+        if self.parse_cache is None:
+            return self._load_fastq_data()
+
+        cache_key = ParseCache.key(self.fastq, {'extractor': self.get_name(),
+                                                'barcoding': self.is_barcode,
+                                                'basecaller_qscore': self.basecaller_qscore})
+        cached = self.parse_cache.load(cache_key)
+        if cached is not None:
+            fq_df, metadata = cached
+            self.rich = metadata['rich']
+            self.is_barcode = metadata['is_barcode']
+            self.runid, self.sampleid, self.model_version_id = metadata['run_info']
+            return fq_df
+
+        fq_df = self._load_fastq_data()
+        self.parse_cache.store(cache_key, fq_df, {'rich': self.rich,
+                                                  'is_barcode': self.is_barcode,
+                                                  'run_info': [self.runid, self.sampleid, self.model_version_id]})
+        return fq_df
+
+
     def _load_fastq_data(self):
         """
         Load FASTQ dataframe
@@ -258,96 +324,127 @@ class fastqExtractor:
         else:
             self.rich = False
 
-        read_batchs = self._fastq_batch_generator()
-        rst_futures = multiprocessing_submit(self._fastq_batch_reader,
-                                                        read_batchs, 
-                                                        n_process=self.thread, 
-                                                        pbar_update=self.batch_size)
-        fq_df = []
-        
-        for _, f in enumerate(rst_futures):
-            fq_df.extend(f.result())
+        worker_config = {
+            'is_barcode': self.is_barcode,
+            'rich': self.rich,
+            'basecaller_qscore': self.basecaller_qscore,
+            'batch_size': self.batch_size,
+            'sampling': self.sampling
+        }
 
-        columns = ['sequence_length', 'mean_qscore', 'passes_filtering']
+        batches = []
+        columns = ['sequence_length', 'mean_qscore']
         if self.rich:
             columns.extend(['start_time', 'channel'])
 
             if self.is_barcode:
                 columns.append('barcode_arrangement')
+        if self.sampling is not None and self.sampling.count is not None:
+            columns.append('sample_key')
+
+        # The statistics are updated with each batch, the batches are not kept
+        if self.streaming:
+            self.streaming_statistics = StreamingStatistics(self.threshold_Qscore,
+                                                           seed=int(self.config_dictionary.get('sample_seed', 42)))
+            add_batch = self.streaming_statistics.add
+        else:
+            add_batch = batches.append
 
-        fq_df = pd.DataFrame(fq_df, columns=columns)
+        shared_buffers = None
+        if self.shared_memory and not self.streaming:
+            shared_buffers = SharedColumnBuffers({column: COLUMN_DTYPES[column] for column in columns})
 
-        fq_df['sequence_length'] = fq_df['sequence_length'].astype(np.uint32)
-        fq_df['mean_qscore'] = fq_df['mean_qscore'].astype(np.float32)
-        fq_df['passes_filtering'] = fq_df['passes_filtering'].astype(np.bool_ if is_numpy_1_24 else np.bool)
+        try:
+            read_batchs = self._fastq_batch_generator()
+            rst_futures = multiprocessing_submit(_fastq_chunk_reader,
+                                                 read_batchs,
+                                                 n_process=self.thread,
+                                                 pbar_update=lambda result: batch_length(
+                                                     result[-1] if isinstance(result, tuple) else result),
+                                                 worker_config=worker_config,
+                                                 shared_buffers=shared_buffers,
+                                                 slot_size=_fastq_chunk_size)
+            bgzf_ranges_results = {}
+            for f in rst_futures:
+                result = f.result()
+                if isinstance(result, tuple):
+                    if shared_buffers is not None:
+                        result = result[:-1] + (shared_buffers.load(result[-1]),)
+                    if self.streaming:
+                        add_batch(result[-1])
+                        result = result[:-1] + (None,)
+                    bgzf_ranges_results[result[0]] = result
+                else:
+                    add_batch(shared_buffers.load(result) if shared_buffers is not None else result)
+
+            # Parse the records split between consecutive BGZF ranges
+            split_records = {}
+            for key in sorted(bgzf_ranges_results):
+                fastq = key[0]
+                _, record_found, head, tail, rec_data = bgzf_ranges_results[key]
+                split_records[fastq] = split_records.get(fastq, b'') + head
+                if record_found:
+                    if split_records[fastq].strip():
+                        add_batch(_fastq_batch_reader(worker_config, split_records[fastq]))
+                    if rec_data is not None:
+                        add_batch(rec_data)
+                    split_records[fastq] = tail
+            for records in split_records.values():
+                if records.strip():
+                    add_batch(_fastq_batch_reader(worker_config, records))
+            del bgzf_ranges_results
+
+            if self.streaming:
+                return self.streaming_statistics.sample_dataframe()
+
+            if self.sampling is not None:
+                self.sampled_totals = batch_totals(batches)
+            fq_df = batches_to_dataframe(batches, columns)
+            del batches
+        finally:
+            if shared_buffers is not None:
+                shared_buffers.close()
+
+        if self.sampling is not None:
+            fq_df = self.sampling.select(fq_df)
 
         if self.rich:
             fq_df["start_time"] = fq_df["start_time"] - fq_df["start_time"].min()
-            fq_df['start_time'] = fq_df['start_time'].astype(np.float64)
-            fq_df['channel'] = fq_df['channel'].astype(np.int16)
-
-            if self.is_barcode:
-                fq_df['barcode_arrangement'] = fq_df['barcode_arrangement'].astype("category")
 
         return fq_df 
 
 
     def _fastq_batch_generator(self):
         """
-        read FASTQ file in small batch
-        yield : list of lines (quality line): batch of n size
+        read FASTQ file in binary blocks, or split BGZF compressed FASTQ files in ranges of BGZF blocks.
+        When there are enough files to keep all the workers busy, each worker reads whole files.
+        yield : bytes block containing only complete FASTQ records (about batch size records),
+        (FASTQ path, index of the range, offset of the first BGZF block, offset of the block following the range)
+        or FASTQ path
         """
+        files = schedule_files(self.fastq, self.thread)
+        if files is not None:
+            yield from files
+            return
+
         for fastq in self.fastq:
-            open_fn = gzip.open if fastq.endswith('.gz') else open
-            with open_fn(fastq, 'rt') as fastq:
-                batch = []
-                line_num = 0
-                if self.rich:
-                    for line in fastq:
-                        line_num += 1
-                        if line_num % 4 == 1:
-                            name = line.rstrip()
-                        elif line_num % 4 == 0:
-                            batch.append((name, line.rstrip()))
-                        if len(batch) == self.batch_size:
-                            yield batch
-                            batch = []
-                else:       
-                    for line in fastq:
-                        line_num += 1
-                        if line_num % 4 == 0:
-                            batch.append(line.rstrip())
-                            if len(batch) == self.batch_size:
-                                yield batch
-                                batch = []
-                if len(batch) > 0:
-                    yield batch
-
-
-    def _fastq_batch_reader(self, read_batch):
-        """
-        parse each line of FASTQ quality line:
-        return: [read length, mean Qscore, type of read (pass or fail)]
-        """
-        fastq_lines = []
-        if self.rich:
-            for read in read_batch:
-                name = read[0]
-                qscore = avg_qual(read[1])
-                passes_filtering = True if qscore > self.threshold_Qscore else False
-                if self.is_barcode:
-                    start_time, ch, barcode = self._extract_info_from_name(name)
-                    fastq_lines.append((len(read[1]), qscore, passes_filtering, start_time, ch, barcode))
-                else:
-                    start_time, ch = self._extract_info_from_name(name)
-                    fastq_lines.append((len(read[1]), qscore, passes_filtering, start_time, ch))
-        else:
-            for read in read_batch:
-                if len(read)>0:
-                    qscore = avg_qual(read)
-                    passes_filtering = True if qscore > self.threshold_Qscore else False
-                    fastq_lines.append((len(read), qscore, passes_filtering))
-        return fastq_lines
+            if fastq.endswith('.gz'):
+                try:
+                    block_offsets = bgzf_block_offsets(fastq)
+                except ValueError:
+                    block_offsets = None
+
+                # The BGZF blocks are decompressed by the workers
+                if block_offsets:
+                    ranges = bgzf_ranges(block_offsets, os.path.getsize(fastq), self.thread)
+                    for i, (range_start, range_end) in enumerate(ranges):
+                        yield fastq, i, range_start, range_end
+                    continue
+
+            # Decompress and split the file in a background thread
+            with gzip_open(fastq) if fastq.endswith('.gz') else open(fastq, 'rb') as f:
+                for block in prefetch(fastq_block_iterator(f, self.batch_size)):
+                    yield block
 
 
     def check_fastq(self):
@@ -357,7 +454,7 @@ class fastqExtractor:
 
         with open_fn(self.fastq[0], 'rt') as fq:
             first_line = fq.readline().strip('\n')
-        metadata = dict(x.split("=") for x in first_line.split(" ")[1:])
+        metadata = parse_fastq_header(first_line)
         if 'barcode' not in metadata:
             self.is_barcode = False
         if 'model_version_id' not in metadata:
@@ -371,11 +468,324 @@ class fastqExtractor:
             return None
 
 
-    def _extract_info_from_name(self, name):
-        """
-        """
-        metadata = dict(x.split("=") for x in name.split(" ")[1:])
-        start_time = timeISO_to_float(metadata['start_time'],  '%Y-%m-%dT%H:%M:%S.%f%z')
-        if self.is_barcode:
-            return  start_time, metadata['ch'], metadata['barcode']
-        return  start_time, metadata['ch']
\ No newline at end of file
+def _fastq_chunk_reader(worker_config, chunk):
+    """
+    read a chunk of a FASTQ file
+    :param worker_config: dictionary with the is_barcode, rich and basecaller_qscore settings
+    :param chunk: bytes block, (FASTQ path, index of the range, offset of the first BGZF block,
+    offset of the block following the range) or FASTQ path
+    :return: the result of _fastq_batch_reader(), _fastq_bgzf_range_reader() or _fastq_file_reader()
+    """
+    if isinstance(chunk, str):
+        return _fastq_file_reader(worker_config, chunk)
+    if isinstance(chunk, tuple):
+        return _fastq_bgzf_range_reader(worker_config, chunk)
+    return _fastq_batch_reader(worker_config, chunk)
+
+
+def _fastq_chunk_size(chunk):
+    """
+    Estimate the maximal number of records of a FASTQ chunk
+    :param chunk: bytes block, (FASTQ path, index of the range, offset of the first BGZF block,
+    offset of the block following the range) or FASTQ path
+    :return: the number of records
+    """
+    if isinstance(chunk, str):
+        return os.path.getsize(chunk) // 16 + 1
+    if isinstance(chunk, tuple):
+        # A compressed FASTQ record uses much more than 16 bytes
+        return (chunk[3] - chunk[2]) // 16 + 1
+    return chunk.count(b'\n') // 4 + 1
+
+
+def _fastq_file_reader(worker_config, fastq):
+    """
+    read a whole FASTQ file
+    :param worker_config: dictionary with the is_barcode, rich, basecaller_qscore and batch_size settings
+    :param fastq: path of the FASTQ file
+    :return: the concatenated results of _fastq_batch_reader() for the blocks of the file
+    """
+    with gzip_open(fastq) if fastq.endswith('.gz') else open(fastq, 'rb') as f:
+        batches = [_fastq_batch_reader(worker_config, block)
+                   for block in fastq_block_iterator(f, worker_config['batch_size'])]
+    if not batches:
+        return _fastq_batch_reader(worker_config, b'')
+    return concatenate_batches(batches, list(batches[0]))
+
+
+def _fastq_bgzf_range_reader(worker_config, chunk):
+    """
+    decompress a range of BGZF blocks of a FASTQ file and parse the records starting and ending in the range
+    :param worker_config: dictionary with the is_barcode, rich and basecaller_qscore settings
+    :param chunk: (FASTQ path, index of the range, offset of the first BGZF block, offset of the block following
+    the range)
+    :return: ((FASTQ path, index of the range), True if a record starts in the range, data before the first record,
+    data after the last complete record, result of _fastq_batch_reader() for the complete records)
+    """
+    fastq, index, range_start, range_end = chunk
+    data = bgzf_decompress_range(fastq, range_start, range_end)
+    start = 0 if index == 0 else _find_fastq_record(data)
+    if start is None:
+        return (fastq, index), False, data, b'', _fastq_batch_reader(worker_config, b'')
+    end = start + _complete_records_end(data[start:])
+    return (fastq, index), True, data[:start], data[end:], _fastq_batch_reader(worker_config, data[start:end])
+
+
+def _find_fastq_record(data):
+    """
+    Find the first FASTQ record starting after a new line in data
+    :param data: FASTQ data that may start in the middle of a record
+    :return: the position of the record or None if no complete record starts in data
+    """
+    pos = data.find(b'\n@')
+    while pos != -1:
+        line_ends = []
+        end = pos
+        for _ in range(4):
+            end = data.find(b'\n', end + 1)
+            if end == -1:
+                return None
+            line_ends.append(end)
+
+        # Header line, then sequence and quality lines of the same length separated by a '+' line
+        header_end, sequence_end, separator_end, quality_end = line_ends
+        if data.startswith(b'+', sequence_end + 1) and \
+                sequence_end - header_end == quality_end - separator_end:
+            return pos + 1
+        pos = data.find(b'\n@', pos + 1)
+    return None
+
+
+def _complete_records_end(buffer, line_count=None):
+    """
+    Find the end of the last complete FASTQ record of a buffer starting with a record
+    :param buffer: FASTQ data
+    :param line_count: number of new lines in buffer if already known
+    :return: the position following the last complete record
+    """
+    if line_count is None:
+        line_count = buffer.count(b'\n')
+    if line_count < 4:
+        return 0
+    end = len(buffer)
+    for _ in range(line_count % 4 + 1):
+        end = buffer.rfind(b'\n', 0, end)
+    return end + 1
+
+
+def _fastq_batch_reader(worker_config, block):
+    """
+    split a binary block of FASTQ records and parse the name and quality lines:
+    :param worker_config: dictionary with the is_barcode, rich, basecaller_qscore and sampling settings
+    :param block: bytes block containing only complete FASTQ records
+    return: dictionary with the read length, mean Qscore, type of read (pass or fail) arrays and
+    start time, channel and barcode arrays for rich headers. When the reads are sampled, the dictionary also contains
+    the random keys of the reads for a fixed size sample and the read count and yield of the block before sampling.
+    """
+    if b'\r' in block:
+        block = block.replace(b'\r', b'')
+    lines = block.split(b'\n')
+    record_lines = 4 * (len(lines) // 4)
+    names = lines[0:record_lines:4]
+    sequences = lines[1:record_lines:4]
+    quals = lines[3:record_lines:4]
+
+    sampling = worker_config.get('sampling')
+    if sampling is not None:
+        # Count all the reads and bases but only parse the sampled reads
+        all_lengths = np.array([len(qual) for qual in quals], dtype=np.int64)
+        read_indexes = np.flatnonzero(all_lengths)
+        totals = np.array([len(read_indexes), all_lengths.sum()], dtype=np.int64)
+        # Read names without the description of the header, like the names of the BAM records
+        keys = sampling.read_keys([(names[i][1:].split(None, 1) or [b''])[0] for i in read_indexes])
+        selected = sampling.mask(keys)
+        keys = keys[selected]
+        names, sequences, quals = ([items[i] for i in read_indexes[selected]] for items in (names, sequences, quals))
+
+    if worker_config['basecaller_qscore']:
+        # Only read the sequence lengths and use the mean qscore of the headers if available
+        lengths = [len(seq) for seq in sequences]
+        qscores = [header_qscore(name) for name in names]
+        missing = [i for i, qscore in enumerate(qscores) if qscore is None]
+        if missing:
+            computed_qscores = avg_qual_batch([quals[i] for i in missing])
+            for i, qscore in zip(missing, computed_qscores.tolist()):
+                qscores[i] = qscore
+    else:
+        lengths = [len(qual) for qual in quals]
+        qscores = avg_qual_batch(quals).tolist()
+
+    lengths = np.array(lengths, dtype=np.uint32)
+    qscores = np.array(qscores, dtype=np.float64)
+
+    # Skip empty reads
+    not_empty = lengths > 0
+    if not not_empty.all():
+        lengths = lengths[not_empty]
+        qscores = qscores[not_empty]
+        names = [name for name, keep in zip(names, not_empty) if keep]
+
+    result = {
+        'sequence_length': lengths,
+        'mean_qscore': qscores.astype(np.float32)
+    }
+    if worker_config['rich']:
+        read_infos = _extract_info_from_names(names, worker_config['is_barcode'])
+        result['start_time'] = timeISO_to_float_batch([info[0] for info in read_infos])
+        result['channel'] = np.array([info[1] for info in read_infos]).astype(np.int16)
+        if worker_config['is_barcode']:
+            result['barcode_arrangement'] = encode_categories([info[2] for info in read_infos])
+    if sampling is not None:
+        if sampling.count is not None:
+            result['sample_key'] = keys
+        result['totals'] = totals
+    return result
+
+
+def parse_fastq_header(name):
+    """
+    Parse the key=value fields of a FASTQ read header
+    :param name: header line of the read
+    :return: a dictionary with the fields of the header
+    """
+    return dict(x.split("=") for x in name.split(" ")[1:])
+
+
+def _extract_info_from_name(name, is_barcode):
+    """
+    Extract the start time, the channel and the barcode from a FASTQ read header
+    :param name: header line of the read
+    :param is_barcode: if True, extract also the barcode
+    :return: start time as an ISO 8601 string, channel and barcode if is_barcode is True
+    """
+    metadata = parse_fastq_header(name)
+    if is_barcode:
+        return  metadata['start_time'], metadata['ch'], metadata['barcode']
+    return  metadata['start_time'], metadata['ch']
+
+
+# Compiled header patterns by key order of the headers and extracted fields
+_header_patterns = {}
+
+
+def _header_pattern(keys, fields):
+    """
+    Compile a regex extracting fields from the FASTQ read headers with some keys in a given order
+    :param keys: keys of the headers in their order
+    :param fields: keys of the fields to extract
+    :return: (compiled regex, indexes of the groups of the fields) or None if the keys do not contain all the fields
+    """
+    cache_key = (keys, fields)
+    if cache_key not in _header_patterns:
+        # Like with a dictionary, the value of a key used several times is the last one
+        last_positions = {key: i for i, key in enumerate(keys)}
+        if not all(field in last_positions for field in fields):
+            _header_patterns[cache_key] = None
+        else:
+            captured = sorted(last_positions[field] for field in fields)
+            pattern = '[^ ]*'
+            for i, key in enumerate(keys):
+                pattern += ' ' + re.escape(key) + ('=([^ =]*)' if i in captured else '=[^ =]*')
+            group_indexes = tuple(captured.index(last_positions[field]) + 1 for field in fields)
+            _header_patterns[cache_key] = re.compile(pattern), group_indexes
+    return _header_patterns[cache_key]
+
+
+def _extract_info_from_names(names, is_barcode):
+    """
+    Extract the start time, the channel and the barcode from FASTQ read headers.
+    The order of the keys is learned from the first header. When all the headers have this order, the fields
+    are extracted by position, otherwise each header is parsed with a regex compiled for this order or with
+    _extract_info_from_name() if it does not match.
+    :param names: header lines of the reads (bytes)
+    :param is_barcode: if True, extract also the barcode
+    :return: a list of (start time, channel and barcode if is_barcode is True) tuples
+    """
+    if not names:
+        return []
+    fields = ('start_time', 'ch', 'barcode') if is_barcode else ('start_time', 'ch')
+    text = b'\n'.join(names).decode()
+    first_name = names[0].decode()
+    keys = tuple(x.split('=')[0] for x in first_name.split(' ')[1:])
+
+    # Fields by position: the tokens of all the headers are in a single list
+    tokens = text.replace('\n', ' ').split(' ')
+    token_count = len(keys) + 1
+    positions = [len(keys) - keys[::-1].index(field) for field in fields if field in keys]
+    if len(tokens) == token_count * len(names) and len(positions) == len(fields):
+        columns = []
+        for field, position in zip(fields, positions):
+            prefix = field + '='
+            column = tokens[position::token_count]
+            if not all(token.startswith(prefix) for token in column):
+                break
+            columns.append([token[len(prefix):] for token in column])
+        else:
+            return list(zip(*columns))
+
+    header_pattern = _header_pattern(keys, fields)
+    read_infos = []
+    for name in text.split('\n'):
+        match = header_pattern[0].fullmatch(name) if header_pattern is not None else None
+        if match is None:
+            read_infos.append(_extract_info_from_name(name, is_barcode))
+        else:
+            read_infos.append(match.group(*header_pattern[1]))
+    return read_infos
+
+
+# Mean qscore written by the basecaller in the read header (qs=12.3 or qs:f:12.3 SAM tag)
+_header_qscore_pattern = re.compile(rb'[ \t]qs[=:](?:[fi]:)?([-+0-9.eE]+)')
+
+
+def header_qscore(name):
+    """
+    Get the mean qscore computed by the basecaller from a FASTQ read header
+    :param name: header line of the read (bytes)
+    :return: the mean qscore as a float or None if the header does not contain a mean qscore
+    """
+    match = _header_qscore_pattern.search(name)
+    if match is None:
+        return None
+    return float(match.group(1))
+
+
+def fastq_block_iterator(f, batch_size, first_block_size=1024 * 1024, min_block_size=64 * 1024):
+    """
+    Read a FASTQ file opened in binary mode by large blocks cut at record boundaries.
+    The size of the blocks is adjusted to contain about batch_size records.
+    :param f: file object opened in binary mode
+    :param batch_size: expected number of records in a block
+    :param first_block_size: size in bytes of the first block read
+    :param min_block_size: minimal size in bytes of the blocks read
+    yield : bytes objects containing only complete records
+    """
+    block_size = first_block_size
+    remainder = b''
+    record_count = 0
+    byte_count = 0
+
+    while True:
+        data = f.read(block_size)
+        if not data:
+            break
+
+        buffer = remainder + data if remainder else data
+        line_count = buffer.count(b'\n')
+        complete_line_count = line_count - line_count % 4
+        if complete_line_count == 0:
+            remainder = buffer
+            continue
+
+        # Find the end of the last complete record
+        end = _complete_records_end(buffer, line_count)
+
+        yield buffer[:end]
+        remainder = buffer[end:]
+
+        record_count += complete_line_count // 4
+        byte_count += end
+        block_size = max(min_block_size, batch_size * byte_count // record_count)
+
+    if remainder.strip():
+        yield remainder
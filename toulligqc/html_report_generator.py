@@ -26,13 +26,17 @@
 # Generates a quality control report in HTML format including graphs and statistical tables
 import base64
 import datetime
+import json
 import os
 import pkgutil
+import re
+import zlib
 
 from toulligqc.plotly_graph_common import _format_int
 from toulligqc.plotly_graph_common import figure_image_width
 from toulligqc.plotly_graph_common import graph_font
 from toulligqc.plotly_graph_common import help_html_link
+from toulligqc.plotly_graph_common import plotly_min_js
 from toulligqc.plotly_graph_common import title_size
 
 
@@ -46,6 +50,7 @@ def html_report(config_dictionary, result_dict, graphs):
 
     report_name = config_dictionary['report_name']
     remove_image_files = True if config_dictionary['images_directory'] is None else False
+    lazy_graphs = config_dictionary.get('lazy_report', 'False').lower() == 'true'
 
     # Get report date
     report_date = _get_result_date_value(result_dict, 'toulligqc.info.start.time', "Unknown")
@@ -63,9 +68,6 @@ def html_report(config_dictionary, result_dict, graphs):
         .replace("{title_size}", str(title_size)) \
         .replace("{graph_font}", str(graph_font))
 
-    # Read Plotly JavaScript code
-    plotly_min_js = pkgutil.get_data(__name__, "resources/plotly-latest.min.js").decode('utf8')
-
     f = open(config_dictionary['html_report_path'], 'w')
 
     # Create the report
@@ -107,22 +109,23 @@ def html_report(config_dictionary, result_dict, graphs):
     </div> <!-- End of Content -->
 
     <!-- Footer -->
-    <div id="footer"> Produced by <a href="{app_url}">{app_name}</a> (version {app_version})</div>
+    <div id="footer"> Produced by <a href="{app_url}">{app_name}</a> (version {app_version})</div>{lazy_graphs_script}
   </body>
 
 </html>""".format(report_name=report_name,
                   toulligqc_logo=_embedded_image("resources/toulligqc.png", True),
-                  plotlyjs=plotly_min_js,
+                  plotlyjs=plotly_min_js(),
                   css=css,
                   sample_id=sample_id,
                   run_date=run_date,
                   report_date=report_date,
                   summary_list=_summary(graphs),
                   modules_report=_modules_report(graphs, result_dict, sample_id, report_name, run_date,
-                                                 config_dictionary['app.version'], remove_image_files),
+                                                 config_dictionary['app.version'], remove_image_files, lazy_graphs),
                   app_url=config_dictionary['app.url'],
                   app_name=config_dictionary['app.name'],
-                  app_version=config_dictionary['app.version'])
+                  app_version=config_dictionary['app.version'],
+                  lazy_graphs_script=_lazy_graphs_script() if lazy_graphs else '')
 
     # Write the HTML page
     f.write(report)
@@ -144,9 +147,10 @@ def _summary(graphs):
     return result
 
 
-def _modules_report(graphs, result_dict, run_id, report_name, run_date, toulligqc_version, remove_image_files):
+def _modules_report(graphs, result_dict, run_id, report_name, run_date, toulligqc_version, remove_image_files,
+                    lazy_graphs=False):
     result = _basic_statistics_module_report(result_dict, run_id, report_name, run_date, toulligqc_version)
-    result += _other_module_reports(graphs, remove_image_files)
+    result += _other_module_reports(graphs, remove_image_files, lazy_graphs)
     return result
 
 
@@ -164,6 +168,28 @@ def _basic_statistics_module_report(result_dict, sample_id, report_name, run_dat
     n50 = result_dict["basecaller.sequencing.summary.1d.extractor.n50"]
     l50 = result_dict["basecaller.sequencing.summary.1d.extractor.l50"]
 
+    # Quick QC on a sample of the reads, only the read count and the yield are exact
+    sampling_rows = ""
+    if "basecaller.sequencing.summary.1d.extractor.sampling" in result_dict:
+        sampling_rows = """
+              <tr><th>Sampling</th><td>{sampling}, the statistics and graphs are computed on
+              {sampled_read_count} reads, read count and yield are exact</td></tr>""".format(
+            sampling=result_dict["basecaller.sequencing.summary.1d.extractor.sampling"],
+            sampled_read_count=_format_int(
+                int(result_dict["basecaller.sequencing.summary.1d.extractor.sampled.read.count"])))
+        n50 = "{} (sampled)".format(_format_int(int(n50)))
+        l50 = "{} (estimated from the sample)".format(_format_int(int(l50)))
+    elif "basecaller.sequencing.summary.1d.extractor.streaming.sampled.read.count" in result_dict:
+        # Streaming mode, the statistics are computed on all the reads and the distribution graphs on a sample
+        sampling_rows = """
+              <tr><th>Sampling</th><td>the distribution graphs are computed on {sampled_read_count} reads,
+              the statistics on all the reads</td></tr>""".format(
+            sampled_read_count=_format_int(
+                int(result_dict["basecaller.sequencing.summary.1d.extractor.streaming.sampled.read.count"])))
+    else:
+        n50 = _format_int(int(n50))
+        l50 = _format_int(int(l50))
+
     # from telemetry file
     flow_cell_id = _get_result_value(result_dict, 'sequencing.telemetry.extractor.flowcell.id', "Unknown")
     experiment_group = _get_result_value(result_dict, 'sequencing.telemetry.extractor.protocol.group.id', "Unknown")
@@ -215,7 +241,7 @@ def _basic_statistics_module_report(result_dict, sample_id, report_name, run_dat
               <tr><th>Yield</th><td>{run_yield}</td></tr>
               <tr><th>Read count</th><td>{read_count}</td></tr>
               <tr><th>N50 (bp)</th><td>{n50}</td></tr>
-              <tr><th>L50</th><td>{l50}</td></tr>
+              <tr><th>L50</th><td>{l50}</td></tr>{sampling_rows}
               </tbody>
             </table>
       </div> <!-- End of "Run-statistics" module -->
@@ -236,8 +262,9 @@ def _basic_statistics_module_report(result_dict, sample_id, report_name, run_dat
                sample_frequency=sample_frequency,
                run_yield=run_yield,
                read_count=_format_int(read_count),
-               n50=_format_int(int(n50)),
-               l50=_format_int(int(l50)))
+               n50=n50,
+               l50=l50,
+               sampling_rows=sampling_rows)
 
     result += """
       <div class="module" id="software_info">
@@ -279,7 +306,7 @@ def _basic_statistics_module_report(result_dict, sample_id, report_name, run_dat
     return result
 
 
-def _other_module_reports(graphs, remove_image_files):
+def _other_module_reports(graphs, remove_image_files, lazy_graphs=False):
     result = ""
 
     for i, t in enumerate(graphs):
@@ -288,6 +315,8 @@ def _other_module_reports(graphs, remove_image_files):
             # Plotly Graph
 
             name, path, table, html = t
+            if lazy_graphs:
+                html = _lazy_graph_div(html)
 
             # Plotly graph with table
             if table is not None:
@@ -335,6 +364,54 @@ def _other_module_reports(graphs, remove_image_files):
     return result
 
 
+# Graph div and figure arguments created by plotly.offline.plot() with the div output type
+_plotly_graph_div_pattern = re.compile(r'<div id="([^"]+)" class="plotly-graph-div" style="([^"]*)"></div>')
+_plotly_new_plot = 'Plotly.newPlot('
+_plotly_argument_separator_pattern = re.compile(r'\s*,?\s*')
+
+
+def _lazy_graph_div(div):
+    """
+    Replace a Plotly graph by a div storing its figure as deflate compressed and base64 encoded JSON, the figure is
+    rendered by the lazy graphs script when the div is scrolled into view
+    :param div: HTML code of the graph created by plotly.offline.plot()
+    :return: a string with the HTML code of the lazy graph, or the unchanged div if the graph is not recognized
+    """
+    match = _plotly_graph_div_pattern.search(div)
+    if match is None or div.count(_plotly_new_plot) != 1:
+        return div
+
+    # Read the id, data, layout and config arguments of Plotly.newPlot()
+    decoder = json.JSONDecoder()
+    position = div.index(_plotly_new_plot) + len(_plotly_new_plot)
+    arguments = []
+    try:
+        for _ in range(4):
+            position = _plotly_argument_separator_pattern.match(div, position).end()
+            argument, position = decoder.raw_decode(div, position)
+            arguments.append(argument)
+    except ValueError:
+        return div
+
+    graph_id, data, layout, config = arguments
+    if graph_id != match.group(1):
+        return div
+
+    figure = json.dumps({'data': data, 'layout': layout, 'config': config}, separators=(',', ':'))
+    payload = base64.b64encode(zlib.compress(figure.encode('utf8'), 9)).decode('ascii')
+    return '<div id="{graph_id}" class="plotly-graph-div lazy-graph" style="{style}" data-figure="{payload}"></div>' \
+        .format(graph_id=graph_id, style=match.group(2), payload=payload)
+
+
+def _lazy_graphs_script():
+    """
+    Script rendering the lazy graphs when they are scrolled into view
+    :return: a string with the HTML code of the script
+    """
+    script = pkgutil.get_data(__name__, "resources/lazy-graphs.js").decode('utf8')
+    return "\n    <script>\n{}    </script>".format(script)
+
+
 def _embedded_image(image_path, resource=False, remove=False):
     """
     Embedded an image
@@ -0,0 +1,154 @@
+import os
+import json
+import hashlib
+import numpy as np
+import pandas as pd
+from toulligqc import version
+
+# Version of the format of the cached columns, to increase when the parsing of the input files changes
+PARSE_CACHE_VERSION = 2
+
+# Default maximal size in MB of the cache directory
+DEFAULT_CACHE_SIZE = 10240
+
+_METADATA_KEY = '__metadata__'
+_COLUMNS_KEY = '__columns__'
+
+
+class ParseCache:
+    """
+    Cache of the per read columns parsed from input files. Each entry is a .npz file named after a hash of the
+    absolute path, size and modification time of the input files, the parser version and the options used for the
+    parsing. The least recently used entries are removed when the cache grows over its maximal size.
+    """
+
+    def __init__(self, directory, max_size=DEFAULT_CACHE_SIZE * 1024 * 1024):
+        """
+        :param directory: cache directory
+        :param max_size: maximal size in bytes of the cache directory
+        """
+        self.directory = directory
+        self.max_size = max_size
+
+    @staticmethod
+    def from_config(config_dictionary):
+        """
+        Create the cache from the configuration
+        :param config_dictionary: configuration dictionary with the optional cache_directory and cache_size settings
+        :return: a ParseCache object or None when no cache directory is set
+        """
+        directory = config_dictionary.get('cache_directory', '')
+        if not directory or directory == 'None':
+            return None
+        max_size = int(config_dictionary.get('cache_size', DEFAULT_CACHE_SIZE)) * 1024 * 1024
+        return ParseCache(directory, max_size)
+
+    @staticmethod
+    def key(files, options):
+        """
+        Compute the key of the columns parsed from input files
+        :param files: list of input files
+        :param options: dictionary with the options of the parsing
+        :return: the key as an hexadecimal string
+        """
+        inputs = []
+        for filename in files:
+            stat = os.stat(filename)
+            inputs.append([os.path.abspath(filename), stat.st_size, stat.st_mtime_ns])
+        description = json.dumps({'inputs': inputs,
+                                  'options': options,
+                                  'parser': [PARSE_CACHE_VERSION, version.__version__]}, sort_keys=True)
+        return hashlib.sha256(description.encode()).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + '.npz')
+
+    def load(self, key):
+        """
+        Load cached columns
+        :param key: key of the columns
+        :return: (Pandas Dataframe object, metadata dictionary) or None if the key is not in the cache
+        """
+        path = self._path(key)
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                metadata = json.loads(str(data[_METADATA_KEY]))
+                columns = {}
+                for column in data[_COLUMNS_KEY]:
+                    column = str(column)
+                    if column in data:
+                        values = data[column]
+                        columns[column] = values.astype(object) if values.dtype.kind == 'U' else values
+                    else:
+                        columns[column] = pd.Categorical.from_codes(data[column + '.codes'],
+                                                                    data[column + '.categories'].tolist())
+        except (OSError, ValueError, KeyError):
+            return None
+
+        # The modification time of the entries is their last use
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return pd.DataFrame(columns), metadata
+
+    def store(self, key, dataframe, metadata):
+        """
+        Store the columns of a dataframe in the cache and remove the least recently used entries if the cache is full
+        :param key: key of the columns
+        :param dataframe: Pandas Dataframe object with the columns
+        :param metadata: dictionary with other values to cache, serializable in JSON
+        """
+        arrays = {_METADATA_KEY: np.array(json.dumps(metadata)),
+                  _COLUMNS_KEY: np.array(list(dataframe.columns), dtype=str)}
+        for column in dataframe.columns:
+            values = dataframe[column]
+            if isinstance(values.dtype, pd.CategoricalDtype):
+                arrays[column + '.codes'] = values.cat.codes.to_numpy()
+                arrays[column + '.categories'] = np.array([str(category) for category in values.cat.categories],
+                                                          dtype=str)
+            elif values.dtype == object:
+                arrays[column] = values.to_numpy().astype(str)
+            else:
+                arrays[column] = values.to_numpy()
+
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(key)
+        temporary_path = path + '.' + str(os.getpid()) + '.tmp'
+        try:
+            with open(temporary_path, 'wb') as f:
+                np.savez(f, **arrays)
+            os.replace(temporary_path, path)
+        except OSError:
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+            return
+        self.evict(keep=path)
+
+    def evict(self, keep=None):
+        """
+        Remove the least recently used entries until the size of the cache is lower than its maximal size
+        :param keep: path of an entry to never remove
+        """
+        entries = []
+        for filename in os.listdir(self.directory):
+            if not filename.endswith('.npz'):
+                continue
+            path = os.path.join(self.directory, filename)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, path))
+
+        size = sum(entry[1] for entry in entries)
+        for _, entry_size, path in sorted(entries):
+            if size <= self.max_size:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            size -= entry_size
@@ -20,9 +20,11 @@
 
 # This module contains common methods for plotly modules.
 
-from collections import defaultdict
-
+import functools
+import hashlib
+import os
 import pkgutil
+import threading
 import numpy as np
 import pandas as pd
 import plotly.graph_objs as go
@@ -31,11 +33,16 @@ from scipy.interpolate import interp1d
 from scipy.ndimage.filters import gaussian_filter1d
 from sklearn.utils import resample
 
+from toulligqc.common_statistics import SortedStatistics, get_statistics
+
 figure_image_width = 1000
 figure_image_height = 562
 percent_format_str = '{:.2f}%'
 line_width = 2
 
+# Number of read length bins and of PHRED score bins of the read length and PHRED score density graphs
+DEFAULT_DENSITY_GRID_SIZE = 100
+
 toulligqc_colors = {'all': '#fca311',  # Yellow
                     'all_1d2': '#fca311',  # Yellow
                     'pass': '#51a96d',  # Green
@@ -159,13 +166,39 @@ def _yaxis(title, args=None):
     return dict(yaxis=axis_dict)
 
 
-def _make_describe_dataframe(value):
+def _column_statistics(df, statistics=None):
+    """
+    SortedStatistics of each column of a dataframe
+    :param df: dataframe
+    :param statistics: dictionary of the SortedStatistics already computed, keyed by column name, or None
+    :return: a dictionary of SortedStatistics keyed by column name
+    """
+    statistics = statistics or {}
+    return {column: statistics[column] if column in statistics else SortedStatistics(df[column])
+            for column in df.columns}
+
+
+def _read_type_statistics(dataframe_dict, entry: str, names):
+    """
+    SortedStatistics of the all, pass and fail reads from the statistics cache of a dataframe_dict
+    :param dataframe_dict: dictionary of the series
+    :param entry: name of the series without the read type (e.g. sequence.length or mean.qscore)
+    :param names: names of the all, pass and fail read columns
+    :return: a dictionary of SortedStatistics keyed by column name
+    """
+    return {name: get_statistics(dataframe_dict, read_type + '.reads.' + entry)
+            for name, read_type in zip(names, ('all', 'pass', 'fail'))}
+
+
+def _make_describe_dataframe(value, statistics=None):
     """
     Creation of a statistics table printed with the graph in report.html
-    :param value: information measured (series)
+    :param value: information measured (dataframe)
+    :param statistics: dictionary of the SortedStatistics of the columns, keyed by column name, or None
     """
 
-    desc = value.describe()
+    desc = pd.DataFrame({column: column_statistics.describe()
+                         for column, column_statistics in _column_statistics(value, statistics).items()})
     desc.loc['count'] = desc.loc['count'].astype(int).apply(lambda x: _format_int(x))
     desc.iloc[1:] = desc.iloc[1:].applymap(lambda x: _format_float(x))
     desc.rename({'50%': 'median'}, axis='index', inplace=True)
@@ -238,11 +271,12 @@ def _precompute_boxplot_values(y):
     """
     Precompute values for boxplot to avoid data storage in boxplot.
     https://github.com/plotly/plotly.js/blob/master/src/traces/box/calc.js
+    :param y: values (series) or their SortedStatistics
     """
 
-    y = y.dropna()
+    y = y if isinstance(y, SortedStatistics) else SortedStatistics(y)
 
-    if len(y) == 0:
+    if y.count == 0:
         return dict(min=0,
                     lowerfence=0,
                     q1=0,
@@ -252,26 +286,25 @@ def _precompute_boxplot_values(y):
                     max=0,
                     notchspan=0)
 
-    q1 = y.quantile(.25)
-    q3 = y.quantile(.75)
+    q1, median, q3 = y.quantile([.25, .5, .75])
     iqr = q3 - q1
     upper_fence = q3 + (1.5 * iqr)
     lower_fence = q1 - (1.5 * iqr)
     import math
-    notchspan = 1.57 * iqr / math.sqrt(len(y))
+    notchspan = 1.57 * iqr / math.sqrt(y.count)
 
-    return dict(min=min(y),
-                lowerfence=max(lower_fence, float(min(y))),
+    return dict(min=y.min(),
+                lowerfence=max(lower_fence, float(y.min())),
                 q1=q1,
-                median=y.quantile(.5),
+                median=median,
                 q3=q3,
-                upperfence=min(upper_fence, float(max(y))),
-                max=max(y),
+                upperfence=min(upper_fence, float(y.max())),
+                max=y.max(),
                 notchspan=notchspan)
 
 
-def _dataFrame_to_html(df):
-    return pd.DataFrame.to_html(df, border="")
+def _dataFrame_to_html(df, float_format=None):
+    return pd.DataFrame.to_html(df, border="", float_format=float_format)
 
 
 def _transparent_colors(colors, background_color, a):
@@ -302,12 +335,75 @@ def _transparent_component(c, b, a):
         return '0' + r
     return r
 
-def _copy_latest_minjs(result_directory, js_file):
-    with open(result_directory + '/' + js_file , 'w+') as f:
-        plotly_min_js = pkgutil.get_data(__name__, "resources/plotly-latest.min.js").decode('utf8')
-        f.write(plotly_min_js) 
+# Plotly JavaScript file shared by the standalone pages of the graphs
+plotly_js_file = "plotly.min.js"
+
+# Paths of the plotly.min.js files checked or written by this process
+_plotly_js_paths = set()
+_plotly_js_lock = threading.Lock()
+
+
+@functools.lru_cache(maxsize=None)
+def _bundled_plotly_js():
+    """
+    Read the bundled Plotly JavaScript code once per process
+    :return: a tuple with the code (bytes) and its SHA-256 digest
+    """
+    data = pkgutil.get_data(__name__, "resources/plotly-latest.min.js")
+    return data, hashlib.sha256(data).digest()
+
+
+def plotly_min_js():
+    """
+    Get the bundled Plotly JavaScript code
+    :return: a string
+    """
+    return _bundled_plotly_js()[0].decode('utf8')
+
+
+def _copy_latest_minjs(result_directory, js_file=plotly_js_file):
+    """
+    Write the bundled Plotly JavaScript code in a directory, only if the file is missing or stale
+    :param result_directory: directory of the standalone pages of the graphs
+    :param js_file: name of the JavaScript file
+    """
+    path = os.path.join(result_directory, js_file)
+    with _plotly_js_lock:
+        exists = os.path.isfile(path)
+        if exists and path in _plotly_js_paths:
+            return
+        data, digest = _bundled_plotly_js()
+        if not exists or os.path.getsize(path) != len(data) or _file_digest(path) != digest:
+            with open(path, 'wb') as f:
+                f.write(data)
+        _plotly_js_paths.add(path)
+
+
+def _file_digest(path):
+    """
+    SHA-256 digest of a file
+    """
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).digest()
+
+# Plotly imports some modules at the first serialization of a figure, which is not thread safe
+_plotly_init_lock = threading.Lock()
+_plotly_initialized = False
+
+
+def _init_plotly():
+    """
+    Serialize an empty figure once before the graphs are serialized by several threads
+    """
+    global _plotly_initialized
+    with _plotly_init_lock:
+        if not _plotly_initialized:
+            py.plot(go.Figure(), include_plotlyjs=False, output_type='div', auto_open=False, show_link=False)
+            _plotly_initialized = True
+
 
 def _create_and_save_div(fig, result_directory, main):
+    _init_plotly()
     div = py.plot(fig,
                   include_plotlyjs=False,
                   output_type='div',
@@ -316,19 +412,70 @@ def _create_and_save_div(fig, result_directory, main):
 
     if result_directory is not None:
         output_file = result_directory + '/' + '_'.join(main.split())
-        js_file="plotly.min.js"
         py.plot(fig,
                 filename=output_file,
                 output_type="file",
-                include_plotlyjs= js_file, 
+                include_plotlyjs=plotly_js_file,
                 auto_open=False)
-        _copy_latest_minjs(result_directory, js_file)
+        _copy_latest_minjs(result_directory)
     else:
         output_file = None
 
     return div, output_file
 
 
+def _time_bins(time_series, npoints: int):
+    """
+    Bin the reads by start time
+    :param time_series: start time of the reads in seconds
+    :param npoints: number of time bins
+    :return: a tuple with the time of the bins in hours and the bin index of each read, the index of the first
+    bin with the same time
+    """
+    t = (time_series / 3600).values
+    x = np.linspace(t.min(), t.max(), num=npoints)
+    bins = np.searchsorted(x, x[np.digitize(t, bins=x, right=True)], side='left')
+    return x, bins
+
+
+def _binned_percentiles(bins, nbins: int, values, percentiles):
+    """
+    Percentiles of the values of each bin, with the same linear interpolation as np.percentile().
+    The values are sorted once by bin and by value and the bins are delimited with np.searchsorted(), so the
+    percentiles of all the bins are computed at once
+    :param bins: bin index of each value
+    :param nbins: number of bins
+    :param values: array-like values
+    :param percentiles: percentiles between 0 and 100
+    :return: a list with an array of nbins values for each percentile, NaN for the empty bins and the bins with
+    NaN values
+    """
+    values = np.asarray(values, dtype=np.float64)
+    order = np.lexsort((values, bins))
+    sorted_bins, sorted_values = bins[order], values[order]
+    bin_indexes = np.arange(nbins)
+    starts = np.searchsorted(sorted_bins, bin_indexes, side='left')
+    counts = np.searchsorted(sorted_bins, bin_indexes, side='right') - starts
+    nan_bins = np.bincount(bins[np.isnan(values)], minlength=nbins) > 0
+    filled = counts > 0
+    starts, counts = starts[filled], counts[filled]
+
+    result = []
+    for p in percentiles:
+        virtual_indexes = (counts - 1) * (p / 100)
+        previous_indexes = np.floor(virtual_indexes)
+        gamma = virtual_indexes - previous_indexes
+        lower = starts + previous_indexes.astype(np.intp)
+        upper = np.minimum(lower + 1, starts + counts - 1)
+        lower_values, upper_values = sorted_values[lower], sorted_values[upper]
+        diff = upper_values - lower_values
+        y = np.full(nbins, np.nan)
+        y[filled] = np.where(gamma >= 0.5, upper_values - diff * (1 - gamma), lower_values + diff * gamma)
+        y[nan_bins] = np.nan
+        result.append(y)
+    return result
+
+
 def _over_time_graph(data_series,
                      time_series,
                      result_directory,
@@ -344,37 +491,22 @@ def _over_time_graph(data_series,
                      green_zone_color='rgba(0,100,0,.1)'):
     time_bins, sigma = interpolation_points(time_series, 'over_time_graph')
 
-    t = (time_series / 3600).values
-    x = np.linspace(t.min(), t.max(), num=time_bins)
-    t = np.digitize(t, bins=x, right=True)
-
-    bin_dict = defaultdict(list)
-    for bin_idx, val in zip(t, data_series):
-        b = x[bin_idx]
-        bin_dict[b].append(val)
+    x, bins = _time_bins(time_series, time_bins)
 
     percentiles = (0, 25, 50, 75, 100)
-    y = []
-    for i in range(len(percentiles)):
-        y.append([])
-
-    for b in x:
-        if b in bin_dict:
-            for i, v in enumerate(percentiles):
-                y[i].append(np.percentile(bin_dict[b], v))
-        else:
-            for i in range(len(percentiles)):
-                y[i].append(np.nan)
+    y = _binned_percentiles(bins, len(x), data_series, percentiles)
 
+    # Bins with the same time share the same reads
+    same_time_bins = np.searchsorted(x, x, side='left')
     for i, v in enumerate(y):
-        y[i] = gaussian_filter1d(v, sigma=sigma)
+        y[i] = gaussian_filter1d(v[same_time_bins], sigma=sigma)
 
     fig = go.Figure()
 
     # define the green zone if required
     if green_zone_starts_at is not None:
-        min_x = min(time_series) / 3600
-        max_x = max(time_series) / 3600
+        min_x = x[0]
+        max_x = x[-1]
         if min_max:
             max_y = max(y[4]) * 1.05
         else:
@@ -482,28 +614,28 @@ def _over_time_graph(data_series,
     return graph_name, output_file, table_html, div
 
 
-def _barcode_boxplot_graph(graph_name, df, barcode_selection, pass_color, fail_color, yaxis_title, legend_title,
-                           result_directory, barcode_alias=None):
-    # Sort reads by read type and drop read type column
-    pass_df = df.loc[df['passes_filtering'] == bool(True)].drop(columns='passes_filtering')
-    fail_df = df.loc[df['passes_filtering'] == bool(False)].drop(columns='passes_filtering')
-
+def _barcode_boxplot_graph(graph_name, barcode_groups, column, barcode_selection, pass_color, fail_color, yaxis_title,
+                           legend_title, result_directory, barcode_alias=None):
+    """
+    Boxplots of the pass and fail reads of each barcode
+    :param barcode_groups: BarcodeGroups of the reads
+    :param column: name of the column of the values to plot
+    :param barcode_selection: barcodes to plot
+    """
     fig = go.Figure()
 
     for read_type in ('Pass', 'Fail'):
 
         if read_type == 'Pass':
-            df = pass_df
             color = pass_color
         else:
-            df = fail_df
             color = fail_color
 
         first = True
         for barcode in sorted(barcode_selection):
 
-            df[barcode] = df[barcode].loc[df[barcode] > 0]
-            d = _precompute_boxplot_values(df[barcode])
+            values = barcode_groups.values(column, barcode, read_type == 'Pass')
+            d = _precompute_boxplot_values(values[values > 0])
             fig.add_trace(go.Box(
                 q1=[d['q1']],
                 median=[d['median']],
@@ -677,20 +809,25 @@ def _pie_chart_graph(graph_name, count_sorted, color_palette, one_d_square, resu
         barcode_table = barcode_table.rename(index=barcode_alias)
 
     barcode_table.sort_index(inplace=True)
-    pd.options.display.float_format = percent_format_str.format
     barcode_table[count_col_name] = barcode_table[count_col_name].astype(int).apply(lambda x: _format_int(x))
     barcode_table["Base count"] = barcode_table["Base count"].astype(int).apply(lambda x: _format_int(x))
-    table_html = _dataFrame_to_html(barcode_table)
+    table_html = _dataFrame_to_html(barcode_table, float_format=percent_format_str.format)
 
     div, output_file = _create_and_save_div(fig, result_directory, graph_name)
     return graph_name, output_file, table_html, div
 
 
 def _read_length_distribution(graph_name, all_reads, pass_reads, fail_reads, all_color, pass_color, fail_color,
-                              xaxis_title, result_directory):
+                              xaxis_title, result_directory, statistics=None):
+    # Create data for HTML table
+    table_df = pd.concat([pd.Series(all_reads), pass_reads, fail_reads], axis=1,
+                         keys=['All reads', 'Pass reads', 'Fail reads'])
+    statistics = _column_statistics(table_df, statistics)
+    all_reads_statistics = statistics['All reads']
+
     npoints, sigma = interpolation_points(all_reads, 'read_length_distribution')
-    min_all_reads = min(all_reads)
-    max_all_reads = max(all_reads)
+    min_all_reads = all_reads_statistics.min()
+    max_all_reads = all_reads_statistics.max()
 
     count_x1, count_y1, cum_count_y1 = _smooth_data(npoints=npoints, sigma=sigma,
                                                     data=all_reads,
@@ -713,7 +850,7 @@ def _read_length_distribution(graph_name, all_reads, pass_reads, fail_reads, all
                                                     min_arg=min_all_reads, max_arg=max_all_reads)
 
     # Find 50 percentile for zoomed range on x axis
-    max_x_range = np.percentile(all_reads, 99)
+    max_x_range = all_reads_statistics.percentile(99)
 
     coef = max_all_reads / npoints
 
@@ -747,7 +884,7 @@ def _read_length_distribution(graph_name, all_reads, pass_reads, fail_reads, all
 
     # Threshold
     for p in [25, 50, 75]:
-        x0 = np.percentile(all_reads, p)
+        x0 = all_reads_statistics.percentile(p)
         if p == 50:
             t = 'median<br>all reads'
         else:
@@ -791,7 +928,7 @@ def _read_length_distribution(graph_name, all_reads, pass_reads, fail_reads, all
 
     # Threshold
     for p in [25, 50, 75]:
-        x0 = np.percentile(all_reads, p)
+        x0 = all_reads_statistics.percentile(p)
         if p == 50:
             t = 'median<br>all reads'
         else:
@@ -864,29 +1001,30 @@ def _read_length_distribution(graph_name, all_reads, pass_reads, fail_reads, all
         ]
     )
 
-    # Create data for HTML table
-    table_df = pd.concat([pd.Series(all_reads), pass_reads, fail_reads], axis=1,
-                         keys=['All reads', 'Pass reads', 'Fail reads'])
-    table_html = _dataFrame_to_html(_make_describe_dataframe(table_df))
+    table_html = _dataFrame_to_html(_make_describe_dataframe(table_df, statistics))
 
     div, output_file = _create_and_save_div(fig, result_directory, graph_name)
     return graph_name, output_file, table_html, div
 
 
-def _phred_score_density(graph_name, dataframe, prefix, all_color, pass_color, fail_color, result_directory):
+def _phred_score_density(graph_name, dataframe, prefix, all_color, pass_color, fail_color, result_directory,
+                         statistics=None):
     all_series = dataframe[prefix].dropna()
     pass_series = dataframe[prefix + " pass"].dropna()
     fail_series = dataframe[prefix + " fail"].dropna()
+    statistics = _column_statistics(dataframe, statistics)
 
     npoints, sigma = interpolation_points(all_series, 'phred_score_density')
 
+    min_all_series = statistics[prefix].min()
+    max_all_series = statistics[prefix].max()
     count_x2, count_y2, cum_count_y2 = _smooth_data(npoints=npoints, sigma=sigma,
                                                     data=pass_series,
-                                                    min_arg=np.nanmin(all_series), max_arg=np.nanmax(all_series),
+                                                    min_arg=min_all_series, max_arg=max_all_series,
                                                     density=True)
     count_x3, count_y3, cum_count_y3 = _smooth_data(npoints=npoints, sigma=sigma,
                                                     data=fail_series,
-                                                    min_arg=np.nanmin(all_series), max_arg=np.nanmax(all_series),
+                                                    min_arg=min_all_series, max_arg=max_all_series,
                                                     density=True)
 
     count_y2 = count_y2 / len(all_series)
@@ -913,7 +1051,7 @@ def _phred_score_density(graph_name, dataframe, prefix, all_color, pass_color, f
 
     # Threshold
     for p in [25, 50, 75]:
-        x0 = np.percentile(pass_series, p)
+        x0 = statistics[prefix + " pass"].percentile(p)
         if p == 50:
             t = 'median'
         else:
@@ -945,11 +1083,12 @@ def _phred_score_density(graph_name, dataframe, prefix, all_color, pass_color, f
     return graph_name, output_file, table_html, div
 
 
-def _quality_multiboxplot(graph_name, result_directory, df, onedsquare=False):
+def _quality_multiboxplot(graph_name, result_directory, df, onedsquare=False, statistics=None):
     if onedsquare:
         prefix = '1D²'
     else:
         prefix = '1D'
+    statistics = _column_statistics(df, statistics)
 
     # If more than 10.000 reads, interpolate data
     npoints = interpolation_points(df[prefix], 'phred_violin')[0]
@@ -978,7 +1117,7 @@ def _quality_multiboxplot(graph_name, result_directory, df, onedsquare=False):
     fig = go.Figure()
 
     for column in df.columns:
-        d = _precompute_boxplot_values(df[column])
+        d = _precompute_boxplot_values(statistics[column])
         fig.add_trace(go.Box(
             q1=[d['q1']], median=[d['median']], q3=[d['q3']], lowerfence=[d['lowerfence']],
             upperfence=[d['upperfence']],
@@ -1038,13 +1177,62 @@ def _quality_multiboxplot(graph_name, result_directory, df, onedsquare=False):
 
     df = df[[prefix, prefix + " pass", prefix + " fail"]]
     df.columns = ["All reads", "Pass reads", "Fail reads"]
-    table_html = _dataFrame_to_html(_make_describe_dataframe(df))
+    table_html = _dataFrame_to_html(_make_describe_dataframe(df, {
+        "All reads": statistics[prefix],
+        "Pass reads": statistics[prefix + " pass"],
+        "Fail reads": statistics[prefix + " fail"]}))
 
     div, output_file = _create_and_save_div(fig, result_directory, graph_name)
     return graph_name, output_file, table_html, div
 
 
-def _twod_density_char(graph_name, dataframe_dict, result_directory, onedsquare=False):
+def _grid_edges(low, high, grid_size: int):
+    """
+    Edges of evenly spaced bins
+    :param low: lowest value
+    :param high: highest value
+    :param grid_size: number of bins
+    :return: a numpy array with grid_size + 1 edges
+    """
+    if not np.isfinite(low) or not np.isfinite(high):
+        low, high = 0.0, 1.0
+    if high <= low:
+        high = low + 1.0
+    return np.linspace(low, high, grid_size + 1)
+
+
+def _bin_indexes(values, edges):
+    """
+    Index of the evenly spaced bin of each value, the values out of the edges are put in the first or last bin
+    """
+    n = len(edges) - 1
+    indexes = np.floor((values - edges[0]) / (edges[-1] - edges[0]) * n)
+    return np.clip(indexes, 0, n - 1).astype(np.intp)
+
+
+def _density_grid(lengths, qscores, length_edges, qscore_edges):
+    """
+    Count all the reads in the cells of a grid of log10 read lengths and PHRED scores
+    :param lengths: read lengths (pd.Series)
+    :param qscores: PHRED scores of the reads (pd.Series)
+    :param length_edges: evenly spaced edges of the log10 read length bins
+    :param qscore_edges: evenly spaced edges of the PHRED score bins
+    :return: a 2D numpy array with the read counts, indexed by PHRED score bin and read length bin
+    """
+    log_lengths = np.log10(np.maximum(lengths.to_numpy(dtype=np.float64), 1))
+    qscores = qscores.to_numpy(dtype=np.float64)
+    keep = ~np.isnan(log_lengths) & ~np.isnan(qscores)
+    nx, ny = len(length_edges) - 1, len(qscore_edges) - 1
+    cells = _bin_indexes(qscores[keep], qscore_edges) * nx + _bin_indexes(log_lengths[keep], length_edges)
+    return np.bincount(cells, minlength=nx * ny).reshape(ny, nx)
+
+
+def _twod_density_char(graph_name, dataframe_dict, result_directory, onedsquare=False,
+                       grid_size=DEFAULT_DENSITY_GRID_SIZE):
+    """
+    Density of the reads by read length and PHRED score. The reads are counted on a grid of grid_size log10 read
+    length bins by grid_size PHRED score bins, only the grid is embedded in the report
+    """
     read_pass_length = dataframe_dict["pass.reads.sequence.length"]
     read_pass_qscore = dataframe_dict["pass.reads.mean.qscore"]
     read_fail_length = dataframe_dict["fail.reads.sequence.length"]
@@ -1055,13 +1243,24 @@ def _twod_density_char(graph_name, dataframe_dict, result_directory, onedsquare=
 
     prefix = '1D² ' if onedsquare else ''
     graph_name = prefix + graph_name
-    npoint = 50000
 
     fig = go.Figure()
-    
-    idx_pass = np.random.choice(read_pass_length.index, min(npoint, len(read_pass_length)), replace=False)
-    idx_fail = np.random.choice(read_fail_length.index, min(npoint, len(read_fail_length)), replace=False)
-    idx_all = np.random.choice(all_length.index, min(npoint, len(all_length)), replace=False)
+
+    all_length_statistics = get_statistics(dataframe_dict, 'all.reads.sequence.length')
+    all_qscore_statistics = get_statistics(dataframe_dict, 'all.reads.mean.qscore')
+
+    # Same grid for all, pass and fail reads
+    length_edges = _grid_edges(np.log10(max(all_length_statistics.min(), 1)),
+                               np.log10(max(all_length_statistics.max(), 1)), grid_size)
+    qscore_edges = _grid_edges(all_qscore_statistics.min(), all_qscore_statistics.max(), grid_size)
+    length_centers = 10 ** ((length_edges[:-1] + length_edges[1:]) / 2)
+    length_widths = np.diff(10 ** length_edges)
+    qscore_centers = (qscore_edges[:-1] + qscore_edges[1:]) / 2
+    qscore_width = qscore_edges[1] - qscore_edges[0]
+
+    all_grid = _density_grid(all_length, all_qscore, length_edges, qscore_edges)
+    pass_grid = _density_grid(read_pass_length, read_pass_qscore, length_edges, qscore_edges)
+    fail_grid = _density_grid(read_fail_length, read_fail_qscore, length_edges, qscore_edges)
 
     pass_color = toulligqc_colors['pass']
     fail_color = toulligqc_colors['fail']
@@ -1069,9 +1268,10 @@ def _twod_density_char(graph_name, dataframe_dict, result_directory, onedsquare=
 
     empty_fail = len(read_fail_length) == 0
 
-    fig.add_trace(go.Histogram2dContour(
-            x = all_length[idx_all],
-            y = all_qscore[idx_all],
+    fig.add_trace(go.Contour(
+            x = length_centers,
+            y = qscore_centers,
+            z = all_grid,
             colorscale = [[0, 'white'], [0.5, 'khaki'], [1.0, all_color]], 
             reversescale = False,
             xaxis = 'x',
@@ -1081,9 +1281,10 @@ def _twod_density_char(graph_name, dataframe_dict, result_directory, onedsquare=
                 len = 0.5)
         ))
 
-    fig.add_trace(go.Histogram2dContour(
-            x = read_pass_length[idx_pass],
-            y = read_pass_qscore[idx_pass],
+    fig.add_trace(go.Contour(
+            x = length_centers,
+            y = qscore_centers,
+            z = pass_grid,
             colorscale = [[0, 'white'], [0.5, 'honeydew'], [1.0, pass_color]], 
             reversescale = False,
             xaxis = 'x',
@@ -1100,9 +1301,10 @@ def _twod_density_char(graph_name, dataframe_dict, result_directory, onedsquare=
         visible=False
         ))
 
-    fig.add_trace(go.Histogram2dContour(
-            x = read_fail_length[idx_fail],
-            y = read_fail_qscore[idx_fail],
+    fig.add_trace(go.Contour(
+            x = length_centers,
+            y = qscore_centers,
+            z = fail_grid,
             colorscale = [[0, 'white'], [0.5, 'coral'], [1.0, fail_color]],
             reversescale = False,
             xaxis = 'x',
@@ -1114,62 +1316,39 @@ def _twod_density_char(graph_name, dataframe_dict, result_directory, onedsquare=
         visible=False
         ))
     
-    max_x_range = np.percentile(all_length, 99) 
-    max_y_range = np.percentile(all_qscore, 99.8) 
-    fig.update_xaxes(range=[min(all_length), max_x_range]) 
-    fig.update_yaxes(range=[min(all_qscore), max_y_range])
-
-    fig.add_trace(go.Histogram(
-            y = all_qscore[idx_all],
-            xaxis = 'x2',
-            opacity = 0.5,
-            marker = dict(
-                color = all_color
-            )
-        ))
-
-    fig.add_trace(go.Histogram(
-            x = all_length[idx_all],
-            yaxis = 'y2',
-            opacity = 0.5,
-            marker = dict(
-                color = all_color
-            )
+    max_x_range = all_length_statistics.percentile(99)
+    max_y_range = all_qscore_statistics.percentile(99.8)
+    fig.update_xaxes(range=[all_length_statistics.min(), max_x_range])
+    fig.update_yaxes(range=[all_qscore_statistics.min(), max_y_range])
+
+    # Marginal distributions of the grids
+    for grid, color, opacity, visible in ((all_grid, all_color, 0.5, True),
+                                          (pass_grid, pass_color, None, False),
+                                          (fail_grid, fail_color, None, False)):
+        fig.add_trace(go.Bar(
+                x = grid.sum(axis=1),
+                y = qscore_centers,
+                width = qscore_width,
+                orientation = 'h',
+                xaxis = 'x2',
+                opacity = opacity,
+                marker = dict(
+                    color = color
+                ),
+                visible=visible
             ))
 
-    fig.add_trace(go.Histogram(
-            y = read_pass_qscore[idx_pass],
-            xaxis = 'x2',
-            marker = dict(
-                color = pass_color
-            ),
-            visible=False
-        ))
-
-    fig.add_trace(go.Histogram(
-            x = read_pass_length[idx_pass],
-            yaxis = 'y2',
-            marker = dict(
-                color = pass_color
-            ),
-            visible=False
+        fig.add_trace(go.Bar(
+                x = length_centers,
+                y = grid.sum(axis=0),
+                width = length_widths,
+                yaxis = 'y2',
+                opacity = opacity,
+                marker = dict(
+                    color = color
+                ),
+                visible=visible
             ))
-    fig.add_trace(go.Histogram(
-            y = read_fail_qscore[idx_fail],
-            xaxis = 'x2',
-            marker = dict(
-                color = fail_color
-            ),
-            visible=False
-        ))
-    fig.add_trace(go.Histogram(
-            x = read_fail_length[idx_fail],
-            yaxis = 'y2',
-            marker = dict(
-                color = fail_color
-            ),
-            visible=False
-        ))
 
     fig.update_layout(
         autosize = False,
@@ -1259,8 +1438,9 @@ def _twod_density_char(graph_name, dataframe_dict, result_directory, onedsquare=
     return graph_name, output_file, table_html, div
 
 
-def interpolation_points(series, graph_name):
-    count = len(series)
+def interpolation_points(series, graph_name, count=None):
+    if count is None:
+        count = len(series)
     threshold, npoints, sigma = interpolation_point_count_dict[graph_name]
 
     if threshold is not None:
@@ -20,7 +20,7 @@
 
 # Class for generating Plotly and MPL graphs and statistics tables in HTML format, they use the result_dict or dataframe_dict dictionnaries.
 
-import copy
+import functools
 import numpy as np
 import pandas as pd
 import plotly.graph_objs as go
@@ -36,7 +36,9 @@ from toulligqc.plotly_graph_common import _phred_score_density
 from toulligqc.plotly_graph_common import _pie_chart_graph
 from toulligqc.plotly_graph_common import _quality_multiboxplot
 from toulligqc.plotly_graph_common import _read_length_distribution
+from toulligqc.plotly_graph_common import _read_type_statistics
 from toulligqc.plotly_graph_common import _twod_density_char
+from toulligqc.plotly_graph_common import DEFAULT_DENSITY_GRID_SIZE
 from toulligqc.plotly_graph_common import _smooth_data
 from toulligqc.plotly_graph_common import _title
 from toulligqc.plotly_graph_common import _transparent_colors
@@ -162,12 +164,15 @@ def read_length_scatterplot(dataframe_dict, result_directory):
                                      pass_color=toulligqc_colors['pass'],
                                      fail_color=toulligqc_colors['fail'],
                                      xaxis_title='Read length (bp)',
-                                     result_directory=result_directory)
+                                     result_directory=result_directory,
+                                     statistics=_read_type_statistics(dataframe_dict, 'sequence.length',
+                                                                      ['All reads', 'Pass reads', 'Fail reads']))
 
 
 def yield_plot(df, result_directory, oneDsquare=False):
     """
     Plots the different reads (1D, 1D pass, 1D fail) produced along the run against the time(in hour)
+    When the dataframe has a read_count column, each row counts for read_count reads
     """
 
     graph_name = "Yield plot through time"
@@ -177,18 +182,21 @@ def yield_plot(df, result_directory, oneDsquare=False):
     else:
         start_time_column = 'start_time'
 
-    new_df = df.filter(['sequence_length', start_time_column, 'passes_filtering']).sort_values(by=start_time_column)
+    new_df = df.filter(['sequence_length', start_time_column, 'passes_filtering', 'read_count']) \
+        .sort_values(by=start_time_column)
     new_df['start_time'] = new_df[start_time_column] / 3600
 
-    all_reads_length_df = new_df.filter(['sequence_length', start_time_column])
-    pass_reads_length_df = new_df[new_df['passes_filtering'] == True].filter(['sequence_length', start_time_column])
-    fail_reads_length_df = new_df[new_df['passes_filtering'] == False].filter(['sequence_length', start_time_column])
+    columns = ['sequence_length', start_time_column, 'read_count']
+    all_reads_length_df = new_df.filter(columns)
+    pass_reads_length_df = new_df[new_df['passes_filtering'] == True].filter(columns)
+    fail_reads_length_df = new_df[new_df['passes_filtering'] == False].filter(columns)
 
     data = [(all_reads_length_df, 'All reads', toulligqc_colors['all']),
             (pass_reads_length_df, 'Pass reads', toulligqc_colors['pass']),
             (fail_reads_length_df, 'Fail reads', toulligqc_colors['fail'])]
 
-    npoints, sigma = interpolation_points(new_df['start_time'], 'yield_plot')
+    read_count = new_df['read_count'].sum() if 'read_count' in new_df else None
+    npoints, sigma = interpolation_points(new_df['start_time'], 'yield_plot', read_count)
     coef = max(all_reads_length_df[start_time_column]) / npoints
 
     fig = go.Figure()
@@ -202,7 +210,8 @@ def yield_plot(df, result_directory, oneDsquare=False):
             if d[1] not in smooth_data_dict:
                 if reads:
                     count_x, count_y, cum_count_y = _smooth_data(npoints=npoints, sigma=sigma,
-                                                                 data=d[0][start_time_column])
+                                                                 data=d[0][start_time_column],
+                                                                 weights=d[0].get('read_count'))
                 else:
                     count_x, count_y, cum_count_y = _smooth_data(npoints=npoints, sigma=sigma,
                                                                  data=d[0][start_time_column],
@@ -342,7 +351,8 @@ def read_quality_multiboxplot(dataframe_dict, result_directory):
          "1D fail": dataframe_dict['fail.reads.mean.qscore']
          })
 
-    return _quality_multiboxplot(graph_name, result_directory, df, onedsquare=False)
+    return _quality_multiboxplot(graph_name, result_directory, df, onedsquare=False,
+                                 statistics=_read_type_statistics(dataframe_dict, 'mean.qscore', df.columns))
 
 
 def allphred_score_frequency(dataframe_dict, result_directory):
@@ -363,33 +373,36 @@ def allphred_score_frequency(dataframe_dict, result_directory):
                                 all_color=toulligqc_colors['all'],
                                 pass_color=toulligqc_colors['pass'],
                                 fail_color=toulligqc_colors['fail'],
-                                result_directory=result_directory)
+                                result_directory=result_directory,
+                                statistics=_read_type_statistics(dataframe_dict, 'mean.qscore', dataframe.columns))
 
 
-def twod_density(dataframe_dict, result_directory):
+def twod_density(dataframe_dict, result_directory, grid_size=DEFAULT_DENSITY_GRID_SIZE):
     """
-    Plot the scatter plot representing the relation between the phred score and the sequence length in log
+    Plot the density of the reads by PHRED score and sequence length, counted on a grid of log sequence length bins
+    and PHRED score bins
+    :param grid_size: number of sequence length bins and of PHRED score bins
     """
 
     graph_name = "Correlation between read length and PHRED score"
     
-    return _twod_density_char(graph_name, dataframe_dict, result_directory)
-
+    return _twod_density_char(graph_name, dataframe_dict, result_directory, grid_size=grid_size)
 
-def _compute_channel_map(df):
 
-    max_channel = df['channel'].max()
-    if max_channel > 512:
-        # PromethION geometry
+@functools.lru_cache(maxsize=None)
+def _flowcell_channel_grid(geometry: str):
+    """
+    Channel of each position of the flowcell grid, 0 for the positions without channel
+    :param geometry: PromethION, Flongle or MinION
+    :return: a read-only 2D numpy array indexed by row and column
+    """
+    if geometry == 'PromethION':
         # Array is simple blocks of 25*10 channels
         channel_array = np.hstack([
             np.arange(x, x + 250).reshape(25, 10)
             for x in range(1, 2752, 250)])
-        ca = pd.DataFrame(channel_array).reset_index().melt('index')
-        ca.columns = ['row', 'column', 'channel']
 
-    elif max_channel <= 130:
-        # Flongle geometry
+    elif geometry == 'Flongle':
         # channels are in a simple grid except two upper- and
         # lower-most channels on right-hand column are missing
         channel_array = np.concatenate([
@@ -397,11 +410,8 @@ def _compute_channel_map(df):
             np.arange(13, 25), np.array([0]),
             np.arange(25, 115), np.array([0]),
             np.arange(115, 127), np.array([0])]).reshape(10, 13)
-        ca = pd.DataFrame(channel_array).reset_index().melt('index')
-        ca.columns = ['row', 'column', 'channel']
 
     else:
-        # MinION geometry
         # The array is composed of blocks of 64 channels, the low
         # halve is to the right (high to left), working inwards
         # in a 4 x 8 block
@@ -415,68 +425,66 @@ def _compute_channel_map(df):
         # lowest block is at the top
         first_channel = list(range(65, 450, 64)) + [1]
         channel_array = np.vstack([channel_block(x) for x in first_channel])
-        ca = pd.DataFrame(channel_array).reset_index().melt('index')
-        ca.columns = ['row', 'column', 'channel']
-
-    return ca
-
-
-def _compute_channel_count(df, channel_map):
 
-    # count pass reads per channel...
-    #counts = df[df['passes_filtering']] \
-    counts = df \
-        .groupby('channel') \
-        .size().to_frame('reads') \
-        .reset_index()
+    channel_array.setflags(write=False)
+    return channel_array
 
-    # ...and merge with the channel map
-    counts = counts.merge(channel_map, on='channel', how='outer').fillna(0)
 
-    max_row = counts['row'].max()
-    max_col = counts['column'].max()
-    data = counts.to_dict('split')['data']
-    z = []
-    ids = []
-    for i in range(max_row + 1):
-        z.append([np.nan] * (max_col + 1))
-        ids.append([0] * (max_col + 1))
+def _compute_channel_map(df):
+    """
+    Flowcell grid of the channels of the reads
+    :return: a 2D numpy array with the channel of each position of the grid, 0 for the positions without channel
+    """
+    max_channel = df['channel'].max()
+    if max_channel > 512:
+        return _flowcell_channel_grid('PromethION')
+    elif max_channel <= 130:
+        return _flowcell_channel_grid('Flongle')
+    else:
+        return _flowcell_channel_grid('MinION')
 
-    max_value = 0
-    for v in data:
-        if v[0] == 0:
-            z[v[2]][v[3]] = np.nan
-            ids[v[2]][v[3]] = 'no channel'
-        else:
-            z[v[2]][v[3]] = v[1]
-            ids[v[2]][v[3]] = str(v[0])
-            max_value = max(max_value, v[1])
 
-    return max_row, max_col, int(max_value), counts, z, ids
+def _compute_channel_count(channels, channel_map, weights=None):
+    """
+    Sum the weights of the reads of each channel and place the sums on the flowcell grid
+    :param channels: channel of each read (numpy array)
+    :param channel_map: flowcell grid from _compute_channel_map()
+    :param weights: weight of each read (numpy array, e.g. read counts, pass read flags, read lengths for the yield
+    or qscores for the mean qscore) or None to count the reads
+    :return: a 2D numpy array of float with the sum of each channel of the grid, NaN for the positions without
+    channel
+    """
+    sums = np.bincount(channels, weights=weights, minlength=channel_map.max() + 1)
+    return np.where(channel_map == 0, np.nan, sums[channel_map])
 
 
 def plot_performance(df, result_directory):
     """
     Plots the channels occupancy by the reads
     @:param pore_measure: reads number per pore
+    When the dataframe has a read_count column, each row counts for read_count reads
     """
 
     graph_name = "Channel occupancy of the flowcell"
 
     # Compute geometry of the flowcell
     channel_map = _compute_channel_map(df)
-    fail_df = df[~df['passes_filtering']]
-    max_row, max_col, max_value, counts, z_pass, ids = _compute_channel_count(df[df['passes_filtering']], channel_map)
-    if not fail_df.empty:
-        max_row, max_col, max_value, counts, z_fail, ids = _compute_channel_count(fail_df, channel_map)
-    max_row, max_col, max_value, counts, z_all, ids = _compute_channel_count(df, channel_map)
+    max_row, max_col = channel_map.shape[0] - 1, channel_map.shape[1] - 1
+    ids = np.where(channel_map == 0, 'no channel', channel_map.astype(str)).tolist()
+
+    channels = df['channel'].to_numpy().astype(np.int64)
+    read_counts = df['read_count'].to_numpy() if 'read_count' in df.columns else None
+    passes_filtering = df['passes_filtering'].to_numpy(dtype=bool)
+    fail_df_empty = passes_filtering.all()
+
+    z_all = _compute_channel_count(channels, channel_map, read_counts)
+    z_pass = _compute_channel_count(channels, channel_map,
+                                    passes_filtering if read_counts is None else read_counts * passes_filtering)
+    z_fail = z_all - z_pass
+    max_value = int(np.nanmax(z_all))
 
     # Compute fail ratio
-    z_ratio = copy.deepcopy(z_all)
-    for i in range(len(z_ratio)):
-        for j in range(len(z_ratio[i])):
-            if z_ratio[i][j] > 0:
-                z_ratio[i][j] = 0 if fail_df.empty else z_fail[i][j] / z_ratio[i][j] * 100.0
+    z_ratio = np.divide(z_fail, z_all, out=z_all.copy(), where=z_all > 0) * 100.0
 
     fig = go.Figure()
     fig.add_trace(go.Heatmap(x=list(range(1, max_col + 1)),
@@ -508,7 +516,7 @@ def plot_performance(df, result_directory):
                              text=ids,
                              hoverongaps=False,
                              visible=False))
-    if not fail_df.empty:
+    if not fail_df_empty:
         fig.add_trace(go.Heatmap(x=list(range(1, max_col + 1)),
                                 y=list(range(1, max_row + 1)),
                                 z=z_fail,
@@ -571,12 +579,12 @@ def plot_performance(df, result_directory):
                         args=[{'visible': [False, False, True, False]}, {'hovermode': 'x'}],
                         label="Fail reads",
                         method="update"
-                    ) if not fail_df.empty else dict(),
+                    ) if not fail_df_empty else dict(),
                     dict(
                         args=[{'visible': [False, False, False, True]}, {'hovermode': 'x'}],
                         label="Fail percent",
                         method="update"
-                    ) if not fail_df.empty else dict()
+                    ) if not fail_df_empty else dict()
                 ]),
                 pad={"r": 20, "t": 20, "l": 20, "b": 20},
                 showactive=True,
@@ -642,11 +650,12 @@ def barcode_length_boxplot(datafame_dict, result_directory, barcode_alias):
 
     graph_name = "Read size distribution for barcodes"
 
-    df = datafame_dict['barcode_selection_sequence_length_dataframe']
+    barcode_groups = datafame_dict['barcode.selection.groups']
 
     return _barcode_boxplot_graph(graph_name=graph_name,
-                                  df=df,
-                                  barcode_selection=df.columns.drop('passes_filtering'),
+                                  barcode_groups=barcode_groups,
+                                  column='sequence_length',
+                                  barcode_selection=barcode_groups.barcodes,
                                   pass_color=toulligqc_colors['pass'],
                                   fail_color=toulligqc_colors['fail'],
                                   yaxis_title="Sequence length (bp)",
@@ -662,11 +671,12 @@ def barcoded_phred_score_frequency(dataframe_dict, result_directory, barcode_ali
 
     graph_name = "PHRED score distribution for barcodes"
 
-    df = dataframe_dict['barcode_selection_sequence_phred_dataframe']
+    barcode_groups = dataframe_dict['barcode.selection.groups']
 
     return _barcode_boxplot_graph(graph_name=graph_name,
-                                  df=df,
-                                  barcode_selection=df.columns.drop('passes_filtering'),
+                                  barcode_groups=barcode_groups,
+                                  column='mean_qscore',
+                                  barcode_selection=barcode_groups.barcodes,
                                   pass_color=toulligqc_colors['pass'],
                                   fail_color=toulligqc_colors['fail'],
                                   yaxis_title="PHRED score",
@@ -34,7 +34,9 @@ from toulligqc.plotly_graph_common import _phred_score_density
 from toulligqc.plotly_graph_common import _pie_chart_graph
 from toulligqc.plotly_graph_common import _quality_multiboxplot
 from toulligqc.plotly_graph_common import _read_length_distribution
+from toulligqc.plotly_graph_common import _read_type_statistics
 from toulligqc.plotly_graph_common import _twod_density_char
+from toulligqc.plotly_graph_common import DEFAULT_DENSITY_GRID_SIZE
 from toulligqc.plotly_graph_common import _title
 from toulligqc.plotly_graph_common import _transparent_colors
 from toulligqc.plotly_graph_common import _xaxis
@@ -166,7 +168,9 @@ def dsqr_read_length_scatterplot(dataframe_dict_1dsqr, result_directory):
                                      pass_color=toulligqc_colors['pass'],
                                      fail_color=toulligqc_colors['fail'],
                                      xaxis_title='1D² Read length (bp)',
-                                     result_directory=result_directory)
+                                     result_directory=result_directory,
+                                     statistics=_read_type_statistics(dataframe_dict_1dsqr, 'sequence.length',
+                                                                      ['All reads', 'Pass reads', 'Fail reads']))
 
 
 def dsqr_read_quality_multiboxplot(result_dict, dataframe_dict_1dsqr, result_directory):
@@ -183,7 +187,8 @@ def dsqr_read_quality_multiboxplot(result_dict, dataframe_dict_1dsqr, result_dir
          "1D² fail": dataframe_dict_1dsqr['fail.reads.mean.qscore']
          })
 
-    return _quality_multiboxplot(graph_name, result_directory, df, onedsquare=True)
+    return _quality_multiboxplot(graph_name, result_directory, df, onedsquare=True,
+                                 statistics=_read_type_statistics(dataframe_dict_1dsqr, 'mean.qscore', df.columns))
 
 
 def dsqr_allphred_score_frequency(result_dict, dataframe_dict_1dsqr, result_directory):
@@ -204,17 +209,20 @@ def dsqr_allphred_score_frequency(result_dict, dataframe_dict_1dsqr, result_dire
                                 all_color=toulligqc_colors['all'],
                                 pass_color=toulligqc_colors['pass'],
                                 fail_color=toulligqc_colors['fail'],
-                                result_directory=result_directory)
+                                result_directory=result_directory,
+                                statistics=_read_type_statistics(dataframe_dict_1dsqr, 'mean.qscore', dataframe.columns))
 
 
-def twod_density(dataframe_dict, result_directory):
+def twod_density(dataframe_dict, result_directory, grid_size=DEFAULT_DENSITY_GRID_SIZE):
     """
-    Plot the scatter plot representing the relation between the phred score and the sequence length in log
+    Plot the density of the reads by PHRED score and sequence length, counted on a grid of log sequence length bins
+    and PHRED score bins
+    :param grid_size: number of sequence length bins and of PHRED score bins
     """
 
     graph_name = "Correlation between 1D² read length and PHRED score"
 
-    return _twod_density_char(graph_name, dataframe_dict, result_directory, onedsquare = True)
+    return _twod_density_char(graph_name, dataframe_dict, result_directory, onedsquare = True, grid_size=grid_size)
 
 
 #
@@ -263,11 +271,12 @@ def barcode_length_boxplot_1dsqr(dataframe_dict_1dsqr, result_directory):
 
     graph_name = "1D² read size distribution for barcodes"
 
-    df = dataframe_dict_1dsqr['barcode_selection_sequence_length_dataframe']
+    barcode_groups = dataframe_dict_1dsqr['barcode.selection.groups']
 
     return _barcode_boxplot_graph(graph_name=graph_name,
-                                  df=df,
-                                  barcode_selection=df.columns.drop('passes_filtering'),
+                                  barcode_groups=barcode_groups,
+                                  column='sequence_length',
+                                  barcode_selection=barcode_groups.barcodes,
                                   pass_color=toulligqc_colors['pass'],
                                   fail_color=toulligqc_colors['fail'],
                                   yaxis_title='Sequence length (bp)',
@@ -282,11 +291,12 @@ def barcoded_phred_score_frequency_1dsqr(dataframe_dict_1dsqr, result_directory)
 
     graph_name = "1D² PHRED score distribution for barcodes"
 
-    df = dataframe_dict_1dsqr['barcode_selection_sequence_phred_dataframe']
+    barcode_groups = dataframe_dict_1dsqr['barcode.selection.groups']
 
     return _barcode_boxplot_graph(graph_name=graph_name,
-                                  df=df,
-                                  barcode_selection=df.columns.drop('passes_filtering'),
+                                  barcode_groups=barcode_groups,
+                                  column='mean_qscore',
+                                  barcode_selection=barcode_groups.barcodes,
                                   pass_color=toulligqc_colors['pass'],
                                   fail_color=toulligqc_colors['fail'],
                                   yaxis_title='PHRED score',
@@ -0,0 +1,32 @@
+// Render the graphs of the report when they are scrolled into view.
+// The figure of each graph is stored as deflate compressed and base64 encoded JSON in its data-figure attribute.
+(function () {
+
+  function renderGraph(div) {
+    var bytes = Uint8Array.from(atob(div.dataset.figure), function (c) { return c.charCodeAt(0); });
+    var stream = new Blob([bytes]).stream().pipeThrough(new DecompressionStream('deflate'));
+    new Response(stream).text().then(function (text) {
+      var figure = JSON.parse(text);
+      div.removeAttribute('data-figure');
+      Plotly.newPlot(div, figure.data, figure.layout, figure.config);
+    });
+  }
+
+  var graphs = document.querySelectorAll('div.lazy-graph');
+
+  if (!('IntersectionObserver' in window)) {
+    graphs.forEach(renderGraph);
+    return;
+  }
+
+  var observer = new IntersectionObserver(function (entries) {
+    entries.forEach(function (entry) {
+      if (entry.isIntersecting) {
+        observer.unobserve(entry.target);
+        renderGraph(entry.target);
+      }
+    });
+  }, {rootMargin: '300px'});
+
+  graphs.forEach(function (div) { observer.observe(div); });
+})();
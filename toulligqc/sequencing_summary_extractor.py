@@ -27,23 +27,27 @@
 
 import sys
 import time
+from functools import partial
 
 import numpy as np
 import pandas as pd
 
 from toulligqc import plotly_graph_generator as pgg
+from toulligqc.plotly_graph_common import DEFAULT_DENSITY_GRID_SIZE
 from toulligqc.extractor_common import check_result_values
 from toulligqc.extractor_common import count_boolean_elements
-from toulligqc.extractor_common import describe_dict
+from toulligqc.extractor_common import describe_dict, set_nxx_result_values
 from toulligqc.extractor_common import extract_barcode_info
 from toulligqc.extractor_common import get_result_value
 from toulligqc.extractor_common import set_result_value
 from toulligqc.extractor_common import log_task
-from toulligqc.extractor_common import add_image_to_result
+from toulligqc.extractor_common import generate_images
 from toulligqc.extractor_common import read_first_line_file
 from toulligqc.extractor_common import pd_read_sequencing_summary
 from toulligqc.extractor_common import fill_series_dict
-from toulligqc.common_statistics import compute_NXX, compute_LXX, occupancy_channel
+from toulligqc.extractor_common import ReadSampling, set_sampling_result_values
+from toulligqc.parse_cache import ParseCache
+from toulligqc.common_statistics import occupancy_channel, get_statistics
 from toulligqc.common import is_numpy_1_24
 
 class SequencingSummaryExtractor:
@@ -65,6 +69,11 @@ class SequencingSummaryExtractor:
         self.sequencing_summary_files = self.sequencing_summary_source.split('\t')
         self.barcode_colname = 'barcode_arrangement'
         self.threshold_Qscore = int(config_dictionary['threshold'])
+        self.thread = int(config_dictionary['thread']) if 'thread' in config_dictionary else 1
+        self.density_grid_size = int(config_dictionary.get('density_grid_size', DEFAULT_DENSITY_GRID_SIZE))
+        self.sampling = ReadSampling.from_config(config_dictionary)
+        self.sampled_totals = None
+        self.parse_cache = ParseCache.from_config(config_dictionary) if self.sampling is None else None
         if 'quiet' not in config_dictionary or config_dictionary['quiet'].lower() != 'true':
             self.quiet = False
         else:
@@ -109,7 +118,9 @@ class SequencingSummaryExtractor:
 
         start_time = time.time()
 
-        self.dataframe_1d = self._load_sequencing_summary_data()
+        self.dataframe_1d = self._load_cached_sequencing_summary_data()
+        if self.sampling is not None:
+            self.dataframe_1d = self.sampling.select(self.dataframe_1d)
 
         if self.dataframe_1d.empty:
             raise pd.errors.EmptyDataError("Dataframe is empty")
@@ -226,8 +237,7 @@ class SequencingSummaryExtractor:
         # Yield, n50, run time
         set_result_value(self, result_dict, "yield", sum(self.dataframe_dict["all.reads.sequence.length"]))
 
-        set_result_value(self, result_dict, "n50", compute_NXX(self.dataframe_dict, 50))
-        set_result_value(self, result_dict, "l50", compute_LXX(self.dataframe_dict, 50))
+        set_nxx_result_values(self, result_dict, self.dataframe_dict)
 
         set_result_value(self, result_dict, "run.time", max(self.dataframe_1d['start_time']))
 
@@ -237,20 +247,20 @@ class SequencingSummaryExtractor:
                              result_dict, "channel.occupancy.statistics." + index, value)
 
         # Get statistics about all reads length and store each value into result_dict
-        sequence_length_statistics = self.dataframe_dict["all.reads.sequence.length"].describe()
+        sequence_length_statistics = get_statistics(self.dataframe_dict, "all.reads.sequence.length").describe()
 
         for index, value in sequence_length_statistics.items():
             set_result_value(self,
                              result_dict, "all.read.length." + index, value)
 
         # Add statistics (without count) about read pass/fail length in the result_dict
-        describe_dict(self, result_dict, self.dataframe_dict["pass.reads.sequence.length"],
+        describe_dict(self, result_dict, get_statistics(self.dataframe_dict, "pass.reads.sequence.length"),
                       "pass.reads.sequence.length")
-        describe_dict(self, result_dict, self.dataframe_dict["fail.reads.sequence.length"],
+        describe_dict(self, result_dict, get_statistics(self.dataframe_dict, "fail.reads.sequence.length"),
                       "fail.reads.sequence.length")
 
         # Get Qscore statistics without count value and store them into result_dict
-        qscore_statistics = self.dataframe_1d['mean_qscore'].describe().drop(
+        qscore_statistics = get_statistics(self.dataframe_dict, "all.reads.mean.qscore").describe().drop(
             "count")
 
         for index, value in qscore_statistics.items():
@@ -258,8 +268,8 @@ class SequencingSummaryExtractor:
                              result_dict, "all.read.qscore." + index, value)
 
         # Add statistics (without count) about read pass/fail qscore in the result_dict
-        describe_dict(self, result_dict, self.dataframe_dict["pass.reads.mean.qscore"], "pass.reads.mean.qscore")
-        describe_dict(self, result_dict, self.dataframe_dict["fail.reads.mean.qscore"], "fail.reads.mean.qscore")
+        describe_dict(self, result_dict, get_statistics(self.dataframe_dict, "pass.reads.mean.qscore"), "pass.reads.mean.qscore")
+        describe_dict(self, result_dict, get_statistics(self.dataframe_dict, "fail.reads.mean.qscore"), "fail.reads.mean.qscore")
 
         if self.is_barcode:
             extract_barcode_info(self, result_dict,
@@ -267,6 +277,10 @@ class SequencingSummaryExtractor:
                                  self.dataframe_dict,
                                  self.dataframe_1d)
 
+        # Scale the counts estimated from the sampled reads
+        if self.sampling is not None:
+            set_sampling_result_values(self, result_dict, self.sampling, self.sampled_totals)
+
         log_task(self.quiet, 'Extract info from sequencing summary file', start_time, time.time())
 
 
@@ -275,18 +289,19 @@ class SequencingSummaryExtractor:
         Generation of the different graphs containing in the plotly_graph_generator module
         :return: images array containing the title and the path toward the images
         """
-        images = list()
-
-        add_image_to_result(self.quiet, images, time.time(), pgg.read_count_histogram(result_dict, self.images_directory))
-        add_image_to_result(self.quiet, images, time.time(), pgg.read_length_scatterplot(self.dataframe_dict, self.images_directory))
-        add_image_to_result(self.quiet, images, time.time(), pgg.yield_plot(self.dataframe_1d, self.images_directory))
-        add_image_to_result(self.quiet, images, time.time(), pgg.read_quality_multiboxplot(self.dataframe_dict, self.images_directory))
-        add_image_to_result(self.quiet, images, time.time(), pgg.allphred_score_frequency(self.dataframe_dict, self.images_directory))
-        add_image_to_result(self.quiet, images, time.time(), pgg.plot_performance(self.dataframe_1d, self.images_directory))
-        add_image_to_result(self.quiet, images, time.time(), pgg.twod_density(self.dataframe_dict, self.images_directory))
-        add_image_to_result(self.quiet, images, time.time(), pgg.sequence_length_over_time(self.dataframe_dict, self.images_directory))
-        add_image_to_result(self.quiet, images, time.time(), pgg.phred_score_over_time(self.dataframe_dict, result_dict, self.images_directory))
-        add_image_to_result(self.quiet, images, time.time(), pgg.speed_over_time(self.dataframe_dict, self.images_directory))
+        graph_tasks = []
+
+        graph_tasks.append(partial(pgg.read_count_histogram, result_dict, self.images_directory))
+        graph_tasks.append(partial(pgg.read_length_scatterplot, self.dataframe_dict, self.images_directory))
+        graph_tasks.append(partial(pgg.yield_plot, self.dataframe_1d, self.images_directory))
+        graph_tasks.append(partial(pgg.read_quality_multiboxplot, self.dataframe_dict, self.images_directory))
+        graph_tasks.append(partial(pgg.allphred_score_frequency, self.dataframe_dict, self.images_directory))
+        graph_tasks.append(partial(pgg.plot_performance, self.dataframe_1d, self.images_directory))
+        graph_tasks.append(partial(pgg.twod_density, self.dataframe_dict, self.images_directory,
+                                   grid_size=self.density_grid_size))
+        graph_tasks.append(partial(pgg.sequence_length_over_time, self.dataframe_dict, self.images_directory))
+        graph_tasks.append(partial(pgg.phred_score_over_time, self.dataframe_dict, result_dict, self.images_directory))
+        graph_tasks.append(partial(pgg.speed_over_time, self.dataframe_dict, self.images_directory))
 
         if self.is_barcode:
             if "barcode_alias" in self.config_dictionary:
@@ -294,27 +309,47 @@ class SequencingSummaryExtractor:
             else:
                 barcode_alias = None 
 
-            add_image_to_result(self.quiet, images, time.time(), pgg.barcode_percentage_pie_chart_pass(self.dataframe_dict,
-                                                                                                       self.barcode_selection,
-                                                                                                       self.images_directory,
-                                                                                                       barcode_alias))
+            graph_tasks.append(partial(pgg.barcode_percentage_pie_chart_pass, self.dataframe_dict,
+                                       self.barcode_selection,
+                                       self.images_directory,
+                                       barcode_alias))
 
             read_fail = self.dataframe_dict["read.fail.barcoded"]
             if not (len(read_fail) == 1 and read_fail["other barcodes"] == 0):
-                add_image_to_result(self.quiet, images, time.time(), pgg.barcode_percentage_pie_chart_fail(self.dataframe_dict,
-                                                                                                      self.barcode_selection,
-                                                                                                      self.images_directory,
-                                                                                                      barcode_alias))
+                graph_tasks.append(partial(pgg.barcode_percentage_pie_chart_fail, self.dataframe_dict,
+                                           self.barcode_selection,
+                                           self.images_directory,
+                                           barcode_alias))
+
+            graph_tasks.append(partial(pgg.barcode_length_boxplot, self.dataframe_dict,
+                                       self.images_directory,
+                                       barcode_alias))
+
+            graph_tasks.append(partial(pgg.barcoded_phred_score_frequency, self.dataframe_dict,
+                                       self.images_directory,
+                                       barcode_alias))
+        return generate_images(self.quiet, graph_tasks, self.thread)
 
-            add_image_to_result(self.quiet, images, time.time(), pgg.barcode_length_boxplot(self.dataframe_dict,
-                                                                                            self.images_directory,
-                                                                                            barcode_alias))
 
-            add_image_to_result(self.quiet, images, time.time(), pgg.barcoded_phred_score_frequency(self.dataframe_dict,
-                                                                                                    self.images_directory,
-                                                                                                    barcode_alias))
-        return images
+    def _load_cached_sequencing_summary_data(self):
+        """
+        Load sequencing summary dataframe from the parse cache, or read the sequencing summary and barcoding files and
+        add their columns to the cache
+        :return: a Pandas Dataframe object
+        """
+        if self.parse_cache is None:
+            return self._load_sequencing_summary_data()
+
+        cache_key = ParseCache.key(self.sequencing_summary_files, {'extractor': 'sequencing_summary',
+                                                                   'barcoding': self.is_barcode,
+                                                                   'barcode_column': self.barcode_colname})
+        cached = self.parse_cache.load(cache_key)
+        if cached is not None:
+            return cached[0]
 
+        dataframe = self._load_sequencing_summary_data()
+        self.parse_cache.store(cache_key, dataframe, {})
+        return dataframe
 
     def _load_sequencing_summary_data(self):
         """
@@ -353,7 +388,8 @@ class SequencingSummaryExtractor:
         try:
             # If 1 file and it's a sequencing_summary.txt
             if len(files) == 1 and self._is_sequencing_summary_file(files[0]):
-                return pd_read_sequencing_summary(files[0], cols=sequencing_summary_columns, data_type=sequencing_summary_datatypes)
+                return self._read_sequencing_summary_file(files[0], sequencing_summary_columns,
+                                                          sequencing_summary_datatypes)
 
             # If 1 file and it's a sequencing_summary.txt with barcode info, load column barcode_arrangement
             elif len(files) == 1 and self._is_sequencing_summary_with_barcodes(files[0]):
@@ -362,7 +398,8 @@ class SequencingSummaryExtractor:
                 sequencing_summary_datatypes.update(
                     {self.barcode_colname: 'category'})
 
-                return pd_read_sequencing_summary(files[0], cols=sequencing_summary_columns, data_type=sequencing_summary_datatypes)
+                return self._read_sequencing_summary_file(files[0], sequencing_summary_columns,
+                                                          sequencing_summary_datatypes)
 
             # If multiple files, check if there's a barcoding one and a sequencing one :
             for f in files:
@@ -384,8 +421,8 @@ class SequencingSummaryExtractor:
                         {self.barcode_colname: 'category'})
                     sys.stderr.write('Warning: The sequencing summary file {} contains barcode information.'
                                      ' The barcoding summary files will be skipped.\n'.format(f))
-                    return pd_read_sequencing_summary(f, cols=sequencing_summary_columns,
-                                    data_type=sequencing_summary_datatypes)
+                    return self._read_sequencing_summary_file(f, sequencing_summary_columns,
+                                                              sequencing_summary_datatypes)
 
                 # check for presence of sequencing_summary file, if True add column read_id for merging with barcode dataframe
                 else:
@@ -394,8 +431,8 @@ class SequencingSummaryExtractor:
                         sequencing_summary_datatypes.update(
                             {'read_id': object})
 
-                        dataframe = pd_read_sequencing_summary(f, cols=sequencing_summary_columns,
-                                                data_type=sequencing_summary_datatypes)
+                        dataframe = self._read_sequencing_summary_file(f, sequencing_summary_columns,
+                                                                       sequencing_summary_datatypes)
                         if summary_dataframe is None:
                             summary_dataframe = dataframe
                         else:
@@ -428,6 +465,23 @@ class SequencingSummaryExtractor:
         except IOError:
             raise FileNotFoundError("Sequencing summary file not found")
 
+    def _read_sequencing_summary_file(self, filename, cols, data_type):
+        """
+        Read a sequencing summary file, only the sampled reads are kept when sampling and the exact
+        read count and yield of the file are added to the totals of the extractor
+        :param filename: path of the sequencing summary file
+        :param cols: columns to read
+        :param data_type: dictionary with the type of the columns
+        :return: a Pandas Dataframe object
+        """
+        if self.sampling is None:
+            return pd_read_sequencing_summary(filename, cols=cols, data_type=data_type)
+
+        dataframe, totals = pd_read_sequencing_summary(filename, cols=cols, data_type=data_type,
+                                                       sampling=self.sampling)
+        self.sampled_totals = totals if self.sampled_totals is None else self.sampled_totals + totals
+        return dataframe
+
     @staticmethod
     def _is_barcode_file(filename):
         """
@@ -27,6 +27,7 @@
 
 import sys
 import time
+from functools import partial
 
 import numpy as np
 import pandas as pd
@@ -36,12 +37,13 @@ from toulligqc import plotly_graph_onedsquare_generator as pgg2
 from toulligqc.extractor_common import check_result_values
 from toulligqc.extractor_common import count_boolean_elements
 from toulligqc.extractor_common import describe_dict
+from toulligqc.common_statistics import get_statistics
 from toulligqc.extractor_common import extract_barcode_info
 from toulligqc.extractor_common import get_result_value
 from toulligqc.extractor_common import series_cols_boolean_elements
 from toulligqc.extractor_common import set_result_value
 from toulligqc.extractor_common import log_task
-from toulligqc.extractor_common import add_image_to_result
+from toulligqc.extractor_common import generate_images
 from toulligqc.extractor_common import read_first_line_file
 from toulligqc.sequencing_summary_extractor import SequencingSummaryExtractor as SSE
 from toulligqc.common import is_numpy_1_24
@@ -61,6 +63,9 @@ class OneDSquareSequencingSummaryExtractor(SSE):
         """
         super().__init__(config_dictionary)
         self.sse = SSE(config_dictionary)
+
+        # The 1D² reads are merged with the 1D reads, sampling is not supported
+        self.sampling = self.sse.sampling = None
         self.sequencing_summary_1dsqr_source = self.config_dictionary[
             'sequencing_summary_1dsqr_source']
         self.sequencing_summary_1dsqr_files = self.sequencing_summary_1dsqr_source.split(
@@ -213,20 +218,20 @@ class OneDSquareSequencingSummaryExtractor(SSE):
         set_result_value(self, result_dict, "read.fail.frequency", read_fail_frequency)
 
         # Get statistics about all reads length and store each value into result_dict
-        sequence_length_statistics = self.dataframe_1dsqr['sequence_length'].describe()
+        sequence_length_statistics = get_statistics(self.dataframe_dict_1dsqr, "all.reads.sequence.length").describe()
 
         for index, value in sequence_length_statistics.items():
             set_result_value(self,
                              result_dict, "all.read.length." + index, value)
 
         # Add statistics (without count) about read pass/fail length in the result_dict
-        describe_dict(self, result_dict, self.dataframe_dict_1dsqr["pass.reads.sequence.length"],
+        describe_dict(self, result_dict, get_statistics(self.dataframe_dict_1dsqr, "pass.reads.sequence.length"),
                       "pass.reads.sequence.length")
-        describe_dict(self, result_dict, self.dataframe_dict_1dsqr["fail.reads.sequence.length"],
+        describe_dict(self, result_dict, get_statistics(self.dataframe_dict_1dsqr, "fail.reads.sequence.length"),
                       "fail.reads.sequence.length")
 
         # Get Qscore statistics without count value and store them into result_dict
-        qscore_statistics = self.dataframe_1dsqr['mean_qscore'].describe().drop(
+        qscore_statistics = get_statistics(self.dataframe_dict_1dsqr, "all.reads.mean.qscore").describe().drop(
             "count")
 
         for index, value in qscore_statistics.items():
@@ -234,8 +239,8 @@ class OneDSquareSequencingSummaryExtractor(SSE):
                              result_dict, "all.reads.mean.qscore." + index, value)
 
         # Add statistics (without count) about read pass/fail qscore in the result_dict
-        describe_dict(self, result_dict, self.dataframe_dict_1dsqr["pass.reads.mean.qscore"], "pass.reads.mean.qscore")
-        describe_dict(self, result_dict, self.dataframe_dict_1dsqr["fail.reads.mean.qscore"], "fail.reads.mean.qscore")
+        describe_dict(self, result_dict, get_statistics(self.dataframe_dict_1dsqr, "pass.reads.mean.qscore"), "pass.reads.mean.qscore")
+        describe_dict(self, result_dict, get_statistics(self.dataframe_dict_1dsqr, "fail.reads.mean.qscore"), "fail.reads.mean.qscore")
 
         if self.is_barcode:
             extract_barcode_info(self,
@@ -275,39 +280,41 @@ class OneDSquareSequencingSummaryExtractor(SSE):
         :return: images array containing the title and the path toward the images
         """
 
-        images = list()
-
-        add_image_to_result(self.quiet, images, time.time(), pgg.read_count_histogram(result_dict, self.images_directory))
-        add_image_to_result(self.quiet, images, time.time(), pgg2.dsqr_read_count_histogram(result_dict, self.images_directory))
-        add_image_to_result(self.quiet, images, time.time(), pgg.read_length_scatterplot(self.dataframe_dict, self.images_directory))
-        add_image_to_result(self.quiet, images, time.time(), pgg2.dsqr_read_length_scatterplot(self.dataframe_dict_1dsqr, self.images_directory))
-        add_image_to_result(self.quiet, images, time.time(), pgg.yield_plot(self.dataframe_1dsqr, self.images_directory, oneDsquare=True))
-        add_image_to_result(self.quiet, images, time.time(), pgg.read_quality_multiboxplot(self.dataframe_dict, self.images_directory, ))
-        add_image_to_result(self.quiet, images, time.time(), pgg2.dsqr_read_quality_multiboxplot(result_dict, self.dataframe_dict_1dsqr, self.images_directory))
-        add_image_to_result(self.quiet, images, time.time(), pgg.allphred_score_frequency(self.dataframe_dict, self.images_directory))
-        add_image_to_result(self.quiet, images, time.time(), pgg2.dsqr_allphred_score_frequency(result_dict, self.dataframe_dict_1dsqr, self.images_directory))
-        add_image_to_result(self.quiet, images, time.time(), pgg.twod_density(self.dataframe_dict, self.images_directory))
-        add_image_to_result(self.quiet, images, time.time(), pgg2.twod_density(self.dataframe_dict_1dsqr, self.images_directory))
-        add_image_to_result(self.quiet, images, time.time(), pgg.plot_performance(self.sse.dataframe_1d, self.images_directory))
-        add_image_to_result(self.quiet, images, time.time(), pgg2.sequence_length_over_time_dsqr(self.dataframe_dict_1dsqr, self.images_directory))
-        add_image_to_result(self.quiet, images, time.time(), pgg2.phred_score_over_time_dsqr(result_dict, self.dataframe_dict_1dsqr, self.images_directory))
-        add_image_to_result(self.quiet, images, time.time(), pgg2.speed_over_time_dsqr(self.dataframe_dict_1dsqr, self.images_directory))
+        graph_tasks = []
+
+        graph_tasks.append(partial(pgg.read_count_histogram, result_dict, self.images_directory))
+        graph_tasks.append(partial(pgg2.dsqr_read_count_histogram, result_dict, self.images_directory))
+        graph_tasks.append(partial(pgg.read_length_scatterplot, self.dataframe_dict, self.images_directory))
+        graph_tasks.append(partial(pgg2.dsqr_read_length_scatterplot, self.dataframe_dict_1dsqr, self.images_directory))
+        graph_tasks.append(partial(pgg.yield_plot, self.dataframe_1dsqr, self.images_directory, oneDsquare=True))
+        graph_tasks.append(partial(pgg.read_quality_multiboxplot, self.dataframe_dict, self.images_directory, ))
+        graph_tasks.append(partial(pgg2.dsqr_read_quality_multiboxplot, result_dict, self.dataframe_dict_1dsqr, self.images_directory))
+        graph_tasks.append(partial(pgg.allphred_score_frequency, self.dataframe_dict, self.images_directory))
+        graph_tasks.append(partial(pgg2.dsqr_allphred_score_frequency, result_dict, self.dataframe_dict_1dsqr, self.images_directory))
+        graph_tasks.append(partial(pgg.twod_density, self.dataframe_dict, self.images_directory,
+                                   grid_size=self.density_grid_size))
+        graph_tasks.append(partial(pgg2.twod_density, self.dataframe_dict_1dsqr, self.images_directory,
+                                   grid_size=self.density_grid_size))
+        graph_tasks.append(partial(pgg.plot_performance, self.sse.dataframe_1d, self.images_directory))
+        graph_tasks.append(partial(pgg2.sequence_length_over_time_dsqr, self.dataframe_dict_1dsqr, self.images_directory))
+        graph_tasks.append(partial(pgg2.phred_score_over_time_dsqr, result_dict, self.dataframe_dict_1dsqr, self.images_directory))
+        graph_tasks.append(partial(pgg2.speed_over_time_dsqr, self.dataframe_dict_1dsqr, self.images_directory))
 
         if self.is_barcode:
-            add_image_to_result(self.quiet, images, time.time(), pgg2.barcode_percentage_pie_chart_1dsqr_pass(self.dataframe_dict_1dsqr,
-                                                                 self.barcode_selection,
-                                                                 self.images_directory))
+            graph_tasks.append(partial(pgg2.barcode_percentage_pie_chart_1dsqr_pass, self.dataframe_dict_1dsqr,
+                                       self.barcode_selection,
+                                       self.images_directory))
 
-            add_image_to_result(self.quiet, images, time.time(), pgg2.barcode_percentage_pie_chart_1dsqr_fail(self.dataframe_dict_1dsqr,
-                                                                 self.barcode_selection,
-                                                                 self.images_directory))
+            graph_tasks.append(partial(pgg2.barcode_percentage_pie_chart_1dsqr_fail, self.dataframe_dict_1dsqr,
+                                       self.barcode_selection,
+                                       self.images_directory))
 
-            add_image_to_result(self.quiet, images, time.time(), pgg2.barcode_length_boxplot_1dsqr(self.dataframe_dict_1dsqr,
-                                                                 self.images_directory))
+            graph_tasks.append(partial(pgg2.barcode_length_boxplot_1dsqr, self.dataframe_dict_1dsqr,
+                                       self.images_directory))
 
-            add_image_to_result(self.quiet, images, time.time(), pgg2.barcoded_phred_score_frequency_1dsqr(self.dataframe_dict_1dsqr,
-                                                                 self.images_directory))
-        return images
+            graph_tasks.append(partial(pgg2.barcoded_phred_score_frequency_1dsqr, self.dataframe_dict_1dsqr,
+                                       self.images_directory))
+        return generate_images(self.quiet, graph_tasks, self.thread)
 
     def clean(self, result_dict):
         """
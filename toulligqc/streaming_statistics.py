@@ -0,0 +1,652 @@
+import re
+import numpy as np
+import pandas as pd
+from math import ceil, log
+from toulligqc.extractor_common import ReadSampling, barcode_counts, set_result_value
+from toulligqc.fastq_bam_common import pass_filter
+from toulligqc.common_statistics import DESCRIBE_PERCENTILES, assembly_metrics
+
+# Maximal number of reads kept for the graphs showing distributions
+STREAMING_SAMPLE_SIZE = 200000
+
+# Width in seconds of the time bins of the read and base counts
+TIME_BIN_SIZE = 10
+
+
+class DenseCounts:
+    """
+    Counts indexed by integers in an array growing to cover the range of the indexes added
+    """
+
+    def __init__(self, dtype=np.int64):
+        """
+        :param dtype: numpy dtype of the counts
+        """
+        self.dtype = dtype
+        self.offset = 0
+        self.counts = np.zeros(0, dtype=dtype)
+
+    def add(self, indexes, weights=None):
+        """
+        Count indexes
+        :param indexes: numpy array of integer indexes
+        :param weights: numpy array with the weight of each index or None to count the indexes
+        """
+        if len(indexes) == 0:
+            return
+        first = int(indexes.min())
+        counts = np.bincount(indexes - first, weights=weights)
+        self.add_counts(first, counts.astype(self.dtype) if weights is not None else counts)
+
+    def add_counts(self, offset, counts):
+        """
+        Add counts starting at an index
+        :param offset: index of the first count
+        :param counts: numpy array of counts
+        """
+        if len(counts) == 0:
+            return
+        if len(self.counts) == 0:
+            self.offset = offset
+            self.counts = counts.astype(self.dtype, copy=True)
+            return
+        start = min(self.offset, offset)
+        end = max(self.offset + len(self.counts), offset + len(counts))
+        if start != self.offset or end != self.offset + len(self.counts):
+            grown = np.zeros(end - start, dtype=self.dtype)
+            grown[self.offset - start:self.offset - start + len(self.counts)] = self.counts
+            self.offset = start
+            self.counts = grown
+        self.counts[offset - self.offset:offset - self.offset + len(counts)] += counts
+
+    def merge(self, other):
+        """
+        Add the counts of another DenseCounts object
+        :param other: DenseCounts object
+        """
+        self.add_counts(other.offset, other.counts)
+
+    def indexes(self):
+        """
+        :return: a numpy array with the index of each count
+        """
+        return np.arange(self.offset, self.offset + len(self.counts))
+
+
+class SparseCounts:
+    """
+    Counts indexed by integers, only the indexes added are stored, for indexes that may be far apart
+    """
+
+    def __init__(self, dtype=np.int64):
+        """
+        :param dtype: numpy dtype of the counts
+        """
+        self.dtype = dtype
+        self.sorted_indexes = np.zeros(0, dtype=np.int64)
+        self.counts = np.zeros(0, dtype=dtype)
+
+    def add(self, indexes, weights=None):
+        """
+        Count indexes
+        :param indexes: numpy array of integer indexes
+        :param weights: numpy array with the weight of each index or None to count the indexes
+        """
+        if len(indexes) == 0:
+            return
+        unique_indexes, inverse = np.unique(indexes, return_inverse=True)
+        self.add_counts(unique_indexes, np.bincount(inverse, weights=weights))
+
+    def add_counts(self, indexes, counts):
+        """
+        Add counts to indexes
+        :param indexes: sorted numpy array of distinct integer indexes
+        :param counts: numpy array of counts of the indexes
+        """
+        if len(counts) == 0:
+            return
+        if len(self.counts) == 0:
+            self.sorted_indexes = indexes.astype(np.int64, copy=True)
+            self.counts = counts.astype(self.dtype, copy=True)
+            return
+        unique_indexes, inverse = np.unique(np.concatenate([self.sorted_indexes, indexes]), return_inverse=True)
+        merged = np.zeros(len(unique_indexes), dtype=self.dtype)
+        np.add.at(merged, inverse, np.concatenate([self.counts, counts.astype(self.dtype)]))
+        self.sorted_indexes = unique_indexes
+        self.counts = merged
+
+    def merge(self, other):
+        """
+        Add the counts of another SparseCounts object
+        :param other: SparseCounts object
+        """
+        self.add_counts(other.sorted_indexes, other.counts)
+
+    def indexes(self):
+        """
+        :return: a numpy array with the index of each count
+        """
+        return self.sorted_indexes
+
+
+class QuantileSketch:
+    """
+    Mergeable quantile sketch with a relative accuracy (DDSketch). The positive values are counted in buckets of
+    logarithmic width, so the quantiles are estimated with a relative error lower than the accuracy whatever the
+    number of values, and the sketches of batches of values can be merged.
+    """
+
+    def __init__(self, relative_accuracy=0.001):
+        """
+        :param relative_accuracy: maximal relative error of the quantiles
+        """
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = log(self.gamma)
+        self.buckets = DenseCounts()
+        self.zero_count = 0
+
+    def add(self, values):
+        """
+        Add values to the sketch
+        :param values: numpy array of values, the values lower or equal to 0 are counted as 0
+        """
+        values = np.asarray(values, dtype=np.float64)
+        positive = values[values > 0]
+        self.zero_count += len(values) - len(positive)
+        self.buckets.add(np.ceil(np.log(positive) / self.log_gamma).astype(np.int64))
+
+    def merge(self, other):
+        """
+        Add the values of another sketch with the same accuracy
+        :param other: QuantileSketch object
+        """
+        self.zero_count += other.zero_count
+        self.buckets.merge(other.buckets)
+
+    def order_statistics(self, ranks):
+        """
+        Estimate the values of ranks in the sorted values
+        :param ranks: numpy array of ranks starting at 0
+        :return: a numpy array with the estimated values
+        """
+        ranks = np.asarray(ranks)
+        bucket = np.searchsorted(np.cumsum(self.buckets.counts), ranks - self.zero_count, side='right')
+        bucket = np.minimum(bucket, max(0, len(self.buckets.counts) - 1))
+        values = 2 * self.gamma ** (self.buckets.offset + bucket) / (self.gamma + 1)
+        return np.where(ranks < self.zero_count, 0.0, values)
+
+    def values_and_counts(self):
+        """
+        :return: the estimated value of each bucket and the number of values in the bucket
+        """
+        values = 2 * self.gamma ** self.buckets.indexes() / (self.gamma + 1)
+        return np.append(values, 0.0), np.append(self.buckets.counts, self.zero_count)
+
+
+class ExactIntegerCounts:
+    """
+    Exact distribution of non negative integer values, like read lengths, stored as the count of each value
+    """
+
+    def __init__(self):
+        self.values = DenseCounts()
+
+    def add(self, values):
+        """
+        Add values
+        :param values: numpy array of integer values
+        """
+        self.values.add(np.asarray(values, dtype=np.int64))
+
+    def merge(self, other):
+        """
+        Add the values of another ExactIntegerCounts object
+        :param other: ExactIntegerCounts object
+        """
+        self.values.merge(other.values)
+
+    def order_statistics(self, ranks):
+        """
+        Get the values of ranks in the sorted values
+        :param ranks: numpy array of ranks starting at 0
+        :return: a numpy array with the values
+        """
+        return self.values.offset + np.searchsorted(np.cumsum(self.values.counts), ranks, side='right')
+
+    def values_and_counts(self):
+        """
+        :return: the distinct values and the number of occurrences of each value
+        """
+        return self.values.indexes(), self.values.counts
+
+
+class ColumnStatistics:
+    """
+    Count, mean, standard deviation, minimum, maximum and distribution of the values of a column
+    """
+
+    def __init__(self, exact_integers=False):
+        """
+        :param exact_integers: keep the exact distribution of integer values instead of a quantile sketch
+        """
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = np.nan
+        self.max = np.nan
+        self.distribution = ExactIntegerCounts() if exact_integers else QuantileSketch()
+
+    def add(self, values):
+        """
+        Add values
+        :param values: numpy array of values
+        """
+        if len(values) == 0:
+            return
+        values64 = values.astype(np.float64)
+        batch_mean = values64.mean()
+        self._merge_moments(len(values), batch_mean, ((values64 - batch_mean) ** 2).sum(),
+                            values64.min(), values64.max())
+        self.distribution.add(values)
+
+    def merge(self, other):
+        """
+        Add the values of another ColumnStatistics object
+        :param other: ColumnStatistics object
+        """
+        if other.count == 0:
+            return
+        self._merge_moments(other.count, other.mean, other.m2, other.min, other.max)
+        self.distribution.merge(other.distribution)
+
+    def _merge_moments(self, count, mean, m2, minimum, maximum):
+        # Parallel algorithm of Chan et al. for the variance
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self.m2 += m2 + delta ** 2 * self.count * count / total
+        self.count = total
+        self.min = minimum if np.isnan(self.min) else min(self.min, minimum)
+        self.max = maximum if np.isnan(self.max) else max(self.max, maximum)
+
+    def describe(self):
+        """
+        Statistics of the values
+        :return: a pd.Series object with the same index as pandas.Series.describe()
+        """
+        index = ['count', 'mean', 'std', 'min'] + ['{:g}%'.format(p * 100) for p in DESCRIBE_PERCENTILES] + ['max']
+        if self.count == 0:
+            return pd.Series([0.0] + [np.nan] * (len(index) - 1), index=index)
+
+        # Linear interpolation between the closest ranks like pandas
+        positions = np.array(DESCRIBE_PERCENTILES) * (self.count - 1)
+        lower = np.floor(positions).astype(np.int64)
+        values = self.distribution.order_statistics(np.concatenate([lower, np.minimum(lower + 1, self.count - 1)]))
+        lower_values, upper_values = values[:len(lower)], values[len(lower):]
+        percentiles = lower_values + (upper_values - lower_values) * (positions - lower)
+
+        # Exact values for the minimum and maximum
+        percentiles = np.clip(percentiles, self.min, self.max)
+        std = np.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else np.nan
+        return pd.Series([float(self.count), self.mean, std, self.min] + percentiles.tolist() + [self.max],
+                         index=index)
+
+
+class ReadGroupStatistics:
+    """
+    Statistics of the lengths and the qscores of a group of reads
+    """
+
+    def __init__(self, exact_lengths=False):
+        """
+        :param exact_lengths: keep the exact distribution of the read lengths
+        """
+        self.length = ColumnStatistics(exact_integers=exact_lengths)
+        self.qscore = ColumnStatistics()
+        self.bases = 0
+
+    @property
+    def count(self):
+        return self.length.count
+
+    def add(self, lengths, qscores):
+        """
+        Add reads
+        :param lengths: numpy array of read lengths
+        :param qscores: numpy array of mean qscores
+        """
+        self.length.add(lengths)
+        self.qscore.add(qscores)
+        self.bases += int(lengths.sum(dtype=np.int64))
+
+    def merge(self, other):
+        """
+        Add the reads of another ReadGroupStatistics object
+        :param other: ReadGroupStatistics object
+        """
+        self.length.merge(other.length)
+        self.qscore.merge(other.qscore)
+        self.bases += other.bases
+
+
+class StreamingStatistics:
+    """
+    Statistics of the reads updated batch by batch, the memory used does not depend on the number of reads.
+    The counts, the sums, the minimum and maximum values and the read length distributions are exact, the qscore
+    quantiles and the read length quantiles of the barcodes are estimated with quantile sketches. A uniform sample of
+    the reads is kept for the graphs showing distributions.
+    """
+
+    def __init__(self, threshold, sample_size=STREAMING_SAMPLE_SIZE, seed=42):
+        """
+        :param threshold: Qscore threshold of the pass reads
+        :param sample_size: maximal number of reads kept for the graphs
+        :param seed: seed of the sampling of the reads kept for the graphs
+        """
+        self.threshold = threshold
+        self.groups = {True: ReadGroupStatistics(exact_lengths=True), False: ReadGroupStatistics(exact_lengths=True)}
+        self.barcode_groups = {}
+        self.barcodes = []
+        self.barcode_index = {}
+        self.channel_counts = {True: DenseCounts(), False: DenseCounts()}
+        # The start times of the records without start time are their index in the chunk, far from the epoch times
+        self.time_read_counts = {True: SparseCounts(), False: SparseCounts()}
+        self.time_base_counts = {True: SparseCounts(), False: SparseCounts()}
+        self.min_start_time = np.inf
+        self.max_start_time = -np.inf
+        self.totals = np.zeros(2, dtype=np.int64)
+        self.columns = None
+        self.sampling = ReadSampling(count=sample_size, seed=seed)
+        self.sample = None
+
+    def add(self, batch):
+        """
+        Update the statistics with a batch of reads
+        :param batch: dictionary with a numpy array for each column or a (codes, categories) tuple for categorical
+        columns, as returned by the workers
+        """
+        if self.columns is None:
+            self.columns = [column for column in batch if column != 'totals']
+        if 'totals' in batch:
+            self.totals += batch['totals']
+
+        lengths = batch['sequence_length']
+        if len(lengths) == 0:
+            return
+        qscores = batch['mean_qscore']
+        passes_filtering = pass_filter(qscores, self.threshold)
+
+        columns = {column: batch[column] for column in self.columns}
+        if 'barcode_arrangement' in columns:
+            columns['barcode_arrangement'] = self._barcode_codes(*columns['barcode_arrangement'])
+
+        for read_type in (True, False):
+            selected = passes_filtering == read_type
+            self.groups[read_type].add(lengths[selected], qscores[selected])
+            if 'channel' in columns:
+                self.channel_counts[read_type].add(columns['channel'][selected].astype(np.int64))
+            if 'start_time' in columns:
+                time_bins = np.floor(columns['start_time'][selected] / TIME_BIN_SIZE).astype(np.int64)
+                self.time_read_counts[read_type].add(time_bins)
+                self.time_base_counts[read_type].add(time_bins, weights=lengths[selected])
+
+        if 'start_time' in columns:
+            self.min_start_time = min(self.min_start_time, columns['start_time'].min())
+            self.max_start_time = max(self.max_start_time, columns['start_time'].max())
+
+        if 'barcode_arrangement' in columns:
+            self._add_barcodes(columns['barcode_arrangement'], lengths, qscores, passes_filtering)
+
+        self._add_to_sample(columns)
+
+    def _barcode_codes(self, codes, categories):
+        """
+        Convert the codes of a categorical column of a batch to codes of all the barcodes seen
+        """
+        for category in categories:
+            if category not in self.barcode_index:
+                self.barcode_index[category] = len(self.barcodes)
+                self.barcodes.append(category)
+        mapping = np.array([self.barcode_index[category] for category in categories], dtype=np.int32)
+        return mapping[codes] if len(mapping) else codes
+
+    def _add_barcodes(self, codes, lengths, qscores, passes_filtering):
+        # Group the reads of the batch by barcode and read type
+        keys = codes.astype(np.int64) * 2 + passes_filtering
+        order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[order]
+        boundaries = np.flatnonzero(np.diff(sorted_keys)) + 1
+        for group in np.split(order, boundaries):
+            key = int(keys[group[0]])
+            if key not in self.barcode_groups:
+                self.barcode_groups[key] = ReadGroupStatistics()
+            self.barcode_groups[key].add(lengths[group], qscores[group])
+
+    def _add_to_sample(self, columns):
+        # Bottom-k sampling of the reads, with keys only depending on the content of the batch
+        keys = self.sampling.keys(columns['sequence_length'].tobytes() + columns['mean_qscore'].tobytes(),
+                                  len(columns['sequence_length']))
+        selected = self.sampling.mask(keys)
+        if self.sample is not None and len(self.sample['sample_key']) >= self.sampling.count:
+            selected &= keys < self.sample_threshold
+        if not selected.any():
+            return
+        rows = {column: values[selected] for column, values in columns.items()}
+        rows['sample_key'] = keys[selected]
+        if self.sample is None:
+            self.sample = rows
+        else:
+            self.sample = {column: np.concatenate([self.sample[column], rows[column]]) for column in self.sample}
+
+        # Keep the sample size bounded
+        sample_keys = self.sample['sample_key']
+        if len(sample_keys) >= 2 * self.sampling.count:
+            kept = np.argpartition(sample_keys, self.sampling.count - 1)[:self.sampling.count]
+            self.sample = {column: values[kept] for column, values in self.sample.items()}
+            sample_keys = self.sample['sample_key']
+        if len(sample_keys) >= self.sampling.count:
+            self.sample_threshold = np.partition(sample_keys, self.sampling.count - 1)[self.sampling.count - 1]
+
+    @property
+    def read_count(self):
+        return self.groups[True].count + self.groups[False].count
+
+    def sample_dataframe(self):
+        """
+        Get the reads kept for the graphs
+        :return: a Pandas Dataframe object with the same columns as the dataframe of all the reads, the start times
+        start at the start time of the first read of all the reads
+        """
+        if self.sample is None:
+            return pd.DataFrame(columns=self.columns)
+
+        order = np.argsort(self.sample['sample_key'], kind='stable')[:self.sampling.count]
+        data = {column: self.sample[column][order] for column in self.columns}
+        if 'barcode_arrangement' in data:
+            categories = sorted(self.barcodes)
+            sorted_codes = np.array([categories.index(barcode) for barcode in self.barcodes], dtype=np.int32)
+            data['barcode_arrangement'] = pd.Categorical.from_codes(sorted_codes[data['barcode_arrangement']],
+                                                                    categories)
+        if 'start_time' in data:
+            data['start_time'] = data['start_time'] - self.min_start_time
+        return pd.DataFrame(data, columns=self.columns)
+
+    def is_sampled(self):
+        """
+        :return: True if the graphs are computed on a sample of the reads
+        """
+        return self.read_count > self.sampling.count
+
+    def channel_dataframe(self):
+        """
+        Get the number of pass and fail reads of each channel
+        :return: a Pandas Dataframe object with a row for each read type of a channel and
+        channel, passes_filtering and read_count columns
+        """
+        frames = []
+        for read_type in (True, False):
+            counts = self.channel_counts[read_type]
+            used = counts.counts > 0
+            frames.append(pd.DataFrame({'channel': counts.indexes()[used].astype(np.int16),
+                                        'passes_filtering': read_type,
+                                        'read_count': counts.counts[used]}))
+        return pd.concat(frames, ignore_index=True)
+
+    def time_dataframe(self):
+        """
+        Get the number of reads and bases of the time bins
+        :return: a Pandas Dataframe object with a row for each read type of a time bin and start_time (start of the
+        bin), passes_filtering, read_count and sequence_length (number of bases) columns
+        """
+        first_bin = np.floor(self.min_start_time / TIME_BIN_SIZE)
+        frames = []
+        for read_type in (True, False):
+            read_counts = self.time_read_counts[read_type]
+            base_counts = self.time_base_counts[read_type]
+            used = read_counts.counts > 0
+            frames.append(pd.DataFrame({
+                'sequence_length': base_counts.counts[used],
+                'start_time': (read_counts.indexes()[used] - first_bin) * float(TIME_BIN_SIZE),
+                'passes_filtering': read_type,
+                'read_count': read_counts.counts[used]}))
+        return pd.concat(frames, ignore_index=True).sort_values(by='start_time', kind='stable')
+
+    def set_result_values(self, extractor, result_dict):
+        """
+        Set the statistics of all the reads in the result dictionary
+        :param extractor: extractor of the reads
+        :param result_dict: result dictionary
+        """
+        all_reads = ReadGroupStatistics(exact_lengths=True)
+        for read_type in (True, False):
+            all_reads.merge(self.groups[read_type])
+        read_count = all_reads.count
+        pass_count = self.groups[True].count
+        fail_count = self.groups[False].count
+
+        set_result_value(extractor, result_dict, "read.count", read_count)
+        set_result_value(extractor, result_dict, "read.pass.count", pass_count)
+        set_result_value(extractor, result_dict, "read.fail.count", fail_count)
+        set_result_value(extractor, result_dict, "read.pass.ratio", pass_count / read_count)
+        set_result_value(extractor, result_dict, "read.fail.ratio", fail_count / read_count)
+        set_result_value(extractor, result_dict, "read.count.frequency", 100)
+        set_result_value(extractor, result_dict, "read.pass.frequency", pass_count / read_count * 100)
+        set_result_value(extractor, result_dict, "read.fail.frequency", fail_count / read_count * 100)
+
+        if self.is_sampled():
+            set_result_value(extractor, result_dict, "streaming.sampled.read.count", self.sampling.count)
+
+        set_result_value(extractor, result_dict, "yield", all_reads.bases)
+        n50, l50 = _nxx_lxx(all_reads.length)[50]
+        set_result_value(extractor, result_dict, "n50", n50)
+        set_result_value(extractor, result_dict, "l50", l50)
+        _set_nxx_lxx(extractor, result_dict, "all.read.length", all_reads.length)
+        for read_type, name in ((True, 'pass'), (False, 'fail')):
+            _set_nxx_lxx(extractor, result_dict, name + ".reads.sequence.length", self.groups[read_type].length)
+
+        if self.max_start_time >= self.min_start_time:
+            set_result_value(extractor, result_dict, "run.time", float(self.max_start_time - self.min_start_time))
+
+        channel_counts = DenseCounts()
+        for read_type in (True, False):
+            channel_counts.merge(self.channel_counts[read_type])
+        if len(channel_counts.counts):
+            occupancy = pd.Series(channel_counts.counts[channel_counts.counts > 0]).describe()
+            for index, value in occupancy.items():
+                set_result_value(extractor, result_dict, "channel.occupancy.statistics." + index, float(value))
+
+        for index, value in all_reads.length.describe().items():
+            set_result_value(extractor, result_dict, "all.read.length." + index, float(value))
+        for index, value in all_reads.qscore.describe().drop('count').items():
+            set_result_value(extractor, result_dict, "all.read.qscore." + index, float(value))
+        for read_type, name in ((True, 'pass'), (False, 'fail')):
+            for index, value in self.groups[read_type].length.describe().drop('count').items():
+                set_result_value(extractor, result_dict, name + ".reads.sequence.length." + index, float(value))
+            for index, value in self.groups[read_type].qscore.describe().drop('count').items():
+                set_result_value(extractor, result_dict, name + ".reads.mean.qscore." + index, float(value))
+
+    def set_barcode_result_values(self, extractor, result_dict, barcode_selection, dataframe_dict):
+        """
+        Set the statistics of the barcodes of all the reads in the result dictionary and the barcode counts used by
+        the graphs in the dataframe dictionary, like extract_barcode_info()
+        :param extractor: extractor of the reads
+        :param result_dict: result dictionary
+        :param barcode_selection: barcodes selected, with the unclassified and other barcodes entries
+        :param dataframe_dict: dictionary of the graph inputs
+        """
+        # Statistics of each barcode name, without the barcode kit id
+        barcodes = {}
+        for key, group in self.barcode_groups.items():
+            barcode = _barcode_name(self.barcodes[key // 2])
+            read_type = bool(key % 2)
+            if barcode not in barcodes:
+                barcodes[barcode] = {True: ReadGroupStatistics(), False: ReadGroupStatistics()}
+            barcodes[barcode][read_type].merge(group)
+
+        for read_type, name in ((True, 'pass'), (False, 'fail')):
+            found = {barcode: groups[read_type] for barcode, groups in barcodes.items()
+                     if groups[read_type].count > 0}
+            dataframe_dict["read." + name + ".barcoded"] = barcode_counts(
+                extractor, barcode_selection, result_dict, "read." + name + ".barcoded",
+                pd.Series({barcode: group.count for barcode, group in found.items()}, dtype=np.int64), set(found))
+            dataframe_dict["base." + name + ".barcoded"] = barcode_counts(
+                extractor, barcode_selection, result_dict, "base." + name + ".barcoded",
+                pd.Series({barcode: group.bases for barcode, group in found.items()}, dtype=np.int64), set(found))
+
+        read_count = self.read_count
+        for name in ('pass', 'fail'):
+            barcoded_count = result_dict[extractor.get_report_data_file_id() + ".read." + name + ".barcoded.count"]
+            set_result_value(extractor, result_dict, "read." + name + ".barcoded.frequency",
+                             barcoded_count / read_count * 100)
+
+        # Reads of the barcodes not selected are counted as other barcodes
+        selected = {barcode: {True: ReadGroupStatistics(), False: ReadGroupStatistics()}
+                    for barcode in barcode_selection}
+        for barcode, groups in barcodes.items():
+            target = selected[barcode if barcode in selected else 'other barcodes']
+            for read_type in (True, False):
+                target[read_type].merge(groups[read_type])
+
+        for barcode, groups in selected.items():
+            all_reads = ReadGroupStatistics()
+            all_reads.merge(groups[True])
+            all_reads.merge(groups[False])
+            for prefix, group in (('all.read.', all_reads), ('read.pass.', groups[True]),
+                                  ('read.fail.', groups[False])):
+                for index, value in group.length.describe().items():
+                    set_result_value(extractor, result_dict,
+                                     prefix + barcode.replace(' ', '.') + '.length.' + index, float(value))
+                for index, value in group.qscore.describe().drop('count').items():
+                    set_result_value(extractor, result_dict, prefix + barcode + '.qscore.' + index, float(value))
+                _set_nxx_lxx(extractor, result_dict, prefix + barcode.replace(' ', '.') + '.length', group.length)
+
+
+def _nxx_lxx(length_statistics):
+    """
+    Compute the NXX and LXX values from the distribution of the read lengths, exact for the read length histograms
+    and estimated for the quantile sketches
+    :param length_statistics: ColumnStatistics object of the read lengths
+    :return: dictionary with a (NXX, LXX) tuple for each level
+    """
+    values, counts = length_statistics.distribution.values_and_counts()
+    return assembly_metrics(values, counts=counts)
+
+
+def _set_nxx_lxx(extractor, result_dict, entry, length_statistics):
+    """
+    Set the NXX and LXX values of read lengths in the result dictionary, like nxx_dict()
+    """
+    for x, (nxx, lxx) in _nxx_lxx(length_statistics).items():
+        set_result_value(extractor, result_dict, entry + '.n' + str(x), nxx)
+        set_result_value(extractor, result_dict, entry + '.l' + str(x), lxx)
+
+
+def _barcode_name(barcode):
+    """
+    Remove the barcode kit id of a barcode name
+    """
+    if barcode.startswith(('SQK', 'VQK')):
+        match = re.match(r'[SV]QK-.+_(.+)$', barcode)
+        if match:
+            return match.group(1)
+    return barcode
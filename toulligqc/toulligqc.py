@@ -55,6 +55,10 @@ from toulligqc import sequencing_telemetry_extractor
 from toulligqc import common
 from toulligqc import fastq_extractor
 from toulligqc import bam_extractor
+from toulligqc import fastq_bam_common
+from toulligqc.extractor_common import parse_sample_size
+from toulligqc.parse_cache import DEFAULT_CACHE_SIZE
+from toulligqc.plotly_graph_common import DEFAULT_DENSITY_GRID_SIZE
 
 
 def _parse_args(config_dictionary):
@@ -88,11 +92,11 @@ def _parse_args(config_dictionary):
 
     required.add_argument('-q', '--fastq', action='append', dest='fastq',
                           help='FASTQ file (necessary if no sequencing summary file), ' +
-                               'can also be in a tar.gz archive')
+                               'can also be in a tar.gz archive, a directory or a glob pattern')
     
     required.add_argument('-u', '--bam', action='append', dest='bam',
                           help='uBAM file (necessary if no sequencing summary file), ' +
-                               'can also be in SAM format')
+                               'can also be in SAM format, a directory or a glob pattern')
     
     # Add all optional arguments
     optional.add_argument('-s', '--samplesheet', action='store', dest="samplesheet", 
@@ -101,6 +105,34 @@ def _parse_args(config_dictionary):
     optional.add_argument("--thread", action='store', dest="thread", help="Number of threads", type=int, default=2)
     optional.add_argument("--batch-size", action='store', dest="batch_size", help="Batch size", type=int, default=500)
     optional.add_argument("--qscore-threshold", action='store', dest="threshold", help="Qscore threshold", type=int, default=9)
+    optional.add_argument("--basecaller-qscore", action='store_true', dest="basecaller_qscore",
+                          help="Use the mean qscore computed by the basecaller (qs tag or FASTQ header field) "
+                               "instead of decoding read qualities", default=False)
+    optional.add_argument("--shared-memory", action='store_true', dest="shared_memory",
+                          help="Return the results of the FASTQ and BAM parsing processes through shared memory",
+                          default=False)
+    optional.add_argument("--sample", action='store', dest="sample", type=_sample_size,
+                          help="Quick QC on a sample of the reads: a fraction of the reads (e.g. 0.05) "
+                               "or a number of reads (e.g. 100000)")
+    optional.add_argument("--sample-seed", action='store', dest="sample_seed", type=int, default=42,
+                          help="Seed of the sampling of the reads")
+    optional.add_argument("--streaming", action='store_true', dest="streaming",
+                          help="Compute the statistics of FASTQ and BAM files batch by batch without keeping all the "
+                               "reads in memory, the graphs showing distributions use a sample of the reads",
+                          default=False)
+    optional.add_argument("--cache-directory", action='store', dest="cache_directory",
+                          help="Cache directory of the columns parsed from FASTQ, BAM and sequencing summary files, "
+                               "used again when the same files are analyzed with the same options")
+    optional.add_argument("--cache-size", action='store', dest="cache_size", type=int, default=DEFAULT_CACHE_SIZE,
+                          help="Maximal size in MB of the cache directory, the least recently used entries are "
+                               "removed when it is full")
+    optional.add_argument("--lazy-report", action='store_true', dest="lazy_report",
+                          help="Store the graphs of the HTML report as compressed data rendered only when they are "
+                               "scrolled into view, for faster loading of large reports", default=False)
+    optional.add_argument("--density-grid-size", action='store', dest="density_grid_size", type=_grid_size,
+                          default=DEFAULT_DENSITY_GRID_SIZE,
+                          help="Number of read length bins and of PHRED score bins of the read length and PHRED score "
+                               "density graph")
 
     optional.add_argument("-n", "--report-name", action='store', dest="report_name", help="Report name", type=str)
     optional.add_argument('--output-directory', action='store', dest='output', help='Output directory')
@@ -133,6 +165,9 @@ def _parse_args(config_dictionary):
     is_barcode = args.is_barcode
     barcodes = args.barcodes
 
+    if args.streaming and args.sample:
+        parser.error("argument --streaming: not allowed with argument --sample")
+
     # If a barcode list or samplesheet are is provided, automatically add --barcoding argument
     if len(barcodes) > 0 or args.samplesheet:
         is_barcode = True
@@ -157,6 +192,15 @@ def _parse_args(config_dictionary):
         ('thread', args.thread),
         ('batch_size', args.batch_size),
         ('threshold', args.threshold),
+        ('basecaller_qscore', args.basecaller_qscore),
+        ('shared_memory', args.shared_memory),
+        ('sample', args.sample),
+        ('sample_seed', args.sample_seed),
+        ('streaming', args.streaming),
+        ('cache_directory', args.cache_directory),
+        ('cache_size', args.cache_size),
+        ('density_grid_size', args.density_grid_size),
+        ('lazy_report', args.lazy_report),
         ('result_directory', args.output),
         ('html_report_path', args.html_report_path),
         ('data_report_path', args.data_report_path),
@@ -169,9 +213,10 @@ def _parse_args(config_dictionary):
         ('debug', args.debug)
     }
 
-    # Put arguments values in configuration object
+    # Put arguments values in configuration object, 0 is a valid seed of the sampling
+    sampling_options = ('sample', 'sample_seed')
     for key, value in args_dict:
-        if value:
+        if value or (key in sampling_options and value is not None):
             config_dictionary[key] = value
 
     # Directory paths must ends with '/'
@@ -280,6 +325,35 @@ def _show(config_dictionary, msg):
         print(msg)
 
 
+def _sample_size(value):
+    """
+    Check the value of the --sample argument
+    :param value: fraction of the reads or number of reads to sample
+    :return: the value of the argument
+    """
+    try:
+        parse_sample_size(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError("invalid sample size: '{}', expected a fraction of the reads between 0 and 1 "
+                                         "or a number of reads".format(value))
+    return value
+
+
+def _grid_size(value):
+    """
+    Check the value of the --density-grid-size argument
+    :param value: number of bins
+    :return: the number of bins
+    """
+    try:
+        grid_size = int(value)
+    except ValueError:
+        grid_size = 0
+    if grid_size < 1:
+        raise argparse.ArgumentTypeError("invalid grid size: '{}', expected a positive number of bins".format(value))
+    return grid_size
+
+
 def _join_parameter_arguments(arg):
     """
     Join parameter arguments
@@ -435,6 +509,9 @@ def main():
         _show(config_dictionary, "* End of {0} extractor (done in {1})".format(extractor.get_name(),
                                                                                common.format_duration(extract_time)))
 
+    # Stop the worker processes used by the FASTQ and BAM extractors
+    fastq_bam_common.shutdown_worker_pool()
+
     # HTML report and report.data file generation
     _show(config_dictionary, "* Write HTML report")
     html_report_generator.html_report(config_dictionary, result_dict, graphs)